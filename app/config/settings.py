@@ -8,6 +8,103 @@ class Settings:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id]
 
+    # Окно (сек), в течение которого уведомления по одной заявке одному получателю склеиваются в одно
+    NOTIFY_DEBOUNCE_SECONDS = float(os.getenv("NOTIFY_DEBOUNCE_SECONDS", "3"))
+
+    # Защита от повторной обработки апдейтов и двойных нажатий на inline-кнопки
+    DEDUP_WINDOW_SECONDS = float(os.getenv("DEDUP_WINDOW_SECONDS", "2"))
+    DEDUP_CAPACITY = int(os.getenv("DEDUP_CAPACITY", "4096"))
+    # Хранить update_id в SQLite, чтобы после рестарта не обработать их повторно
+    DEDUP_PERSIST = os.getenv("DEDUP_PERSIST", "").lower() in ("1", "true", "yes")
+
+    # Планировщик апдейтов в режиме polling: число потоков (чат всегда обрабатывается одним из них, по порядку;
+    # 0 — стандартный пул telebot) и максимум апдейтов одного чата в очереди
+    SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+    SCHEDULER_CHAT_CAP = int(os.getenv("SCHEDULER_CHAT_CAP", "50"))
+
+    # Несколько процессов: приёмник раздаёт апдейты SUPERVISOR_WORKERS воркерам по chat_id (0 — один процесс)
+    SUPERVISOR_WORKERS = int(os.getenv("SUPERVISOR_WORKERS", "0"))
+    SUPERVISOR_QUEUE_SIZE = int(os.getenv("SUPERVISOR_QUEUE_SIZE", "1000"))
+
+    # Адрес Bot API (свой telegram-bot-api сервер или локальная заглушка); формат как у telebot: .../bot{0}/{1}
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+    # Способ получения апдейтов: "polling" (getUpdates), "webhook" (встроенный HTTP-сервер)
+    # или "async" (AsyncTeleBot + пул потоков для хендлеров, services/async_runtime.py)
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")            # публичный https-адрес, на который шлёт Telegram
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")      # пусто — генерируется при старте
+    WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "256"))
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+
+    # Асинхронный движок: потоки для хендлеров/БД, лимит апдейтов в работе, keep-alive соединения к API
+    ASYNC_WORKERS = int(os.getenv("ASYNC_WORKERS", "16"))
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "256"))
+    ASYNC_HTTP_CONNECTIONS = int(os.getenv("ASYNC_HTTP_CONNECTIONS", "32"))
+
+    # Инструментирование хендлеров (время, SQL, вызовы API): окно перцентилей для /perf
+    # и локальный эндпоинт Prometheus /metrics (METRICS_PORT=0 — не поднимать)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+    METRICS_WINDOW_SECONDS = float(os.getenv("METRICS_WINDOW_SECONDS", "300"))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+    # Журнал медленных SQL: порог (мс, 0 — наблюдатель выключен), EXPLAIN QUERY PLAN для новых запросов,
+    # сводка топ-N запросов админам раз в SLOW_QUERY_DIGEST_MINUTES (0 — только по команде /slow)
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+    SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1").lower() in ("1", "true", "yes")
+    SLOW_QUERY_TOP = int(os.getenv("SLOW_QUERY_TOP", "10"))
+    SLOW_QUERY_DIGEST_MINUTES = float(os.getenv("SLOW_QUERY_DIGEST_MINUTES", "60"))
+
+    # Семплирующий профилировщик (/profiler для ADMIN_IDS): шаг снимков и предельная длительность сессии
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+    PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+    # Архив заявок (services/archive.py): доставленные/отменённые заявки, не менявшиеся ARCHIVE_AFTER_DAYS дней
+    # (0 — архив выключен), переносятся в *_archive пачками по ARCHIVE_BATCH_SIZE раз в ARCHIVE_INTERVAL_HOURS
+    ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+
+    # Графики аналитики (services/charts.py): сколько отрисованных PNG держать в LRU-кэше и шрифт подписей
+    # (путь к .ttf; пусто — DejaVuSans из системных шрифтов, без него — встроенный шрифт Pillow без кириллицы)
+    CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "64"))
+    CHART_FONT = os.getenv("CHART_FONT", "")
+
+    # Импорт заявок из XLSX/CSV (services/order_import.py): максимум строк в файле и строк на одну транзакцию INSERT
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "10000"))
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+    # Массовые действия над заявками (handlers/bulk_actions.py): заявок на странице списка выбора
+    # и максимум выбранных за раз (весь выбор уходит одним UPDATE ... WHERE id IN (...))
+    BULK_PAGE_SIZE = int(os.getenv("BULK_PAGE_SIZE", "8"))
+    BULK_MAX_SELECTED = int(os.getenv("BULK_MAX_SELECTED", "200"))
+
+    # Подбор водителя (services/assignment.py): за сколько дней учитываются доставки по маршруту и как часто
+    # агрегаты пересчитываются целиком (события других воркеров супервизора до процесса не доходят)
+    ASSIGN_ROUTE_WINDOW_DAYS = int(os.getenv("ASSIGN_ROUTE_WINDOW_DAYS", "90"))
+    ASSIGN_REFRESH_SECONDS = float(os.getenv("ASSIGN_REFRESH_SECONDS", "300"))
+
+    # Снимок активных пользователей (services/roster.py): пересобирается по событиям пользователей
+    # и не реже чем раз в ROSTER_REFRESH_SECONDS (изменения из других воркеров супервизора)
+    ROSTER_REFRESH_SECONDS = float(os.getenv("ROSTER_REFRESH_SECONDS", "60"))
+
+    # Логирование (app/logs/logging.py): общий уровень, уровни по модулям "app.handlers.driver=DEBUG,telebot=ERROR",
+    # формат вывода в stdout ("text" | "json"), файл в JSON с ротацией по размеру (пусто — без файла;
+    # 5 МБ × 3 — как у json-file в compose), ёмкость очереди до фонового писателя
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "telebot=ERROR")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_FILE = os.getenv("LOG_FILE", "app/logs/bot.log")
+    LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(5 * 1024 * 1024)))
+    LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "3"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # хендлеры дольше этого порога пишутся в лог с latency_ms (0 — не писать)
+    LOG_SLOW_HANDLER_MS = float(os.getenv("LOG_SLOW_HANDLER_MS", "1000"))
+
     # Список команд для меню бота (используем кортежи)
     BOT_COMMANDS = (
         BotCommand('start', 'Запуск бота и регистрация'),
@@ -3,12 +3,17 @@ from datetime import datetime
 from enum import IntEnum
 from peewee import (
     Model, AutoField, IntegerField, CharField, BooleanField,
-    DateTimeField, ForeignKeyField, TextField
+    DateTimeField, ForeignKeyField, TextField, FloatField, TimestampField, CompositeKey
 )
+from loguru import logger
+from playhouse.migrate import SqliteMigrator, migrate
 from .session import db  # общий экземпляр базы
+from app.utils.validators import parse_weight_volume
 
 # ---------- Базовая модель ----------
 class BaseModel(Model):
+    # ISO-строки; целыми секундами epoch хранит только Order (и архив с видами) — его фильтруют по периодам.
+    # Историю, переписку и вложения читают по заявке, пользователей — по tg_id, не по времени
     created_at = DateTimeField(default=datetime.now)
     updated_at = DateTimeField(default=datetime.now)
 
@@ -114,15 +119,24 @@ class Order(BaseModel):
     Заявка на перевозку
     """
     id = AutoField()
+    # время заявки хранится целыми секундами epoch (местное время), а не ISO-строкой: фильтр по периоду —
+    # сравнение чисел по индексу; наружу по-прежнему отдаётся datetime
+    created_at = TimestampField(default=datetime.now)
+    updated_at = TimestampField(default=datetime.now)
     dispatcher = ForeignKeyField(User, backref="orders", on_delete="CASCADE")  # кто создал
     driver = ForeignKeyField(User, backref="driver_orders", null=True, on_delete="SET NULL")  # назначенный водитель
 
     prefix = IntegerField(default=int(OrderPrefix.WITH_VAT))  # OrderPrefix
     from_addr = CharField() #
     to_addr = CharField() #
-    datetime = DateTimeField(default=datetime.now)  # ⚡️ Автоматически ставим дату создания
+    datetime = TimestampField(default=datetime.now)  # ⚡️ Автоматически ставим дату создания
+    # день перевозки (date.toordinal() от datetime) — группировка по дням без strftime по каждой строке
+    day_bucket = IntegerField(null=True)
     cargo_type = CharField(null=True)
     weight_volume = CharField(null=True)
+    # разобранный при записи weight_volume (utils/validators.py: parse_weight_volume) — для SUM в отчётах
+    weight_kg = FloatField(null=True)
+    volume_m3 = FloatField(null=True)
     comment = TextField(null=True)
 
     status = IntegerField(default=int(OrderStatus.NEW))  # OrderStatus
@@ -130,9 +144,33 @@ class Order(BaseModel):
 
     file_path = CharField(null=True)  # накладные, фото и т.д.
 
+    # увеличивается при каждой смене статуса (compare-and-set в services/transitions.py)
+    version = IntegerField(default=0)
+
     class Meta:
         table_name = "orders"
         database = db
+        # save() пишет только изменённые поля: правка адреса устаревшим объектом не затрёт статус,
+        # который успел поменять другой поток
+        only_save_dirty = True
+        # покрывающий индекс: тоннаж и объём за период считаются SUM по индексу, без чтения строк
+        indexes = (
+            (("datetime", "status", "weight_kg", "volume_m3"), False),
+            (("day_bucket", "status"), False),
+        )
+
+    def save(self, *args, **kwargs):
+        self.day_bucket = to_day_bucket(self.datetime)
+        return super().save(*args, **kwargs)
+
+
+def to_day_bucket(value) -> int | None:
+    """Номер дня для Order.day_bucket: datetime или секунды epoch -> date.toordinal()."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value)
+    return value.toordinal()
 
 # ---------- История статусов ----------
 class OrderStatusHistory(BaseModel):
@@ -170,6 +208,113 @@ class Attachment(BaseModel):
     class Meta:
         table_name = "attachments"
 
+
+# ---------- Обработанные апдейты (защита от повторной обработки) ----------
+class ProcessedUpdate(Model):
+    update_id = IntegerField(primary_key=True)
+    created_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        database = db
+        table_name = "processed_updates"
+
+# ---------- Архив завершённых заявок (services/archive.py) ----------
+# Доставленные/отменённые заявки старше ARCHIVE_AFTER_DAYS переезжают сюда вместе с историей статусов,
+# сообщениями и вложениями (номера заявок сохраняются) — горячая orders остаётся маленькой.
+class OrderArchive(Order):
+    class Meta:
+        table_name = "orders_archive"
+        # архив пишется только переносом, поэтому индексы под отчёты по истории почти бесплатны
+        indexes = (
+            (("datetime", "status", "weight_kg", "volume_m3"), False),
+            (("day_bucket", "status"), False),
+            (("created_at",), False),
+        )
+
+
+class OrderStatusHistoryArchive(OrderStatusHistory):
+    order = ForeignKeyField(OrderArchive, backref="status_history", on_delete="CASCADE")
+
+    class Meta:
+        table_name = "order_status_history_archive"
+
+
+class OrderMessageArchive(OrderMessage):
+    order = ForeignKeyField(OrderArchive, backref="messages", on_delete="CASCADE")
+
+    class Meta:
+        table_name = "order_messages_archive"
+
+
+class AttachmentArchive(Attachment):
+    order = ForeignKeyField(OrderArchive, backref="attachments", on_delete="CASCADE")
+
+    class Meta:
+        table_name = "attachments_archive"
+
+
+# ---------- Заявки вместе с архивом (только чтение) ----------
+# VIEW "<таблица>_all" = горячая таблица UNION ALL архив. Для истории, статистики и экспорта;
+# условия WHERE SQLite переносит внутрь обеих веток, так что индексы работают.
+class OrderAll(Order):
+    class Meta:
+        table_name = "orders_all"
+
+
+class OrderStatusHistoryAll(OrderStatusHistory):
+    order = ForeignKeyField(OrderAll, backref="status_history")
+
+    class Meta:
+        table_name = "order_status_history_all"
+
+
+class OrderMessageAll(OrderMessage):
+    order = ForeignKeyField(OrderAll, backref="messages")
+
+    class Meta:
+        table_name = "order_messages_all"
+
+
+class AttachmentAll(Attachment):
+    order = ForeignKeyField(OrderAll, backref="attachments")
+
+    class Meta:
+        table_name = "attachments_all"
+
+
+# (горячая модель, архивная, представление)
+ARCHIVE_MODELS = (
+    (Order, OrderArchive, OrderAll),
+    (OrderStatusHistory, OrderStatusHistoryArchive, OrderStatusHistoryAll),
+    (OrderMessage, OrderMessageArchive, OrderMessageAll),
+    (Attachment, AttachmentArchive, AttachmentAll),
+)
+
+
+# ---------- Дневные сводки по заявкам (services/rollup.py) ----------
+# Счётчики за день в разрезе: всё ("all", 0), диспетчер, водитель, префикс (OrderPrefix), статус (OrderStatus).
+# Пополняются подписчиком шины событий; аналитика читает десятки строк вместо подсчёта по orders.
+class OrderDailyStat(Model):
+    day = IntegerField()                    # date.toordinal() дня события
+    dimension = CharField()                 # "all" | "dispatcher" | "driver" | "prefix" | "status"
+    key = IntegerField(default=0)           # id пользователя / OrderPrefix / OrderStatus; 0 для "all"
+
+    created = IntegerField(default=0)       # создано заявок
+    transitions = IntegerField(default=0)   # смен статуса (для "status" — переходов в этот статус)
+    delivered = IntegerField(default=0)
+    on_time = IntegerField(default=0)       # доставлено не позже дня перевозки (Order.day_bucket)
+    cancelled = IntegerField(default=0)
+    lead_seconds = IntegerField(default=0)  # сумма времени от создания заявки до доставки
+
+    class Meta:
+        database = db
+        table_name = "order_daily_stats"
+        # ряд дней одного разреза — диапазон по ключу; (dimension, day) — «лучшие за период» по разрезу
+        primary_key = CompositeKey("dimension", "key", "day")
+        indexes = (
+            (("dimension", "day"), False),
+        )
+
 #
 # # ---------- Чат по заявке ----------
 # class ChatMessage(BaseModel):
@@ -187,7 +332,113 @@ class Attachment(BaseModel):
 # ---------- Инициализация ----------
 def create_all_tables():
     with db:
-        db.create_tables([User, Order, OrderStatusHistory, Attachment, OrderMessage])
+        # сначала колонки: create_tables(safe=True) досоздаёт индексы и у существующих таблиц, а индекс
+        # на ещё не добавленную колонку SQLite принял бы за индекс по строковой константе "weight_kg"
+        migrate_schema()
+        db.create_tables([User, Order, OrderStatusHistory, Attachment, OrderMessage, ProcessedUpdate,
+                          OrderArchive, OrderStatusHistoryArchive, OrderMessageArchive, AttachmentArchive,
+                          OrderDailyStat])
+        create_archive_views()
+
+
+def migrate_schema():
+    """
+    Досоздаёт колонки, добавленные в модели после создания таблиц.
+    create_tables() не трогает существующие таблицы, поэтому новые поля добавляем через ALTER TABLE.
+    Таблиц, которых ещё нет, не касается — их целиком создаст create_tables().
+    """
+    migrator = SqliteMigrator(db)
+    for model in (User, Order, OrderStatusHistory, Attachment, OrderMessage,
+                  OrderArchive, OrderStatusHistoryArchive, OrderMessageArchive, AttachmentArchive):
+        table = model._meta.table_name
+        if not db.table_exists(table):
+            continue
+        existing = {c.name for c in db.get_columns(table)}
+        missing = [f for f in model._meta.sorted_fields if f.column_name not in existing]
+        if missing:
+            with db.atomic():
+                migrate(*[migrator.add_column(table, f.column_name, f) for f in missing])
+            if issubclass(model, Order) and any(f.name == "weight_kg" for f in missing):
+                backfill_weight_volume(model)
+            if issubclass(model, Order) and any(f.name == "day_bucket" for f in missing):
+                convert_order_timestamps(model)
+
+
+def backfill_weight_volume(model=Order, batch_size: int = 1000) -> int:
+    """
+    Разбирает weight_volume уже существующих заявок в weight_kg / volume_m3.
+    Идёт по id пачками, каждая пачка — своя короткая транзакция с одним executemany подготовленного UPDATE;
+    нераспознанный текст остаётся как есть.
+    """
+    table = model._meta.table_name
+    sql = f'UPDATE "{table}" SET "weight_kg" = ?, "volume_m3" = ? WHERE "id" = ?'
+    last_id, updated = 0, 0
+    while True:
+        rows = list(model.select(model.id, model.weight_volume)
+                    .where((model.id > last_id) & model.weight_volume.is_null(False))
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .tuples())
+        if not rows:
+            return updated
+        values = []
+        for order_id, text in rows:
+            weight_kg, volume_m3, _ = parse_weight_volume(text)
+            if weight_kg is not None or volume_m3 is not None:
+                values.append((weight_kg, volume_m3, order_id))
+        if values:
+            with db.atomic():
+                db.cursor().executemany(sql, values)
+            updated += len(values)
+        last_id = rows[-1][0]
+
+
+# ISO-строка местного времени -> секунды epoch, как пишет TimestampField (time.mktime): доли секунды
+# отбрасываются (substr, mktime их тоже не видит), 'utc' переводит местное время в UTC, '%s' даёт секунды;
+# нераспознанная строка остаётся как есть. С mktime может разойтись только час перевода часов.
+# day_bucket — date.toordinal(): julianday('0001-01-01') = 1721425.5, и toordinal() этого дня — 1
+_TO_EPOCH = ('"{col}" = CASE WHEN typeof("{col}") = \'text\' '
+             'THEN coalesce(CAST(strftime(\'%s\', substr("{col}", 1, 19), \'utc\') AS INTEGER), "{col}") '
+             'ELSE "{col}" END')
+_DAY_BUCKET = ('"day_bucket" = CAST(julianday(CASE WHEN typeof("datetime") = \'text\' THEN "datetime" '
+               'ELSE datetime("datetime", \'unixepoch\', \'localtime\') END) - 1721424.5 AS INTEGER)')
+
+
+def convert_order_timestamps(model=Order, batch_size: int = 5000) -> int:
+    """
+    Переводит created_at / updated_at / datetime заявок из ISO-строк в секунды epoch и заполняет day_bucket.
+    Один UPDATE на диапазон id из batch_size заявок (каждый — своя транзакция), без чтения строк в Python;
+    уже числовые значения остаются как есть. Миграция идёт при старте, до polling, поэтому должна быть быстрой.
+    """
+    table = model._meta.table_name
+    sets = ", ".join(_TO_EPOCH.format(col=column) for column in ("created_at", "updated_at", "datetime"))
+    sql = f'UPDATE "{table}" SET {sets}, {_DAY_BUCKET} WHERE "id" > ? AND "id" <= ?'
+    last_id = db.execute_sql(f'SELECT MAX("id") FROM "{table}"').fetchone()[0] or 0
+    converted = 0
+    for start in range(0, last_id, batch_size):
+        with db.atomic():
+            converted += db.execute_sql(sql, (start, start + batch_size)).rowcount
+    for order_id, *values in db.execute_sql(
+            f'SELECT "id", "created_at", "updated_at", "datetime" FROM "{table}" WHERE typeof("created_at") = \'text\' '
+            f'OR typeof("updated_at") = \'text\' OR typeof("datetime") = \'text\'').fetchall():
+        logger.warning(f"Order #{order_id}: unrecognized timestamp {values!r}, left as text")
+        converted -= 1
+    return converted
+
+
+def create_archive_views():
+    """
+    Пересоздаёт представления "<таблица>_all" по текущему списку полей моделей
+    (после migrate_schema у горячей и архивной таблицы одинаковые колонки, но порядок может отличаться).
+    """
+    for hot, archive, view in ARCHIVE_MODELS:
+        columns = ", ".join(f'"{f.column_name}"' for f in hot._meta.sorted_fields)
+        name = view._meta.table_name
+        with db.atomic():
+            db.execute_sql(f'DROP VIEW IF EXISTS "{name}"')
+            db.execute_sql(f'CREATE VIEW "{name}" AS '
+                           f'SELECT {columns} FROM "{hot._meta.table_name}" '
+                           f'UNION ALL SELECT {columns} FROM "{archive._meta.table_name}"')
 
 # def create_driver_row(tg_id,
 #                      tg_chat_id,
@@ -1,4 +1,5 @@
 import os
+import time
 from pathlib import Path
 from peewee import SqliteDatabase
 
@@ -15,8 +16,33 @@ if not db_path:
 else:
     db_path = Path(db_path)
 
+
+class ObservedSqliteDatabase(SqliteDatabase):
+    """
+    SqliteDatabase, сообщающая наблюдателям о каждом выполненном запросе: observer(sql, params, seconds).
+    Пока наблюдателей нет, execute_sql работает как обычно.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.observers = []
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        if not self.observers:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            for observer in self.observers:
+                observer(sql, params, elapsed)
+
+
 # 3. Создаём подключение
-db = SqliteDatabase(str(db_path))
+# WAL: читатели не блокируют писателя — база общая для потоков и процессов-воркеров супервизора;
+# busy_timeout — ждать освобождения блокировки, а не падать с "database is locked"
+db = ObservedSqliteDatabase(str(db_path), pragmas={"journal_mode": "wal", "busy_timeout": 5000})
 
 
 
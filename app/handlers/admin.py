@@ -0,0 +1,141 @@
+# handlers/admin.py
+import html
+import io
+import time
+
+from telebot import TeleBot, types
+
+from app.config.settings import settings
+from app.database.models import OrderStatus
+from app.services import state_machine
+from app.services.archive import archiver
+from app.services.metrics import metrics
+from app.services.profiler import profiler
+from app.services.slow_queries import query_log
+
+_SORT_KEYS = {"p95": "p95_ms", "p99": "p99_ms", "calls": "calls", "errors": "errors", "db": "db_queries",
+              "api": "api_calls"}
+
+
+def _status_name(value: int) -> str:
+    try:
+        return OrderStatus(value).label
+    except ValueError:
+        return "*"
+
+
+def format_perf_report(sort: str = "p95", top: int = 15) -> str:
+    """Текст /perf: самые медленные хендлеры за окно, источники и переходы статусов."""
+    key = _SORT_KEYS.get(sort, "p95_ms")
+    snapshot = metrics.snapshot()
+    rows = sorted(snapshot.items(), key=lambda kv: kv[1][key], reverse=True)[:top]
+
+    lines = [f"{'handler':<34}{'n':>6}{'p50':>7}{'p95':>7}{'p99':>7}{'sql':>6}{'db95':>6}{'api':>5}{'err':>4}"]
+    for name, s in rows:
+        calls = s["calls"] or 1
+        lines.append(f"{name[-34:]:<34}{s['window_calls']:>6}{s['p50_ms']:>7.0f}{s['p95_ms']:>7.0f}"
+                     f"{s['p99_ms']:>7.0f}{s['db_queries'] / calls:>6.1f}{s['db_p95_ms']:>6.0f}"
+                     f"{s['api_calls'] / calls:>5.1f}{s['errors']:>4}")
+    if not rows:
+        lines.append("нет данных")
+
+    for name, values in metrics.sources().items():
+        compact = ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items())
+        lines.append(f"\n{name}: {compact}")
+
+    transitions = sorted(state_machine.stats.snapshot().items(), key=lambda kv: kv[1]["count"], reverse=True)
+    if transitions:
+        lines.append(f"\nпереходы (конфликтов: {state_machine.stats.conflicts}):")
+        for (from_status, to_status), t in transitions[:8]:
+            lines.append(f"  {_status_name(from_status)} → {_status_name(to_status)}: "
+                         f"{t['count']} шт, avg {t['avg_ms']:.1f} мс, max {t['max_ms']:.1f} мс")
+
+    errors = [(name, s["last_error"]) for name, s in rows if s["last_error"]]
+    for name, error in errors[:3]:
+        lines.append(f"\n{name}: {error}")
+
+    text = "\n".join(lines)
+    header = (f"⏱ Хендлеры за {metrics.window / 60:.0f} мин (мс; sql/api — на вызов с запуска), "
+              f"сортировка: {sort}\n")
+    return header + "<pre>" + html.escape(text[:3800]) + "</pre>"
+
+
+def register_admin_handlers(bot: TeleBot):
+    """Служебные команды для ADMIN_IDS."""
+
+    @bot.message_handler(commands=["perf"])
+    def cmd_perf(message: types.Message):
+        """
+        /perf [p95|p99|calls|errors|db|api] — сводка по производительности хендлеров.
+        """
+        if message.from_user.id not in settings.ADMIN_IDS:
+            return
+        parts = (message.text or "").split()
+        sort = parts[1] if len(parts) > 1 and parts[1] in _SORT_KEYS else "p95"
+        bot.send_message(message.chat.id, format_perf_report(sort), parse_mode="HTML")
+
+    @bot.message_handler(commands=["slow"])
+    def cmd_slow(message: types.Message):
+        """
+        /slow [N] [reset] — топ-N SQL по суммарному времени со строками EXPLAIN QUERY PLAN (полные сканы помечены).
+        """
+        if message.from_user.id not in settings.ADMIN_IDS:
+            return
+        parts = (message.text or "").split()[1:]
+        top = next((int(p) for p in parts if p.isdigit()), None)
+        bot.send_message(message.chat.id, query_log.digest(top), parse_mode="HTML")
+        if "reset" in parts:
+            query_log.reset()
+
+    @bot.message_handler(commands=["profiler"])
+    def cmd_profiler(message: types.Message):
+        """
+        /profiler [N] — снять профиль всех потоков за N секунд (по умолчанию 30) и прислать collapsed-стеки;
+        /profiler stop — остановить досрочно.
+        """
+        if message.from_user.id not in settings.ADMIN_IDS:
+            return
+        parts = (message.text or "").split()[1:]
+        if parts and parts[0] == "stop":
+            if profiler.running:
+                profiler.stop()
+            else:
+                bot.send_message(message.chat.id, "Профилировщик не запущен.")
+            return
+
+        seconds = float(parts[0]) if parts and parts[0].replace(".", "", 1).isdigit() else 30.0
+        chat_id = message.chat.id
+
+        def deliver(p):
+            if not p.samples:
+                bot.send_message(chat_id, "Профиль пуст.")
+                return
+            name = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.collapsed.txt"
+            bot.send_document(chat_id, io.BytesIO(p.collapsed().encode()), visible_file_name=name,
+                              caption=p.summary())
+
+        if not profiler.start(seconds, on_done=deliver):
+            bot.send_message(chat_id, "Профилировщик уже запущен. Остановить: /profiler stop")
+            return
+        bot.send_message(chat_id, f"🔥 Профилирую {min(seconds, profiler.max_seconds):.0f} с "
+                                  f"(шаг {profiler.interval * 1000:.0f} мс). Остановить: /profiler stop")
+
+    @bot.message_handler(commands=["archive"])
+    def cmd_archive(message: types.Message):
+        """
+        /archive — сколько заявок в горячей таблице и в архиве; /archive run — перенести старые завершённые сейчас.
+        """
+        if message.from_user.id not in settings.ADMIN_IDS:
+            return
+        parts = (message.text or "").split()[1:]
+        if parts and parts[0] == "run":
+            if archiver.after_days <= 0:
+                bot.send_message(message.chat.id, "Архив выключен (ARCHIVE_AFTER_DAYS=0).")
+                return
+            moved = archiver.run()
+            bot.send_message(message.chat.id, f"🗄 Перенесено в архив: {moved}")
+        counts = archiver.counts()
+        last = f"{archiver.last_run:%d.%m %H:%M} ({archiver.last_moved} шт)" if archiver.last_run else "ещё не было"
+        bot.send_message(message.chat.id,
+                         f"🗄 Заявки: активная таблица {counts['hot']}, архив {counts['archive']}\n"
+                         f"Порог: завершённые старше {archiver.after_days:g} дн., последний перенос: {last}")
@@ -16,7 +16,9 @@ from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-from app.database.models import Order, User, UserRole, OrderStatus, OrderPrefix, Attachment
+from app.database.models import Order, OrderAll, User, UserRole, OrderStatus, OrderPrefix, AttachmentAll
+from app.services.archive import find_order
+from app.services.order_import import ORDER_COLUMNS
 from app.states.request_states import RequestsStates
 # Путь(ы) где искать TTF-шрифты (попробуем несколько типичных)
 _TRY_TTF_PATHS = [
@@ -79,18 +81,18 @@ def register_attachments_reports_handlers(bot: TeleBot):
         period in {"week", "month", "all"}.
         """
         now = datetime.now()
-        q = Order.select().order_by(Order.datetime.desc())
+        q = OrderAll.select().order_by(OrderAll.datetime.desc())  # вместе с архивом (services/archive.py)
         if period == "week":
             since = now - timedelta(days=7)
-            q = q.where(Order.datetime >= since)
+            q = q.where(OrderAll.datetime >= since)
         elif period == "month":
             since = now - timedelta(days=30)
-            q = q.where(Order.datetime >= since)
+            q = q.where(OrderAll.datetime >= since)
         # фильтр по роли
         if int(user.role) == int(UserRole.MANAGER):
             return list(q)
         elif int(user.role) == int(UserRole.DISPATCHER):
-            return list(q.where(Order.dispatcher == user))
+            return list(q.where(OrderAll.dispatcher == user))
         else:
             return []
 
@@ -131,8 +133,7 @@ def register_attachments_reports_handlers(bot: TeleBot):
         ws = wb.active
         ws.title = "orders"
 
-        headers = ["ID", "Префикс", "Статус", "Дата", "Откуда", "Куда", "Диспетчер", "Водитель", "Тип груза", "Вес/объём", "Комментарий"]
-        ws.append(headers)
+        ws.append(list(ORDER_COLUMNS))  # те же колонки читает импорт (services/order_import.py)
 
         for o in orders:
             ws.append(_row_from_order(o))
@@ -226,7 +227,7 @@ def register_attachments_reports_handlers(bot: TeleBot):
         Отправляет список вложений (фото/документы) по заявке order в chat_id.
         Если attachments нет — сообщает.
         """
-        atts = list(Attachment.select().where(Attachment.order == order))
+        atts = list(AttachmentAll.select().where(AttachmentAll.order == order.id))
         if not atts:
             bot.send_message(chat_id, f"📎 В заявке #{order.id} нет вложений.")
             return
@@ -264,7 +265,7 @@ def register_attachments_reports_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "Неверный идентификатор заявки.")
             return
 
-        order = Order.get_or_none(Order.id == order_id)
+        order = find_order(order_id)
         user = User.get_or_none(User.tg_id == call.from_user.id)
         if not order:
             bot.answer_callback_query(call.id, "Заявка не найдена.")
@@ -306,7 +307,7 @@ def register_attachments_reports_handlers(bot: TeleBot):
             bot.send_message(message.chat.id, "❌ Не удалось распознать ID. Попробуйте ещё раз или отправьте /stop.")
             return
 
-        order = Order.get_or_none(Order.id == oid)
+        order = find_order(oid)
         if not order:
             bot.send_message(message.chat.id, f"❌ Заявка #{oid} не найдена.")
             bot.delete_state(message.from_user.id, message.chat.id)
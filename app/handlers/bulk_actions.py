@@ -0,0 +1,226 @@
+# handlers/bulk_actions.py
+import math
+
+from telebot import TeleBot, types
+from telebot.apihelper import ApiTelegramException
+
+from app.config.settings import settings
+from app.database.models import Order, OrderStatus, User, UserRole
+from app.keyboards.request_actions import get_bulk_select_keyboard
+from app.services import events, state_machine
+from app.services.events import bus
+from app.services.transitions import bulk_transition
+from app.states.request_states import RequestsStates
+from app.utils.formatters import format_order_numbers
+
+# действие -> целевой статус
+BULK_TARGETS = {
+    state_machine.CANCEL: int(OrderStatus.CANCELLED),
+    state_machine.CLOSE: int(OrderStatus.DELIVERED),
+}
+_ROLES = {int(UserRole.DISPATCHER): "dispatcher", int(UserRole.MANAGER): "manager"}
+_DONE = {
+    state_machine.CANCEL: "❌ Отменено заявок",
+    state_machine.CLOSE: "📦 Отмечено доставленными",
+}
+_CANCEL_WORDS = ("отмена", "❌ отмена", "/cancel")
+
+
+def _bulk_user(tg_id: int) -> tuple[User | None, str | None]:
+    """Пользователь и его роль ("dispatcher" / "manager"), если ему доступны массовые действия."""
+    user = User.get_or_none(User.tg_id == tg_id)
+    if not user or int(user.role) not in _ROLES:
+        return None, None
+    return user, _ROLES[int(user.role)]
+
+
+def _statuses(role: str) -> tuple[int, ...]:
+    """Вкладки списка выбора: статусы, в которых роли доступно хотя бы одно массовое действие."""
+    return tuple(sorted({s for action in BULK_TARGETS for s in state_machine.statuses_with(role, action)}))
+
+
+def _actions(role: str, selected: dict) -> tuple[str, ...]:
+    """Действия, применимые хотя бы к одной выбранной заявке (по статусу на момент выбора)."""
+    return tuple(action for action in BULK_TARGETS
+                 if any(state_machine.can(role, status, action) for status in selected.values()))
+
+
+def _page(user: User, role: str, status: int, page: int) -> tuple[list[Order], int, int]:
+    """Заявки страницы списка: диспетчер видит свои, руководитель — все. Возвращает (заявки, страница, страниц)."""
+    query = Order.select(Order.id, Order.status, Order.from_addr, Order.to_addr, Order.datetime).where(
+        Order.status == status)
+    if role == "dispatcher":
+        query = query.where(Order.dispatcher == user)
+    pages = max(1, math.ceil(query.count() / settings.BULK_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    orders = list(query.order_by(Order.datetime.desc(), Order.id.desc()).paginate(page + 1, settings.BULK_PAGE_SIZE))
+    return orders, page, pages
+
+
+def _screen(user: User, role: str, data: dict) -> tuple[str, types.InlineKeyboardMarkup]:
+    orders, data["bulk_page"], pages = _page(user, role, data["bulk_status"], data["bulk_page"])
+    data["bulk_visible"] = {o.id: int(o.status) for o in orders}
+    selected = data["bulk_selected"]
+    text = (f"☑️ Выбор заявок — «{OrderStatus(data['bulk_status']).label}»\n"
+            f"Выбрано: {len(selected)} (максимум {settings.BULK_MAX_SELECTED})\n\n"
+            f"Отметьте заявки (можно на разных вкладках и страницах) и выберите действие.")
+    if not orders:
+        text += "\n\n📭 Заявок в этом статусе нет."
+    kb = get_bulk_select_keyboard(orders, set(selected), data["bulk_status"], _statuses(role), data["bulk_page"],
+                                  pages, _actions(role, selected))
+    return text, kb
+
+
+def _summary(action: str, result) -> str:
+    ids = [o.id for o in result.updated]
+    text = f"{_DONE[action]}: {len(ids)}"
+    if ids:
+        text += f" ({format_order_numbers(ids)})"
+    if result.skipped:
+        text += (f"\n⚠️ Не изменены ({len(result.skipped)}): {format_order_numbers(result.skipped)} — "
+                 f"статус не подходит для действия (или уже изменился) либо заявка недоступна.")
+    return text
+
+
+def register_bulk_actions_handlers(bot: TeleBot):
+    """
+    Массовые действия диспетчера и руководителя: выбор заявок в постраничном списке и одно действие
+    на весь выбор (services/transitions.bulk_transition — один UPDATE и insert_many истории в одной транзакции,
+    уведомления — одна сводка каждому участнику).
+    Выбор хранится в данных состояния RequestsStates.bulk_select: {id заявки: статус при выборе}.
+    """
+
+    def _in_bulk_mode(user_id: int, chat_id: int) -> bool:
+        return bot.get_state(user_id, chat_id) in (RequestsStates.bulk_select.name,
+                                                   RequestsStates.bulk_cancel_reason.name)
+
+    def _show(chat_id: int, user: User, role: str, data: dict, message_id: int | None = None) -> None:
+        text, kb = _screen(user, role, data)
+        if message_id is None:
+            bot.send_message(chat_id, text, reply_markup=kb)
+            return
+        try:
+            bot.edit_message_text(text, chat_id, message_id, reply_markup=kb)
+        except ApiTelegramException as e:
+            if "message is not modified" not in str(e):
+                raise
+
+    def _apply(chat_id: int, user_id: int, user: User, role: str, action: str, reason: str | None = None) -> None:
+        with bot.retrieve_data(user_id, chat_id) as data:
+            selected = dict(data["bulk_selected"])
+        to_status = BULK_TARGETS[action]
+        fields, note = {}, "Отмечена доставленной (массовое действие)"
+        if action == state_machine.CANCEL:
+            fields, note = {"cancel_reason": reason}, f"Отменена: {reason}"
+        result = bulk_transition(list(selected), user, state_machine.statuses_with(role, action), to_status,
+                                 dispatcher=user if role == "dispatcher" else None, note=note, **fields)
+        if result.updated:
+            bus.publish(events.ORDERS_STATUS_CHANGED, actor=user, orders=result.updated, status=to_status,
+                        prev_statuses=result.prev_statuses, reason=reason)
+        bot.send_message(chat_id, _summary(action, result))
+
+        bot.set_state(user_id, RequestsStates.bulk_select, chat_id)
+        with bot.retrieve_data(user_id, chat_id) as data:
+            data["bulk_selected"] = {}
+            _show(chat_id, user, role, data)
+
+    @bot.callback_query_handler(func=lambda c: c.data == "bulk_open")
+    def cb_bulk_open(call: types.CallbackQuery):
+        user, role = _bulk_user(call.from_user.id)
+        if not user:
+            bot.answer_callback_query(call.id, "❌ Доступно диспетчеру и руководителю.")
+            return
+        bot.answer_callback_query(call.id)
+        bot.delete_state(call.from_user.id, call.message.chat.id)
+        bot.set_state(call.from_user.id, RequestsStates.bulk_select, call.message.chat.id)
+        with bot.retrieve_data(call.from_user.id, call.message.chat.id) as data:
+            data.update(bulk_status=_statuses(role)[0], bulk_page=0, bulk_selected={})
+            _show(call.message.chat.id, user, role, data)
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("bulk:"))
+    def cb_bulk(call: types.CallbackQuery):
+        user, role = _bulk_user(call.from_user.id)
+        if not user:
+            bot.answer_callback_query(call.id, "❌ Доступно диспетчеру и руководителю.")
+            return
+        chat_id, message_id = call.message.chat.id, call.message.message_id
+        if not _in_bulk_mode(call.from_user.id, chat_id):
+            bot.answer_callback_query(call.id, "Режим выбора закрыт — откройте список заново.")
+            return
+
+        command, _, arg = call.data[len("bulk:"):].partition(":")
+        if command == "noop":
+            bot.answer_callback_query(call.id)
+            return
+        if command == "exit":
+            bot.delete_state(call.from_user.id, chat_id)
+            bot.answer_callback_query(call.id)
+            bot.edit_message_text("Режим выбора закрыт.", chat_id, message_id)
+            return
+        if command == "ok" and arg == state_machine.CLOSE:
+            bot.answer_callback_query(call.id)
+            bot.edit_message_text("⏳ Применяю…", chat_id, message_id)
+            _apply(chat_id, call.from_user.id, user, role, arg)
+            return
+
+        notice = None
+        with bot.retrieve_data(call.from_user.id, chat_id) as data:
+            selected, visible = data["bulk_selected"], data.get("bulk_visible", {})
+            room = settings.BULK_MAX_SELECTED - len(selected)
+            if command == "f" and arg.isdigit() and int(arg) in _statuses(role):
+                data["bulk_status"], data["bulk_page"] = int(arg), 0
+            elif command == "p" and arg.isdigit():
+                data["bulk_page"] = int(arg)
+            elif command == "t" and arg.isdigit():
+                order_id = int(arg)
+                if order_id in selected:
+                    del selected[order_id]
+                elif order_id not in visible:
+                    notice = "Заявка уже не в этом списке."
+                elif room <= 0:
+                    notice = f"Можно выбрать не больше {settings.BULK_MAX_SELECTED} заявок."
+                else:
+                    selected[order_id] = visible[order_id]
+            elif command == "all":
+                fresh = [i for i in visible if i not in selected]
+                selected.update((i, visible[i]) for i in fresh[:max(room, 0)])
+                if len(fresh) > room:
+                    notice = f"Можно выбрать не больше {settings.BULK_MAX_SELECTED} заявок."
+            elif command == "clr":
+                selected.clear()
+            elif command == "do" and arg in BULK_TARGETS:
+                if not selected or arg not in _actions(role, selected):
+                    bot.answer_callback_query(call.id, "Нет выбранных заявок для этого действия.")
+                    return
+                if arg == state_machine.CANCEL:
+                    bot.set_state(call.from_user.id, RequestsStates.bulk_cancel_reason, chat_id)
+                    bot.answer_callback_query(call.id)
+                    bot.send_message(chat_id, f"Введите причину отмены для {len(selected)} заявок "
+                                              f"(или «отмена», чтобы вернуться к выбору):")
+                    return
+                kb = types.InlineKeyboardMarkup()
+                kb.add(types.InlineKeyboardButton("✅ Подтвердить", callback_data=f"bulk:ok:{arg}"),
+                       types.InlineKeyboardButton("⬅️ Назад", callback_data=f"bulk:p:{data['bulk_page']}"))
+                bot.answer_callback_query(call.id)
+                bot.edit_message_text(f"Отметить доставленными выбранные заявки ({len(selected)})?",
+                                      chat_id, message_id, reply_markup=kb)
+                return
+            else:
+                bot.answer_callback_query(call.id, "Неизвестное действие.")
+                return
+            bot.answer_callback_query(call.id, notice)
+            _show(chat_id, user, role, data, message_id)
+
+    @bot.message_handler(state=RequestsStates.bulk_cancel_reason)
+    def bulk_cancel_reason_step(message: types.Message):
+        user, role = _bulk_user(message.from_user.id)
+        if not user:
+            bot.delete_state(message.from_user.id, message.chat.id)
+            return
+        reason = (message.text or "").strip()
+        if reason.lower() in _CANCEL_WORDS:
+            bot.set_state(message.from_user.id, RequestsStates.bulk_select, message.chat.id)
+            with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+                _show(message.chat.id, user, role, data)
+            return
+        _apply(message.chat.id, message.from_user.id, user, role, state_machine.CANCEL, reason or "Без причины")
@@ -1,7 +1,8 @@
 # handlers/chat.py
 from datetime import datetime
 from telebot import TeleBot, types
-from app.database.models import Order, User, OrderMessage, Attachment, UserRole
+from app.database.models import Order, User, OrderMessage, OrderMessageAll, Attachment, UserRole
+from app.services.archive import find_order
 
 
 def register_chat_handlers(bot: TeleBot):
@@ -149,16 +150,16 @@ def register_chat_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "❌ Неверный идентификатор заявки.")
             return
 
-        order = Order.get_or_none(Order.id == order_id)
+        order = find_order(order_id)  # история доступна и для архивных заявок
         if not order:
             bot.answer_callback_query(call.id, "❌ Заявка не найдена.")
             return
 
         msgs = (
-            OrderMessage
+            OrderMessageAll
             .select()
-            .where(OrderMessage.order == order)
-            .order_by(OrderMessage.created_at)
+            .where(OrderMessageAll.order == order.id)
+            .order_by(OrderMessageAll.created_at)
         )
 
         if not msgs:
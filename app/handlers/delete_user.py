@@ -1,6 +1,8 @@
 # handlers/delete_user.py
 from telebot import TeleBot, types
 from app.database.models import User, UserRole
+from app.services import events
+from app.services.events import bus
 from loguru import logger
 
 def register_delete_user_handlers(bot: TeleBot):
@@ -73,6 +75,7 @@ def register_delete_user_handlers(bot: TeleBot):
             logger.exception("Deactivate self failed")
             bot.answer_callback_query(call.id, "Ошибка удаления. Попробуйте позже.")
             return
+        bus.publish(events.USER_CHANGED, actor=user, user=user)
 
         bot.answer_callback_query(call.id, "✅ Учётная запись деактивирована.")
         try:
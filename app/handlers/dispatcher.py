@@ -3,7 +3,7 @@ from telebot import TeleBot, types
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, timedelta
 from app.database.models import (
-    User, Order, OrderStatus, UserRole, OrderPrefix, Attachment, OrderStatusHistory
+    User, Order, OrderAll, OrderStatus, UserRole, OrderPrefix, Attachment, OrderStatusHistory
 )
 from app.keyboards.request_actions import (
     get_prefix_keyboard,
@@ -17,6 +17,15 @@ from app.keyboards.main_menu import get_main_menu
 from peewee import fn
 from app.states.request_states import RequestsStates
 from app.handlers.chat import register_chat_handlers
+from app.services import events
+from app.services.events import bus
+from app.services.transitions import assign_driver, transition
+from app.services.assignment import assignment
+from app.services.roster import RosterEntry, roster
+from app.services import order_import
+from app.services import state_machine
+from app.utils.validators import parse_weight_volume
+from app.config.settings import settings
 
 
 PREFIX_MAP = {
@@ -35,7 +44,7 @@ def register_dispatcher_handlers(bot: TeleBot):
         return order
 
     def _can_edit(order: Order) -> bool:
-        return int(order.status) in (int(OrderStatus.NEW), int(OrderStatus.CONFIRMED))
+        return state_machine.can(UserRole.DISPATCHER, order.status, state_machine.EDIT)
 
     def _send_actions(bot: TeleBot, chat_id: int, order: Order, title: str | None = None):
         markup = get_request_actions_keyboard(order, role="dispatcher", include_chat=True)
@@ -136,40 +145,55 @@ def register_dispatcher_handlers(bot: TeleBot):
             return
 
         bot.add_data(message.from_user.id, message.chat.id, order_prefix=int(PREFIX_MAP[text]))
-        drivers = User.select().where((User.role == int(UserRole.DRIVER)) & (User.is_active == True))
-        bot.send_message(message.chat.id, "Выберите водителя (или нажмите ❌ Без водителя):",
-                         reply_markup=get_drivers_keyboard(drivers))
-        bot.set_state(message.from_user.id, "order_driver", message.chat.id)
+        # водитель выбирается после адресов — подбор учитывает маршрут
+        bot.send_message(message.chat.id, "Введите адрес отправления (Точка А):",
+                         reply_markup=types.ReplyKeyboardRemove())
+        bot.set_state(message.from_user.id, "order_from_addr", message.chat.id)
+
+    def _send_driver_picker(chat_id: int, text: str, from_addr: str | None, to_addr: str | None,
+                            callback_prefix: str) -> None:
+        """
+        Inline-выбор водителя: кнопки несут id (callback_data <callback_prefix><id>, 0 — без водителя),
+        сверху ⭐ рекомендованные по загрузке, опыту на маршруте и недавней активности (services/assignment.py).
+        """
+        drivers = roster.drivers()
+        suggestions = assignment.suggest([d.id for d in drivers], from_addr, to_addr)
+        if suggestions:
+            text += "\n⭐ — рекомендуем: меньше заявок в работе, опыт на маршруте, недавняя активность."
+        bot.send_message(chat_id, text, reply_markup=get_drivers_keyboard(drivers, callback_prefix, suggestions))
+
+    def _picked_driver(call: types.CallbackQuery) -> tuple[bool, RosterEntry | None]:
+        """Водитель из callback_data выбора (последнее поле — id, 0 — без водителя): (найден, водитель)."""
+        driver_id = int(call.data.rsplit(":", 1)[1])
+        if not driver_id:
+            return True, None
+        driver = roster.get(driver_id, UserRole.DRIVER)
+        if not driver:
+            bot.answer_callback_query(call.id, "Водитель недоступен.")
+            return False, None
+        return True, driver
+
+    def _driver_name(driver: RosterEntry | None) -> str:
+        return driver.name if driver else "без водителя"
 
     @bot.message_handler(state="order_driver")
     def order_driver_step(message: types.Message):
-        raw = (message.text or "").strip()
+        bot.send_message(message.chat.id, "Выберите водителя кнопкой в сообщении выше.")
 
-        if raw == "❌ Без водителя":
-            bot.add_data(message.from_user.id, message.chat.id, driver_id=None)
-        else:
-            driver = None
-            if "(" in raw and ")" in raw and "@" in raw:
-                try:
-                    uname = raw.split("(")[1].split(")")[0].strip()
-                    if uname.startswith("@"):
-                        uname = uname[1:]
-                    driver = User.get_or_none((User.username == uname) & (User.role == int(UserRole.DRIVER)))
-                except Exception:
-                    driver = None
-            if not driver:
-                parts = raw.split(" (@")[0].split()
-                first = parts[0] if parts else ""
-                last = parts[1] if len(parts) > 1 else None
-                q = User.select().where((User.role == int(UserRole.DRIVER)) & (User.first_name == first))
-                if last:
-                    q = q.where(User.last_name == last)
-                driver = q.first()
-
-            bot.add_data(message.from_user.id, message.chat.id, driver_id=(driver.id if driver else None))
-
-        bot.send_message(message.chat.id, "Введите адрес отправления (Точка А):")
-        bot.set_state(message.from_user.id, "order_from_addr", message.chat.id)
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("order_driver_pick:"))
+    def cb_order_driver_pick(call: types.CallbackQuery):
+        """Выбор водителя при создании заявки: order_driver_pick:<id водителя> (0 — без водителя)."""
+        if bot.get_state(call.from_user.id, call.message.chat.id) != "order_driver":
+            bot.answer_callback_query(call.id, "Этот выбор уже неактуален.")
+            return
+        found, driver = _picked_driver(call)
+        if not found:
+            return
+        bot.add_data(call.from_user.id, call.message.chat.id, driver_id=(driver.id if driver else None))
+        bot.answer_callback_query(call.id)
+        bot.edit_message_text(f"🚛 Водитель: {_driver_name(driver)}", call.message.chat.id, call.message.message_id)
+        bot.send_message(call.message.chat.id, "Введите тип груза (опционально, можно оставить пустым):")
+        bot.set_state(call.from_user.id, "order_cargo", call.message.chat.id)
 
     @bot.message_handler(state="order_from_addr")
     def order_from_step(message: types.Message):
@@ -188,21 +212,28 @@ def register_dispatcher_handlers(bot: TeleBot):
             bot.send_message(message.chat.id, "❌ Укажите адрес назначения.")
             return
         bot.add_data(message.from_user.id, message.chat.id, to_addr=txt)
-        # Сразу к типу груза — шаг даты убран
-        bot.send_message(message.chat.id, "Введите тип груза (опционально, можно оставить пустым):")
-        bot.set_state(message.from_user.id, "order_cargo", message.chat.id)
+        # шаг даты убран: после адресов — водитель, затем тип груза
+        with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+            from_addr = data.get("from_addr")
+        _send_driver_picker(message.chat.id, "Выберите водителя:", from_addr, txt, "order_driver_pick:")
+        bot.set_state(message.from_user.id, "order_driver", message.chat.id)
 
     @bot.message_handler(state="order_cargo")
     def order_cargo_step(message: types.Message):
         cargo = (message.text or "").strip() or None
         bot.add_data(message.from_user.id, message.chat.id, cargo_type=cargo)
-        bot.send_message(message.chat.id, "Введите вес/объём (опционально):")
+        bot.send_message(message.chat.id, "Введите вес/объём (опционально), например «20 т» или «5 т / 30 м3»:")
         bot.set_state(message.from_user.id, "order_weight_volume", message.chat.id)
 
     @bot.message_handler(state="order_weight_volume")
     def order_weight_volume_step(message: types.Message):
         wv = (message.text or "").strip() or None
-        bot.add_data(message.from_user.id, message.chat.id, weight_volume=wv)
+        weight_kg, volume_m3, error = parse_weight_volume(wv)
+        if error:
+            bot.send_message(message.chat.id, f"❌ {error}. Введите вес/объём ещё раз:")
+            return
+        bot.add_data(message.from_user.id, message.chat.id, weight_volume=wv,
+                     weight_kg=weight_kg, volume_m3=volume_m3)
         bot.send_message(message.chat.id, "Комментарий (опционально):")
         bot.set_state(message.from_user.id, "order_comment", message.chat.id)
 
@@ -263,6 +294,8 @@ def register_dispatcher_handlers(bot: TeleBot):
                 datetime=exec_dt,
                 cargo_type=data.get("cargo_type"),
                 weight_volume=data.get("weight_volume"),
+                weight_kg=data.get("weight_kg"),
+                volume_m3=data.get("volume_m3"),
                 comment=data.get("comment"),
                 status=int(OrderStatus.NEW),
             )
@@ -276,6 +309,8 @@ def register_dispatcher_handlers(bot: TeleBot):
                     caption=first_file.get("caption"),
                 )
 
+            bus.publish(events.ORDER_CREATED, order=order, actor=dispatcher)
+
             bot.send_message(
                 message.chat.id,
                 f"✅ Заявка #{order.id} создана: «{from_addr} → {to_addr}»\n"
@@ -297,15 +332,14 @@ def register_dispatcher_handlers(bot: TeleBot):
         if not dispatcher:
             return
 
-        drivers = User.select().where((User.role == int(UserRole.DRIVER)) & (User.is_active == True)).order_by(
-            User.first_name, User.last_name)
+        drivers = roster.drivers()
         if not drivers:
             bot.send_message(message.chat.id, "Пока нет зарегистрированных водителей.")
             return
 
         for d in drivers:
             active_cnt = (Order.select()
-                          .where((Order.driver == d) &
+                          .where((Order.driver == d.id) &
                                  (Order.status.not_in([int(OrderStatus.DELIVERED), int(OrderStatus.CANCELLED)])))
                           .count())
             uname = f"@{d.username}" if d.username else ""
@@ -354,30 +388,31 @@ def register_dispatcher_handlers(bot: TeleBot):
         if not dispatcher:
             return
 
-        total = Order.select().where(Order.dispatcher == dispatcher).count()
-        by_status = (Order
-                     .select(Order.status, fn.COUNT(Order.id).alias("cnt"))
-                     .where(Order.dispatcher == dispatcher)
-                     .group_by(Order.status))
+        # вместе с архивом (services/archive.py)
+        total = OrderAll.select().where(OrderAll.dispatcher == dispatcher).count()
+        by_status = (OrderAll
+                     .select(OrderAll.status, fn.COUNT(OrderAll.id).alias("cnt"))
+                     .where(OrderAll.dispatcher == dispatcher)
+                     .group_by(OrderAll.status))
 
         status_counts = {OrderStatus(s.status).label: s.cnt for s in by_status}
-        delivered_week = (Order.select()
-                          .where((Order.dispatcher == dispatcher) &
-                                 (Order.status == int(OrderStatus.DELIVERED)) &
-                                 (Order.datetime >= datetime.now() - timedelta(days=7)))
+        delivered_week = (OrderAll.select()
+                          .where((OrderAll.dispatcher == dispatcher) &
+                                 (OrderAll.status == int(OrderStatus.DELIVERED)) &
+                                 (OrderAll.datetime >= datetime.now() - timedelta(days=7)))
                           .count())
-        delivered_month = (Order.select()
-                           .where((Order.dispatcher == dispatcher) &
-                                  (Order.status == int(OrderStatus.DELIVERED)) &
-                                  (Order.datetime >= datetime.now() - timedelta(days=30)))
+        delivered_month = (OrderAll.select()
+                           .where((OrderAll.dispatcher == dispatcher) &
+                                  (OrderAll.status == int(OrderStatus.DELIVERED)) &
+                                  (OrderAll.datetime >= datetime.now() - timedelta(days=30)))
                            .count())
 
-        top_drivers = (Order
-                       .select(Order.driver, fn.COUNT(Order.id).alias("cnt"))
-                       .where((Order.dispatcher == dispatcher) & (Order.status == int(OrderStatus.DELIVERED)) & (
-            Order.driver.is_null(False)))
-                       .group_by(Order.driver)
-                       .order_by(fn.COUNT(Order.id).desc())
+        top_drivers = (OrderAll
+                       .select(OrderAll.driver, fn.COUNT(OrderAll.id).alias("cnt"))
+                       .where((OrderAll.dispatcher == dispatcher) & (OrderAll.status == int(OrderStatus.DELIVERED)) & (
+            OrderAll.driver.is_null(False)))
+                       .group_by(OrderAll.driver)
+                       .order_by(fn.COUNT(OrderAll.id).desc())
                        .limit(5))
 
         lines = [
@@ -435,10 +470,10 @@ def register_dispatcher_handlers(bot: TeleBot):
             return
 
         week_ago = datetime.now() - timedelta(days=7)
-        orders = (Order
+        orders = (OrderAll
                   .select()
-                  .where((Order.dispatcher == user) & (Order.datetime >= week_ago))
-                  .order_by(Order.datetime.desc()))
+                  .where((OrderAll.dispatcher == user) & (OrderAll.datetime >= week_ago))
+                  .order_by(OrderAll.datetime.desc()))
 
         if not orders:
             bot.send_message(call.message.chat.id, "📭 За последнюю неделю заявок нет.")
@@ -456,10 +491,10 @@ def register_dispatcher_handlers(bot: TeleBot):
             bot.send_message(call.message.chat.id, "❌ Ошибка: пользователь не найден.")
             return
 
-        orders = (Order
+        orders = (OrderAll
                   .select()
-                  .where(Order.dispatcher == user)
-                  .order_by(Order.datetime.desc()))
+                  .where(OrderAll.dispatcher == user)
+                  .order_by(OrderAll.datetime.desc()))
 
         if not orders:
             bot.send_message(call.message.chat.id, "📭 У вас ещё нет заявок.")
@@ -581,6 +616,8 @@ def register_dispatcher_handlers(bot: TeleBot):
         order.from_addr = (message.text or "").strip()
         order.save()
         OrderStatusHistory.create(order=order, by_user=dispatcher, status=order.status, note="Изменена точка А")
+        bus.publish(events.ORDER_UPDATED, order=order, actor=dispatcher, field="from_addr",
+                    note=f"изменена точка А: {order.from_addr}")
         bot.send_message(message.chat.id, f"✅ Точка А обновлена для заявки #{order.id}")
         bot.delete_state(message.from_user.id, message.chat.id)
         _send_actions(bot, message.chat.id, order)
@@ -619,12 +656,15 @@ def register_dispatcher_handlers(bot: TeleBot):
         else:
             order.to_addr = message.text.strip()
             order.save()
+            actor = User.get(User.tg_id == message.from_user.id)
             OrderStatusHistory.create(
                 order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
+                by_user=actor,
                 status=order.status,
                 note="Изменена точка Б"
             )
+            bus.publish(events.ORDER_UPDATED, order=order, actor=actor, field="to_addr",
+                        note=f"изменена точка Б: {order.to_addr}")
             bot.send_message(message.chat.id, f"✅ Точка Б обновлена для заявки #{order.id}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -668,12 +708,15 @@ def register_dispatcher_handlers(bot: TeleBot):
         else:
             order.datetime = dt
             order.save()
+            actor = User.get(User.tg_id == message.from_user.id)
             OrderStatusHistory.create(
                 order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
+                by_user=actor,
                 status=order.status,
                 note="Изменена дата/время"
             )
+            bus.publish(events.ORDER_UPDATED, order=order, actor=actor, field="datetime",
+                        note=f"изменены дата/время: {order.datetime.strftime('%d.%m.%Y %H:%M')}")
             bot.send_message(message.chat.id, f"✅ Дата/время обновлены для заявки #{order.id}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -721,12 +764,15 @@ def register_dispatcher_handlers(bot: TeleBot):
         else:
             order.comment = (message.text or "").strip() or None
             order.save()
+            actor = User.get(User.tg_id == message.from_user.id)
             OrderStatusHistory.create(
                 order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
+                by_user=actor,
                 status=order.status,
                 note="Изменен комментарий"
             )
+            bus.publish(events.ORDER_UPDATED, order=order, actor=actor, field="comment",
+                        note="изменён комментарий")
             bot.send_message(message.chat.id, f"✅ Комментарий обновлён для заявки #{order.id}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -774,12 +820,15 @@ def register_dispatcher_handlers(bot: TeleBot):
         else:
             order.cargo_type = (message.text or "").strip() or None
             order.save()
+            actor = User.get(User.tg_id == message.from_user.id)
             OrderStatusHistory.create(
                 order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
+                by_user=actor,
                 status=order.status,
                 note="Изменен тип груза"
             )
+            bus.publish(events.ORDER_UPDATED, order=order, actor=actor, field="cargo_type",
+                        note=f"изменён тип груза: {order.cargo_type or '—'}")
             bot.send_message(message.chat.id, f"✅ Тип груза обновлён для заявки #{order.id}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -806,7 +855,7 @@ def register_dispatcher_handlers(bot: TeleBot):
         with bot.retrieve_data(call.from_user.id, call.message.chat.id) as data:
             data["order_id"] = order_id
 
-        bot.send_message(call.message.chat.id, "Введите вес/объем (строка, можно пусто):")
+        bot.send_message(call.message.chat.id, "Введите вес/объем (например «20 т» или «5 т / 30 м3», можно пусто):")
         bot.answer_callback_query(call.id)
 
     @bot.message_handler(state=RequestsStates.edit_weight)
@@ -821,18 +870,29 @@ def register_dispatcher_handlers(bot: TeleBot):
         with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
             order_id = data.get("order_id")
 
+        weight_volume = (message.text or "").strip() or None
+        weight_kg, volume_m3, error = parse_weight_volume(weight_volume)
+        if error:
+            bot.send_message(message.chat.id, f"❌ {error}. Введите вес/объём ещё раз:")
+            return
+
         order = Order.get_or_none(Order.id == order_id)
         if not order:
             bot.send_message(message.chat.id, "Заявка не найдена.")
         else:
-            order.weight_volume = (message.text or "").strip() or None
+            order.weight_volume = weight_volume
+            order.weight_kg = weight_kg
+            order.volume_m3 = volume_m3
             order.save()
+            actor = User.get(User.tg_id == message.from_user.id)
             OrderStatusHistory.create(
                 order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
+                by_user=actor,
                 status=order.status,
                 note="Изменён вес/объем"
             )
+            bus.publish(events.ORDER_UPDATED, order=order, actor=actor, field="weight_volume",
+                        note=f"изменён вес/объём: {order.weight_volume or '—'}")
             bot.send_message(message.chat.id, f"✅ Вес/объем обновлён для заявки #{order.id}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -841,10 +901,8 @@ def register_dispatcher_handlers(bot: TeleBot):
     @bot.callback_query_handler(func=lambda c: c.data.startswith("assign_driver:"))
     def cb_assign_driver(call: types.CallbackQuery):
         """
-        Старт назначения/переназначения водителя:
-        - ставит RequestsStates.assign_driver,
-        - кладет order_id в state,
-        - показывает клавиатуру выбора водителей (ReplyKeyboard).
+        Старт назначения/переназначения водителя: inline-список водителей,
+        кнопки — assign_pick:<id заявки>:<id водителя>.
         """
         if not _ensure_dispatcher_call(bot, call):
             return
@@ -855,74 +913,47 @@ def register_dispatcher_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "Ошибка ID заявки.")
             return
 
-        drivers = User.select().where(
-            (User.role == int(UserRole.DRIVER)) & (User.is_active == True)
-        )
-
-        bot.set_state(call.from_user.id, RequestsStates.assign_driver, call.message.chat.id)
-        with bot.retrieve_data(call.from_user.id, call.message.chat.id) as data:
-            data["order_id"] = order_id
-
-        bot.send_message(
-            call.message.chat.id,
-            "Выберите водителя:",
-            reply_markup=get_drivers_keyboard(drivers)
-        )
+        order = Order.get_or_none(Order.id == order_id)
+        if not order:
+            bot.answer_callback_query(call.id, "Заявка не найдена.")
+            return
+        if not state_machine.can("dispatcher", order.status, state_machine.ASSIGN):
+            bot.answer_callback_query(call.id,
+                                      f"В статусе «{OrderStatus(order.status).label}» водителя сменить нельзя.")
+            return
+        _send_driver_picker(call.message.chat.id, f"Выберите водителя для заявки #{order_id}:",
+                            order.from_addr, order.to_addr, f"assign_pick:{order_id}:")
         bot.answer_callback_query(call.id)
 
-    @bot.message_handler(state=RequestsStates.assign_driver)
-    def assign_driver_step(message: types.Message):
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("assign_pick:"))
+    def cb_assign_pick(call: types.CallbackQuery):
         """
-        Принимает выбор водителя из ReplyKeyboard, находит его в БД,
-        проставляет водителя в заявке; если статус был NEW — делает CONFIRMED.
-        Пишет запись в историю.
+        Назначение выбранного водителя: assign_pick:<id заявки>:<id водителя> (0 — снять водителя).
+        Выбор из устаревшего списка отклоняется, если заявка уже в статусе, где назначать нельзя.
         """
-        if not _ensure_dispatcher_msg(bot, message):
-            bot.delete_state(message.from_user.id, message.chat.id)
+        if not _ensure_dispatcher_call(bot, call):
             return
-
-        with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
-            order_id = data.get("order_id")
-
-        raw = (message.text or "").strip()
-
-        # Разбор текста кнопки формата "Имя Фамилия (@username)" или "Имя Фамилия"
-        driver = None
-        if "(" in raw and ")" in raw and "@" in raw:
-            try:
-                uname = raw.split("(")[1].split(")")[0].strip()
-                if uname.startswith("@"):
-                    uname = uname[1:]
-                driver = User.get_or_none((User.username == uname) & (User.role == int(UserRole.DRIVER)))
-            except Exception:
-                driver = None
-
-        if not driver:
-            parts = raw.split(" (@")[0].split()
-            first = parts[0] if parts else ""
-            last = parts[1] if len(parts) > 1 else None
-            q = User.select().where((User.role == int(UserRole.DRIVER)) & (User.first_name == first))
-            if last:
-                q = q.where(User.last_name == last)
-            driver = q.first()
-
-        order = Order.get_or_none(Order.id == order_id)
+        found, driver = _picked_driver(call)
+        if not found:
+            return
+        order = Order.get_or_none(Order.id == int(call.data.split(":")[1]))
         if not order:
-            bot.send_message(message.chat.id, "Заявка не найдена.")
-        else:
-            order.driver = driver
-            if order.status == int(OrderStatus.NEW):
-                order.status = int(OrderStatus.CONFIRMED)
-            order.save()
-            OrderStatusHistory.create(
-                order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
-                status=order.status,
-                note=f"Назначен водитель: {driver.first_name if driver else '—'}"
-            )
-            bot.send_message(message.chat.id, f"✅ Водитель обновлён для заявки #{order.id}")
-
-        bot.delete_state(message.from_user.id, message.chat.id)
+            bot.answer_callback_query(call.id, "Заявка не найдена.")
+            return
+        prev_driver = order.driver
+        actor = User.get(User.tg_id == call.from_user.id)
+        result = assign_driver(order, actor, "dispatcher", state_machine.ASSIGN, driver.id if driver else None,
+                               note=f"Назначен водитель: {driver.first_name if driver else '—'}")
+        if not result:
+            bot.answer_callback_query(call.id, result.reason)
+            return
+        bot.answer_callback_query(call.id)
+        bot.edit_message_text(f"👨‍💼 Водитель: {_driver_name(driver)}", call.message.chat.id,
+                              call.message.message_id)
+        bus.publish(events.ORDER_DRIVER_ASSIGNED, order=result.order, actor=actor,
+                    prev_driver_tg_id=(prev_driver.tg_id if prev_driver else None),
+                    prev_driver_id=(prev_driver.id if prev_driver else None))
+        bot.send_message(call.message.chat.id, f"✅ Водитель обновлён для заявки #{order.id}")
 
     # ===================== CANCEL: ОТМЕНА ЗАЯВКИ =====================
     @bot.callback_query_handler(func=lambda c: c.data.startswith("cancel_request:"))
@@ -947,7 +978,7 @@ def register_dispatcher_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "Заявка не найдена.")
             return
 
-        if order.status not in [int(OrderStatus.NEW), int(OrderStatus.CONFIRMED)]:
+        if not state_machine.can(UserRole.DISPATCHER, order.status, state_machine.CANCEL):
             bot.answer_callback_query(call.id, "Отмена доступна только для новых/подтвержденных.")
             return
 
@@ -975,20 +1006,81 @@ def register_dispatcher_handlers(bot: TeleBot):
         if not order:
             bot.send_message(message.chat.id, "Заявка не найдена.")
         else:
-            order.status = int(OrderStatus.CANCELLED)
-            order.cancel_reason = reason
-            order.save()
-            OrderStatusHistory.create(
-                order=order,
-                by_user=User.get(User.tg_id == message.from_user.id),
-                status=order.status,
-                note=f"Отменена: {reason}"
-            )
-            bot.send_message(message.chat.id, f"❌ Заявка #{order.id} отменена.\n🚫 Причина: {reason}")
+            prev_status = int(order.status)
+            actor = User.get(User.tg_id == message.from_user.id)
+            # пока диспетчер вводил причину, водитель мог уже выехать — отменяем только из NEW/CONFIRMED
+            result = transition(order.id, actor,
+                                state_machine.statuses_with(UserRole.DISPATCHER, state_machine.CANCEL),
+                                OrderStatus.CANCELLED, cancel_reason=reason, note=f"Отменена: {reason}")
+            if not result:
+                bot.send_message(message.chat.id, f"⚠️ Заявку #{order.id} не удалось отменить: {result.reason}")
+            else:
+                order = result.order
+                bus.publish(events.ORDER_STATUS_CHANGED, order=order, actor=actor,
+                            status=int(OrderStatus.CANCELLED), prev_status=prev_status, reason=reason)
+                bot.send_message(message.chat.id, f"❌ Заявка #{order.id} отменена.\n🚫 Причина: {reason}")
 
         bot.delete_state(message.from_user.id, message.chat.id)
 
 
+    # --------------------- ИМПОРТ ИЗ ФАЙЛА ---------------------
+    @bot.message_handler(func=lambda m: m.text == "📥 Импорт заявок")
+    def import_orders_start(message: types.Message):
+        if not _ensure_dispatcher_msg(bot, message):
+            return
+        bot.delete_state(message.from_user.id, message.chat.id)
+        bot.send_document(
+            message.chat.id, order_import.template_file(), visible_file_name="orders_template.xlsx",
+            caption="📥 Пришлите XLSX или CSV с заявками — колонки как в экспорте (шаблон выше).\n"
+                    "Обязательны «Откуда» и «Куда»; дата — ДД.ММ.ГГГГ ЧЧ:ММ, водитель — имя, "
+                    "«Имя Фамилия» или ID.\nСтроки с ошибками вернутся отдельным файлом.\n"
+                    "Для отмены напишите «отмена».",
+        )
+        bot.set_state(message.from_user.id, RequestsStates.import_orders, message.chat.id)
+
+    @bot.message_handler(state=RequestsStates.import_orders, content_types=["text"])
+    def import_orders_text(message: types.Message):
+        if (message.text or "").strip().lower() in ("отмена", "❌ отмена", "/cancel"):
+            bot.delete_state(message.from_user.id, message.chat.id)
+            bot.send_message(message.chat.id, "Импорт отменён.")
+            return
+        bot.send_message(message.chat.id, "Пришлите файл .xlsx или .csv (или напишите «отмена»).")
+
+    @bot.message_handler(state=RequestsStates.import_orders, content_types=["document"])
+    def import_orders_file(message: types.Message):
+        dispatcher = User.get_or_none(User.tg_id == message.from_user.id)
+        if not dispatcher or dispatcher.role != int(UserRole.DISPATCHER):
+            bot.delete_state(message.from_user.id, message.chat.id)
+            return
+        document = message.document
+        if document.file_size and document.file_size > 20 * 1024 * 1024:
+            bot.send_message(message.chat.id, "❌ Файл больше 20 МБ — разбейте его на части.")
+            return
+
+        content = bot.download_file(bot.get_file(document.file_id).file_path)
+        try:
+            # проверка по колонкам и INSERT пачками (services/order_import.py) — 10 тыс. строк за секунды
+            result = order_import.import_orders(content, document.file_name or "", dispatcher,
+                                                max_rows=settings.IMPORT_MAX_ROWS,
+                                                chunk=settings.IMPORT_CHUNK_SIZE)
+        except order_import.OrderImportError as e:
+            bot.send_message(message.chat.id, f"❌ {e}")
+            return
+        bot.delete_state(message.from_user.id, message.chat.id)
+
+        if result.orders:
+            bus.publish(events.ORDERS_IMPORTED, actor=dispatcher, orders=result.orders)
+        text = f"✅ Импортировано заявок: {len(result.orders)}"
+        if result.orders:
+            text += f" (#{result.orders[0].id}–#{result.orders[-1].id})"
+        if not result.rejected:
+            bot.send_message(message.chat.id, text)
+            return
+        data, name = order_import.rejected_file(result, document.file_name or "")
+        bot.send_document(message.chat.id, data, visible_file_name=name,
+                          caption=f"{text}\n⚠️ Строк с ошибками: {len(result.rejected)} — причины в колонке "
+                                  f"«{order_import.ERROR_COLUMN}». Исправьте и загрузите этот файл снова.")
+
     @bot.message_handler(func=lambda m: m.text == "📂 Заявки по статусу")
     def show_status_lists_menu(message: types.Message):
         """
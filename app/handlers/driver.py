@@ -1,15 +1,18 @@
 # handlers/driver.py
 from telebot import TeleBot, types
 from datetime import datetime, timedelta
-from app.database.models import User, Order, OrderStatus, UserRole, OrderStatusHistory
+from app.database.models import User, Order, OrderAll, OrderStatus, UserRole, OrderStatusHistory, Attachment
 from app.keyboards.request_actions import get_request_actions_keyboard
 from app.keyboards.main_menu import get_main_menu
 from peewee import fn
 from app.states.request_states import DriverStates
+from app.services import events
+from app.services.events import bus
+from app.services.transitions import transition
+from app.services import state_machine
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
+# настройка вывода — одна на процесс, в app/logs/logging.py
 logger = logging.getLogger(__name__)
 
 def register_driver_handlers(bot: TeleBot):
@@ -90,17 +93,18 @@ def register_driver_handlers(bot: TeleBot):
             bot.send_message(message.chat.id, "❌ Доступно только водителю.")
             return
 
-        total = Order.select().where(Order.driver == user).count()
-        by_status_q = (Order
-                       .select(Order.status, fn.COUNT(Order.id).alias("cnt"))
-                       .where(Order.driver == user)
-                       .group_by(Order.status))
+        # вместе с архивом (services/archive.py)
+        total = OrderAll.select().where(OrderAll.driver == user).count()
+        by_status_q = (OrderAll
+                       .select(OrderAll.status, fn.COUNT(OrderAll.id).alias("cnt"))
+                       .where(OrderAll.driver == user)
+                       .group_by(OrderAll.status))
         status_counts = {OrderStatus(r.status).label: r.cnt for r in by_status_q}
 
-        delivered_week = (Order.select()
-                          .where((Order.driver == user) &
-                                 (Order.status == int(OrderStatus.DELIVERED)) &
-                                 (Order.datetime >= datetime.now() - timedelta(days=7)))
+        delivered_week = (OrderAll.select()
+                          .where((OrderAll.driver == user) &
+                                 (OrderAll.status == int(OrderStatus.DELIVERED)) &
+                                 (OrderAll.datetime >= datetime.now() - timedelta(days=7)))
                           .count())
 
         lines = [
@@ -128,12 +132,12 @@ def register_driver_handlers(bot: TeleBot):
         if not user:
             return
 
-        # Заявки с статусом DELIVERED или CANCELLED
-        orders = (Order
+        # Заявки с статусом DELIVERED или CANCELLED — старые уже в архиве
+        orders = (OrderAll
                   .select()
-                  .where((Order.driver == user) &
-                         (Order.status.in_([int(OrderStatus.DELIVERED), int(OrderStatus.CANCELLED)])))
-                  .order_by(Order.datetime.desc())
+                  .where((OrderAll.driver == user) &
+                         (OrderAll.status.in_([int(OrderStatus.DELIVERED), int(OrderStatus.CANCELLED)])))
+                  .order_by(OrderAll.datetime.desc())
                   .limit(20))  # Ограничим количество для избежания перегрузки
 
         if not orders:
@@ -231,29 +235,14 @@ def register_driver_handlers(bot: TeleBot):
         int(OrderStatus.CANCELLED): "❌ Отменена",
     }
 
-    def _allowed_transitions_for(status_value: int) -> list[int]:
+    def _allowed_transitions_for(status_value: int) -> tuple[int, ...]:
         """
-        Возвращает список допустимых целевых статусов для данного текущего статуса (для водителя).
-        Последовательность: NEW -> CONFIRMED -> ENROUTE_TO_LOADING -> LOADING -> ENROUTE -> DELIVERED
-        (Дополнительно допускаем некоторые упрощённые переходы.)
+        Допустимые целевые статусы для водителя (см. таблицу в services/state_machine.py).
+        Принятие заявки (NEW -> CONFIRMED) идёт отдельной кнопкой, поэтому здесь только CHANGE_STATUS.
         """
-        NEW = int(OrderStatus.NEW)
-        CONFIRMED = int(OrderStatus.CONFIRMED)
-        ENROUTE_TO_LOADING = int(OrderStatus.ENROUTE_TO_LOADING)
-        LOADING = int(OrderStatus.LOADING)
-        ENROUTE = int(OrderStatus.ENROUTE)
-        DELIVERED = int(OrderStatus.DELIVERED)
-        CANCELLED = int(OrderStatus.CANCELLED)
-
-        mapping = {
-            NEW: [CONFIRMED],
-            CONFIRMED: [ENROUTE_TO_LOADING, ENROUTE],
-            # можно отправиться сразу в ENROUTE или сначала в ENROUTE_TO_LOADING
-            ENROUTE_TO_LOADING: [LOADING],
-            LOADING: [ENROUTE],
-            ENROUTE: [DELIVERED],
-        }
-        return mapping.get(int(status_value), [])
+        if not state_machine.can(UserRole.DRIVER, status_value, state_machine.CHANGE_STATUS):
+            return ()
+        return state_machine.allowed_targets(UserRole.DRIVER, status_value)
 
     # === ХЕНДЛЕР: показать клавиатуру выбора статуса для водителя ===
     @bot.callback_query_handler(func=lambda c: c.data.startswith("driver_change_status:"))
@@ -342,26 +331,20 @@ def register_driver_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "Недопустимое изменение статуса.")
             return
 
-        # выполняем обновление
+        # выполняем обновление: compare-and-set по статусу и версии, которые видел водитель
         prev_status = int(order.status)
-        order.status = new_status
-        order.save()
-
         status_name = _STATUS_LABELS.get(new_status, str(new_status))
-        OrderStatusHistory.create(
-            order=order,
-            by_user=user,
-            status=new_status,
-            note=f"Водитель изменил статус на: {status_name}"
-        )
-
-        # уведомляем диспетчера (если есть tg_id)
-        try:
-            if order.dispatcher and getattr(order.dispatcher, "tg_id", None):
-                bot.send_message(order.dispatcher.tg_id,
-                                 f"🚦 В заявке #{order.id} водитель изменил статус на: {status_name}")
-        except Exception:
-            pass
+        result = transition(order.id, user, (prev_status,), new_status,
+                            only_driver=user, version=order.version,
+                            note=f"Водитель изменил статус на: {status_name}")
+        if not result:
+            bot.answer_callback_query(call.id, result.reason)
+            return
+        order = result.order
+
+        # уведомление диспетчеру — через шину событий (склеивается при быстрой смене статусов)
+        bus.publish(events.ORDER_STATUS_CHANGED, order=order, actor=user,
+                    status=new_status, prev_status=prev_status)
 
         # подтверждение водителю
         bot.answer_callback_query(call.id, f"Статус изменён на: {status_name}")
@@ -452,12 +435,7 @@ def register_driver_handlers(bot: TeleBot):
         OrderStatusHistory.create(order=order, by_user=user, status=order.status,
                                   note=f"Комментарий водителя: {text}")
 
-        try:
-            if order.dispatcher and getattr(order.dispatcher, "tg_id", None):
-                bot.send_message(order.dispatcher.tg_id,
-                                 f"💬 Комментарий от водителя по заявке #{order.id}:\n\n{text}")
-        except Exception:
-            pass
+        bus.publish(events.ORDER_COMMENT_ADDED, order=order, actor=user, text=text)
 
         bot.send_message(message.chat.id, "✅ Комментарий добавлен.")
         bot.delete_state(message.from_user.id, message.chat.id)
@@ -552,7 +530,6 @@ def register_driver_handlers(bot: TeleBot):
             Attachment.create(order=order, uploaded_by=user, file_id=file_id, file_type=file_type, caption=caption)
         except Exception:
             # если нет модели Attachment — просто логируем и продолжаем
-            logger = logging.getLogger(__name__)
             logger.debug("Attachment не сохранён (возможно, модель не определена) или произошла ошибка.")
 
         # Запись в историю
@@ -560,16 +537,8 @@ def register_driver_handlers(bot: TeleBot):
                                   note=f"Водитель добавил файл: {caption or '[файл]'}")
 
         # Пересылка диспетчеру
-        try:
-            if order.dispatcher and getattr(order.dispatcher, "tg_id", None):
-                if file_type == "image":
-                    bot.send_photo(order.dispatcher.tg_id, file_id,
-                                   caption=f"Фото от водителя по заявке #{order.id}\n{caption or ''}")
-                else:
-                    bot.send_document(order.dispatcher.tg_id, file_id,
-                                      caption=f"Файл от водителя по заявке #{order.id}\n{caption or ''}")
-        except Exception:
-            pass
+        bus.publish(events.ATTACHMENT_ADDED, order=order, actor=user,
+                    file_id=file_id, file_type=file_type, caption=caption)
 
         bot.delete_state(message.from_user.id, message.chat.id)
 
@@ -605,19 +574,17 @@ def register_driver_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id, "Заявка уже назначена другому водителю.")
             return
 
-        order.driver = user
-        order.status = int(OrderStatus.CONFIRMED)
-        order.save()
-
-        OrderStatusHistory.create(order=order, by_user=user, status=order.status, note="Водитель принял заявку")
+        # атомарно: выигрывает только один водитель, даже если двое нажали одновременно
+        result = transition(order.id, user, (OrderStatus.NEW,), OrderStatus.CONFIRMED,
+                            driver=user, driver_free_or=user, note="Водитель принял заявку")
+        if not result:
+            bot.answer_callback_query(call.id, result.reason)
+            return
+        order = result.order
 
         # уведомление диспетчеру
-        try:
-            if order.dispatcher and getattr(order.dispatcher, "tg_id", None):
-                bot.send_message(order.dispatcher.tg_id,
-                                 f"🚚 Водитель {user.first_name or ''} принял заявку #{order.id}")
-        except Exception:
-            pass
+        bus.publish(events.ORDER_ACCEPTED, order=order, actor=user,
+                    status=int(OrderStatus.CONFIRMED), prev_status=int(OrderStatus.NEW))
 
         bot.answer_callback_query(call.id, "✅ Заявка принята.")
 
@@ -2,14 +2,41 @@
 from telebot import TeleBot, types
 from loguru import logger
 from peewee import fn
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional
-from app.database.models import User, UserRole, Order, OrderStatus, OrderPrefix
+from app.database.models import User, UserRole, Order, OrderAll, OrderStatus, OrderPrefix
 from app.keyboards.main_menu import get_main_menu
 from app.keyboards.request_actions import (
+    get_analytics_charts_keyboard,
+    get_drivers_keyboard,
     get_request_actions_keyboard,
 )
 from app.handlers.attachments import register_attachments_reports_handlers
+from app.services import rollup
+from app.services.charts import CHARTS, send_chart
+from app.services.archive import count_orders, sum_weight_volume
+from app.services import events, state_machine
+from app.services.assignment import assignment
+from app.services.events import bus
+from app.services.roster import roster
+from app.services.transitions import assign_driver
+
+
+def _trend(current: int, previous: int) -> str:
+    """Изменение к предыдущему такому же периоду: " (▲ 12%)"."""
+    if not previous:
+        return ""
+    change = (current - previous) / previous * 100
+    return f" ({'▲' if change >= 0 else '▼'} {abs(change):.0f}%)"
+
+
+def _percent(part: int, whole: int) -> str:
+    return f"{part / whole * 100:.0f}%" if whole else "—"
+
+
+def _hours(seconds: int, count: int) -> str:
+    return f"в среднем {seconds / count / 3600:.1f} ч" if count else "—"
+
 
 def register_manager_handlers(bot: TeleBot):
     """Хэндлеры для руководителя"""
@@ -17,9 +44,10 @@ def register_manager_handlers(bot: TeleBot):
     # 📊 Общая статистика
     @bot.message_handler(func=lambda m: m.text == "📊 Общая статистика")
     def show_stats(message: types.Message):
-        total_orders = Order.select().count()
-        delivered_orders = Order.select().where(Order.status == int(OrderStatus.DELIVERED)).count()
-        cancelled_orders = Order.select().where(Order.status == int(OrderStatus.CANCELLED)).count()
+        # вместе с архивом (services/archive.py)
+        total_orders = count_orders()
+        delivered_orders = count_orders(lambda m: m.status == int(OrderStatus.DELIVERED))
+        cancelled_orders = count_orders(lambda m: m.status == int(OrderStatus.CANCELLED))
 
         drivers = User.select().where(User.role == int(UserRole.DRIVER)).count()
         dispatchers = User.select().where(User.role == int(UserRole.DISPATCHER)).count()
@@ -54,7 +82,7 @@ def register_manager_handlers(bot: TeleBot):
     # 🚛 Все заявки
     @bot.message_handler(func=lambda m: m.text == "🚛 Все заявки")
     def show_all_requests(message: types.Message):
-        orders = Order.select().order_by(Order.created_at.desc()).limit(10)
+        orders = OrderAll.select().order_by(OrderAll.created_at.desc()).limit(10)
 
         if not orders:
             bot.send_message(message.chat.id, "❌ Заявок пока нет.")
@@ -70,19 +98,57 @@ def register_manager_handlers(bot: TeleBot):
     # 📈 Аналитика
     @bot.message_handler(func=lambda m: m.text == "📈 Аналитика")
     def show_analytics(message: types.Message):
-        week_ago = datetime.now() - timedelta(days=7)
-        weekly_orders = Order.select().where(Order.created_at >= week_ago).count()
-        delivered_week = Order.select().where(
-            (Order.status == int(OrderStatus.DELIVERED)) &
-            (Order.created_at >= week_ago)
-        ).count()
-
-        text = (
-            "📈 <b>Аналитика за неделю</b>\n\n"
-            f"Создано заявок: {weekly_orders}\n"
-            f"✅ Доставлено: {delivered_week}\n"
-        )
-        bot.send_message(message.chat.id, text, parse_mode="HTML")
+        # всё из дневных сводок (services/rollup.py): ~180 строк вместо подсчёта по orders и архиву
+        today = date.today().toordinal()
+        days = rollup.daily(today - 179)
+
+        lines = ["📈 <b>Аналитика</b>"]
+        for window in (7, 30, 90):
+            cur = rollup.totals(days, today - window + 1, today)
+            prev = rollup.totals(days, today - 2 * window + 1, today - window)
+            finished = cur["delivered"] + cur["cancelled"]
+            lines.append(
+                f"\n<b>{window} дней</b>\n"
+                f"Создано: {cur['created']}{_trend(cur['created'], prev['created'])}\n"
+                f"✅ Доставлено: {cur['delivered']}{_trend(cur['delivered'], prev['delivered'])}\n"
+                f"⏱ Вовремя: {_percent(cur['on_time'], cur['delivered'])}, "
+                f"❌ отмены: {_percent(cur['cancelled'], finished)} завершённых\n"
+                f"🕒 От создания до доставки: {_hours(cur['lead_seconds'], cur['delivered'])}"
+            )
+
+        # тоннаж и объём доставленного — SUM по индексу (weight_kg / volume_m3 разобраны при записи)
+        def delivered_since(since):
+            return lambda m: (m.datetime >= since) & (m.status == int(OrderStatus.DELIVERED))
+
+        weight_week, volume_week = sum_weight_volume(delivered_since(datetime.now() - timedelta(days=7)))
+        weight_month, volume_month = sum_weight_volume(delivered_since(datetime.now() - timedelta(days=30)))
+        lines.append(f"\n⚖️ Перевезено за неделю: {weight_week / 1000:.1f} т, {volume_week:.1f} м³\n"
+                     f"⚖️ За 30 дней: {weight_month / 1000:.1f} т, {volume_month:.1f} м³")
+
+        per_day = "\n".join(f"  {date.fromordinal(day):%d.%m}: {days.get(day, {}).get('delivered', 0)}"
+                             for day in range(today - 6, today + 1))
+        lines.append(f"\n📅 Доставлено по дням:\n{per_day}")
+
+        top = rollup.top_keys("driver", today - 29)
+        if top:
+            names = {u.id: f"{u.first_name or ''} {u.last_name or ''}".strip() or f"ID {u.id}"
+                     for u in User.select().where(User.id.in_([key for key, _ in top]))}
+            lines.append("\n🏆 Водители за 30 дней:\n" + "\n".join(
+                f"  {names.get(key, f'ID {key}')}: {count}" for key, count in top))
+
+        lines.append("\n📊 Графики: 📈 заявки по дням, 🚛 доставки по водителям, 🚦 смены статусов")
+        bot.send_message(message.chat.id, "\n".join(lines), parse_mode="HTML",
+                         reply_markup=get_analytics_charts_keyboard())
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("mgr_chart:"))
+    def cb_analytics_chart(call: types.CallbackQuery):
+        # PNG рисуется из сводок один раз; повторный показ — file_id из кэша (services/charts.py)
+        _, name, days = call.data.split(":")
+        if name not in CHARTS or not days.isdigit():
+            bot.answer_callback_query(call.id, "Неверный параметр.")
+            return
+        bot.answer_callback_query(call.id)
+        send_chart(bot, call.message.chat.id, name, int(days))
 
     # Удаление пользователя
     @bot.message_handler(commands=["user_delete"])
@@ -112,6 +178,7 @@ def register_manager_handlers(bot: TeleBot):
 
         user.is_active = True
         user.save()
+        bus.publish(events.USER_CHANGED, actor=_get_user_from_update(message), user=user)
 
         bot.send_message(message.chat.id, f"🗑 Пользователь ID {user_id} активирован.")
 
@@ -149,6 +216,7 @@ def register_manager_handlers(bot: TeleBot):
             return
 
         user.save()
+        bus.publish(events.USER_CHANGED, actor=_get_user_from_update(message), user=user)
         bot.send_message(message.chat.id, f"✅ Пользователь ID {user.id} обновлён.")
 
 
@@ -200,7 +268,8 @@ def register_manager_handlers(bot: TeleBot):
     def cb_all_requests_menu(call: types.CallbackQuery):
         """
         Показывает инлайн клавиатуру выбора периода: неделя / месяц / всё.
-        callback_data для опций: mgr_requests:week / mgr_requests:month / mgr_requests:all
+        callback_data для опций: mgr_requests:week / mgr_requests:month / mgr_requests:all;
+        bulk_open — список выбора для массовых действий (handlers/bulk_actions.py).
         """
         bot.answer_callback_query(call.id)
         kb = types.InlineKeyboardMarkup(row_width=2)
@@ -209,6 +278,7 @@ def register_manager_handlers(bot: TeleBot):
             types.InlineKeyboardButton("🗓 За месяц", callback_data="mgr_requests:month")
         )
         kb.add(types.InlineKeyboardButton("📊 За всё", callback_data="mgr_requests:all"))
+        kb.add(types.InlineKeyboardButton("☑️ Выбрать несколько", callback_data="bulk_open"))
         bot.send_message(call.message.chat.id, "Выберите период для списка заявок:", reply_markup=kb)
 
     # Также — поддержка текстовой/реплай кнопки "📋 Все заявки" если такая есть в меню:
@@ -223,6 +293,7 @@ def register_manager_handlers(bot: TeleBot):
             types.InlineKeyboardButton("🗓 За месяц", callback_data="mgr_requests:month")
         )
         kb.add(types.InlineKeyboardButton("📊 За всё", callback_data="mgr_requests:all"))
+        kb.add(types.InlineKeyboardButton("☑️ Выбрать несколько", callback_data="bulk_open"))
         bot.send_message(message.chat.id, "Выберите период для списка заявок:", reply_markup=kb)
 
     # -------------------- Обработка выбора периода --------------------
@@ -258,15 +329,15 @@ def register_manager_handlers(bot: TeleBot):
             since = None
             title = "Все заявки"
 
-        # Формируем запрос в зависимости от роли
+        # Формируем запрос в зависимости от роли (заявки вместе с архивом)
         if int(user.role) == int(UserRole.MANAGER):
-            q = Order.select().order_by(Order.datetime.desc())
+            q = OrderAll.select().order_by(OrderAll.datetime.desc())
             if since:
-                q = q.where(Order.datetime >= since)
+                q = q.where(OrderAll.datetime >= since)
         elif int(user.role) == int(UserRole.DISPATCHER):
-            q = Order.select().where(Order.dispatcher == user).order_by(Order.datetime.desc())
+            q = OrderAll.select().where(OrderAll.dispatcher == user).order_by(OrderAll.datetime.desc())
             if since:
-                q = q.where(Order.datetime >= since)
+                q = q.where(OrderAll.datetime >= since)
         else:
             bot.send_message(call.message.chat.id, "❌ Доступ запрещён для просмотра всех заявок.")
             return
@@ -287,36 +358,58 @@ def register_manager_handlers(bot: TeleBot):
 
 
     # 📌 Переназначение водителя
-    @bot.callback_query_handler(func=lambda c: c.data == "reassign_driver")
+    def _manager_call(call: types.CallbackQuery) -> Optional[User]:
+        user = _get_user_from_update(call)
+        if not user or int(user.role) != int(UserRole.MANAGER):
+            bot.answer_callback_query(call.id, "❌ Доступно только руководителю.")
+            return None
+        return user
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("reassign_driver:"))
     def cb_reassign_driver(call: types.CallbackQuery):
-        order_id = call.message.text.split()[0].replace("#", "")  # допустим в тексте заявки есть #id
-        order = Order.get_or_none(Order.id == int(order_id))
+        """Inline-список водителей для переназначения: reassign_pick:<id заявки>:<id водителя>."""
+        if not _manager_call(call):
+            return
+        order = Order.get_or_none(Order.id == int(call.data.split(":")[1]))
         if not order:
             bot.answer_callback_query(call.id, "❌ Заявка не найдена.")
             return
-
-        drivers = User.select().where(User.role == int(UserRole.DRIVER))
-        kb = types.InlineKeyboardMarkup()
-        for d in drivers:
-            kb.add(types.InlineKeyboardButton(
-                f"{d.first_name} {d.last_name or ''}", callback_data=f"assign_driver:{order.id}:{d.id}"
-            ))
-        bot.send_message(call.message.chat.id, "Выбери нового водителя:", reply_markup=kb)
-
-    @bot.callback_query_handler(func=lambda c: c.data.startswith("assign_driver:"))
-    def cb_assign_driver(call: types.CallbackQuery):
+        if not state_machine.can("manager", order.status, state_machine.REASSIGN):
+            bot.answer_callback_query(call.id,
+                                      f"В статусе «{OrderStatus(order.status).label}» водителя сменить нельзя.")
+            return
+        drivers = roster.drivers()
+        suggestions = assignment.suggest([d.id for d in drivers], order.from_addr, order.to_addr)
+        bot.answer_callback_query(call.id)
+        bot.send_message(call.message.chat.id, f"Выбери нового водителя для заявки #{order.id}:",
+                         reply_markup=get_drivers_keyboard(drivers, f"reassign_pick:{order.id}:", suggestions))
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("reassign_pick:"))
+    def cb_reassign_pick(call: types.CallbackQuery):
+        """Переназначение: reassign_pick:<id заявки>:<id водителя> (0 — снять водителя)."""
+        manager = _manager_call(call)
+        if not manager:
+            return
         _, order_id, driver_id = call.data.split(":")
+        driver = roster.get(int(driver_id), UserRole.DRIVER) if int(driver_id) else None
+        if int(driver_id) and not driver:
+            bot.answer_callback_query(call.id, "Водитель недоступен.")
+            return
         order = Order.get_or_none(Order.id == int(order_id))
-        driver = User.get_or_none(User.id == int(driver_id))
-        if not order or not driver:
-            bot.answer_callback_query(call.id, "❌ Ошибка.")
+        if not order:
+            bot.answer_callback_query(call.id, "❌ Заявка не найдена.")
             return
-
-        order.assigned_driver = driver
-        order.status = int(OrderStatus.CONFIRMED)
-        order.save()
-
-        bot.edit_message_text(f"✅ Заявка #{order.id} переназначена на {driver.first_name}",
+        prev_driver = order.driver
+        result = assign_driver(order, manager, "manager", state_machine.REASSIGN, driver.id if driver else None,
+                               note=f"Переназначен водитель: {driver.first_name if driver else '—'}")
+        if not result:
+            bot.answer_callback_query(call.id, result.reason)
+            return
+        bot.answer_callback_query(call.id)
+        bus.publish(events.ORDER_DRIVER_ASSIGNED, order=result.order, actor=manager,
+                    prev_driver_tg_id=(prev_driver.tg_id if prev_driver else None),
+                    prev_driver_id=(prev_driver.id if prev_driver else None))
+        bot.edit_message_text(f"✅ Заявка #{order.id} переназначена на {driver.name if driver else '— (без водителя)'}",
                               call.message.chat.id, call.message.message_id)
 
     # ❌ Отмена заявки
@@ -357,5 +450,6 @@ def delete_user(user_id: int, manager_id: int) -> str:
 
     user.is_active = False
     user.save()
+    bus.publish(events.USER_CHANGED, user=user)
 
     return f"🗑 Пользователь ID {user_id} ({user.first_name} {user.last_name or ''}) деактивирован."
\ No newline at end of file
@@ -1,11 +1,13 @@
 # handlers/start.py
 import re
-import logging
 from loguru import logger
 from datetime import datetime
 from telebot import TeleBot, types
 import phonenumbers  # пакет phonenumberslite
 from app.database.models import User, UserRole, db
+from app.services import events
+from app.services.events import bus
+from app.services.roster import roster
 from app.keyboards.main_menu import get_main_menu
 from telebot.custom_filters import StateFilter
 from telebot.handler_backends import StatesGroup, State
@@ -61,38 +63,22 @@ def _set_max_dispatchers(n: int) -> None:
 
 
 def _active_dispatchers_count() -> int:
-    """Количество активных пользователей с ролью диспетчера."""
+    """Количество активных пользователей с ролью диспетчера (по снимку services/roster.py)."""
     try:
-        return (User
-                .select()
-                .where((User.role == int(UserRole.DISPATCHER)) & (User.is_active == True))
-                .count())
+        return roster.count(UserRole.DISPATCHER)
     except Exception:
         logger.exception("Failed to count active dispatchers")
         return 0
 
 
 def _active_manager_exists() -> bool:
-    """Есть ли активный руководитель в системе."""
+    """Есть ли активный руководитель в системе (по снимку services/roster.py)."""
     try:
-        return (User
-                .select()
-                .where((User.role == int(UserRole.MANAGER)) & (User.is_active == True))
-                .exists())
+        return bool(roster.count(UserRole.MANAGER))
     except Exception:
         logger.exception("Failed to check active manager")
         return False
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.ERROR,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app/logs/bot.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-
 # ====== Состояния FSM регистрации ======
 class RegStates(StatesGroup):
     choose_role = State()
@@ -260,6 +246,9 @@ def register_handlers(bot: TeleBot) -> None:
             bot.answer_callback_query(call.id, "Телефон обязателен для заполнения.")
             return
 
+        # Повторные проверки — по свежему снимку: регистрация могла пройти в другом воркере
+        roster.refresh()
+
         # Жёсткая проверка MANAGER
         if role is UserRole.MANAGER and _active_manager_exists():
             bot.answer_callback_query(call.id, "❌ Руководитель уже создан.")
@@ -307,6 +296,7 @@ def register_handlers(bot: TeleBot) -> None:
             logger.exception("Failed to upsert user")
             bot.answer_callback_query(call.id, "Ошибка сохранения. Попробуйте ещё раз позже.")
             return
+        bus.publish(events.USER_CHANGED, actor=user, user=user)
 
         bot.answer_callback_query(call.id)
         bot.edit_message_text(
@@ -16,7 +16,8 @@ def get_main_menu(role):
             KeyboardButton('📊 Статистика')
         )
         markup.add(
-            KeyboardButton('📂 Заявки по статусу')
+            KeyboardButton('📂 Заявки по статусу'),
+            KeyboardButton('📥 Импорт заявок')
         )
     elif role == 'driver':
         markup.add(
@@ -1,5 +1,10 @@
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from types import SimpleNamespace as _SimpleNamespace
+
+from telebot.types import (
+    ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, JsonSerializable
+)
 from app.database.models import Order, OrderStatus
+from app.services import state_machine
 from telebot import types
 
 
@@ -9,7 +14,8 @@ from telebot import types
 def get_status_filter_keyboard() -> InlineKeyboardMarkup:
     """
     Возвращает InlineKeyboard с 4 кнопками списков:
-    - все новые, подтвержденные, выполненные (доставленные), отмененные.
+    - все новые, подтвержденные, выполненные (доставленные), отмененные;
+    и кнопкой массовых действий (список выбора, handlers/bulk_actions.py).
     """
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(
@@ -17,6 +23,7 @@ def get_status_filter_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardButton("✅ Все подтвержденные заявки", callback_data="list_status:CONFIRMED"),
         InlineKeyboardButton("📦 Все выполненные заявки", callback_data="list_status:DELIVERED"),
         InlineKeyboardButton("❌ Все отмененные заявки", callback_data="list_status:CANCELLED"),
+        InlineKeyboardButton("☑️ Выбрать несколько", callback_data="bulk_open"),
     )
     return kb
 
@@ -61,17 +68,21 @@ def get_prefix_keyboard():
     return markup
 
 
-def get_drivers_keyboard(drivers):
-    """Клавиатура для выбора водителя"""
-    markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=1)
-
-    for driver in drivers:
-        btn_text = f"{driver.first_name} {driver.last_name or ''}"
-        if driver.username:
-            btn_text += f" (@{driver.username})"
-        markup.add(KeyboardButton(btn_text))
-
-    markup.add(KeyboardButton('❌ Без водителя'), KeyboardButton('❌ Отмена'))
+def get_drivers_keyboard(drivers, callback_prefix: str, suggestions=()) -> InlineKeyboardMarkup:
+    """
+    Inline-выбор водителя: callback_data — <callback_prefix><id водителя>, <callback_prefix>0 — без водителя.
+    Сверху ⭐ рекомендованные (services/assignment.py), ниже — все активные водители.
+    """
+    names = {d.id: f"{d.first_name or ''} {d.last_name or ''}".strip() or f"ID {d.id}" for d in drivers}
+    markup = InlineKeyboardMarkup(row_width=2)
+    for s in suggestions:
+        text = f"⭐ {names.get(s.driver_id, f'ID {s.driver_id}')} — в работе {s.active}"
+        if s.route_deliveries:
+            text += f", рейсов по маршруту {s.route_deliveries}"
+        markup.row(InlineKeyboardButton(text, callback_data=f"{callback_prefix}{s.driver_id}"))
+    markup.add(*[InlineKeyboardButton(names[d.id] + (f" (@{d.username})" if d.username else ""),
+                                      callback_data=f"{callback_prefix}{d.id}") for d in drivers])
+    markup.row(InlineKeyboardButton("❌ Без водителя", callback_data=f"{callback_prefix}0"))
     return markup
 
 
@@ -90,69 +101,111 @@ def get_request_status_keyboard():
     return markup
 
 # keyboards/request_actions.py
-def get_request_actions_keyboard(order, role="dispatcher", include_chat: bool = True):
+# Подписи «быстрых» кнопок смены статуса водителем (цели берутся из services/state_machine.py)
+_QUICK_LABELS = {
+    int(OrderStatus.ENROUTE): "🚛 В путь",
+    int(OrderStatus.DELIVERED): "✅ Доставлено",
+}
+
+
+# Кэш готовых JSON-шаблонов клавиатуры действий: (role, status, include_chat) -> части JSON вокруг id заявки.
+# Раскладка зависит только от роли и статуса, поэтому объекты кнопок строятся и сериализуются один раз,
+# а карточка получает разметку склейкой строки с id.
+_ORDER_ID_MARK = "%ORDER_ID%"
+_TEMPLATES: dict[tuple[str, int, bool], tuple[str, ...]] = {}
+
+
+class CachedMarkup(JsonSerializable):
+    """Готовая (уже сериализованная) inline-клавиатура; telebot отправляет её как есть через to_json()."""
+    __slots__ = ("_json",)
+
+    def __init__(self, json_str: str):
+        self._json = json_str
+
+    def to_json(self) -> str:
+        return self._json
+
+
+def get_request_actions_keyboard(order, role="dispatcher", include_chat: bool = True) -> CachedMarkup:
+    """
+    Возвращает inline-клавиатуру с кнопками, подходящими для роли, из кэша шаблонов.
+    Набор кнопок определяется таблицей переходов (роль × статус) из services/state_machine.py.
+    """
+    key = (role, int(order.status), include_chat)
+    parts = _TEMPLATES.get(key)
+    if parts is None:
+        template = _SimpleNamespace(id=_ORDER_ID_MARK, status=key[1])
+        parts = tuple(build_request_actions_keyboard(template, role, include_chat).to_json().split(_ORDER_ID_MARK))
+        _TEMPLATES[key] = parts
+    return CachedMarkup(str(order.id).join(parts))
+
+
+def build_request_actions_keyboard(order, role="dispatcher", include_chat: bool = True) -> InlineKeyboardMarkup:
     """
-    Возвращает InlineKeyboardMarkup с кнопками, подходящими для роли.
+    Собирает InlineKeyboardMarkup с кнопками, подходящими для роли (без кэша).
+    Используется для построения шаблонов get_request_actions_keyboard.
     """
     markup = InlineKeyboardMarkup(row_width=2)
+    allowed = state_machine.actions(role, order.status)
 
     if role == "dispatcher":
         # Редактирование
-        markup.add(
-            InlineKeyboardButton("📍 Изменить точку А", callback_data=f"edit_from:{order.id}"),
-            InlineKeyboardButton("📍 Изменить точку Б", callback_data=f"edit_to:{order.id}"),
-        )
-        markup.add(
-            InlineKeyboardButton("📅 Изменить дату/время", callback_data=f"edit_dt:{order.id}"),
-            InlineKeyboardButton("💬 Комментарий", callback_data=f"edit_comment:{order.id}"),
-        )
-        markup.add(
-            InlineKeyboardButton("📦 Тип груза", callback_data=f"edit_cargo:{order.id}"),
-            InlineKeyboardButton("⚖️ Вес/объем", callback_data=f"edit_weight:{order.id}"),
-        )
+        if state_machine.EDIT in allowed:
+            markup.add(
+                InlineKeyboardButton("📍 Изменить точку А", callback_data=f"edit_from:{order.id}"),
+                InlineKeyboardButton("📍 Изменить точку Б", callback_data=f"edit_to:{order.id}"),
+            )
+            markup.add(
+                InlineKeyboardButton("📅 Изменить дату/время", callback_data=f"edit_dt:{order.id}"),
+                InlineKeyboardButton("💬 Комментарий", callback_data=f"edit_comment:{order.id}"),
+            )
+            markup.add(
+                InlineKeyboardButton("📦 Тип груза", callback_data=f"edit_cargo:{order.id}"),
+                InlineKeyboardButton("⚖️ Вес/объем", callback_data=f"edit_weight:{order.id}"),
+            )
 
         # Назначение водителя
-        markup.add(
-            InlineKeyboardButton("👨‍💼 Назначить/сменить водителя", callback_data=f"assign_driver:{order.id}")
-        )
+        if state_machine.ASSIGN in allowed:
+            markup.add(
+                InlineKeyboardButton("👨‍💼 Назначить/сменить водителя", callback_data=f"assign_driver:{order.id}")
+            )
 
-        # Отмена — если статус новый/подтвержден
-        if order.status in (int(OrderStatus.NEW), int(OrderStatus.CONFIRMED)):
+        if state_machine.CANCEL in allowed:
             markup.add(
                 InlineKeyboardButton("❌ Отменить", callback_data=f"cancel_request:{order.id}")
             )
 
     elif role == "driver":
-        # Водительские кнопки по статусу (можно расширить)
         # Для новой заявки - кнопка принятия
-        if order.status == int(OrderStatus.NEW):
+        if state_machine.ACCEPT in allowed:
             markup.add(
                 types.InlineKeyboardButton("✅ Принять заявку", callback_data=f"driver_accept:{order.id}")
             )
         # Для активных заявок - кнопки действий
-        elif order.status not in [int(OrderStatus.DELIVERED), int(OrderStatus.CANCELLED)]:
+        if state_machine.CHANGE_STATUS in allowed:
             markup.add(
                 types.InlineKeyboardButton("📋 Изменить статус", callback_data=f"driver_change_status:{order.id}"),
                 types.InlineKeyboardButton("💬 Комментарий", callback_data=f"driver_add_comment:{order.id}")
             )
+        if state_machine.PHOTO in allowed:
             markup.add(
                 types.InlineKeyboardButton("📸 Прикрепить фото", callback_data=f"driver_add_photo:{order.id}")
             )
 
-        if order.status == int(OrderStatus.CONFIRMED):
+        for target in state_machine.quick_targets(role, order.status):
             markup.add(
-                InlineKeyboardButton("🚛 В путь", callback_data=f"start_driving:{order.id}")
+                InlineKeyboardButton(_QUICK_LABELS[target], callback_data=f"driver_set_status:{order.id}:{target}")
             )
-        elif order.status == int(OrderStatus.ENROUTE):
-            markup.add(
-                InlineKeyboardButton("✅ Доставлено", callback_data=f"delivered:{order.id}")
-            )
-    elif user_role == 'manager':
-        markup.add(
-                    InlineKeyboardButton('👨‍💼 Переназначить', callback_data=f'reassign_driver:{order.id}'),
-                    InlineKeyboardButton('❌ Отменить', callback_data=f'cancel_request:{order.id}')
-                )
-        if request_status == 'delivered':
+
+    elif role == "manager":
+        buttons = []
+        if state_machine.REASSIGN in allowed:
+            buttons.append(InlineKeyboardButton('👨‍💼 Переназначить', callback_data=f'reassign_driver:{order.id}'))
+        if state_machine.CANCEL in allowed:
+            buttons.append(InlineKeyboardButton('❌ Отменить', callback_data=f'cancel_request:{order.id}'))
+        if buttons:
+            markup.add(*buttons)
+        if state_machine.DETAILS in allowed:
             markup.add(InlineKeyboardButton('📊 Подробнее', callback_data=f'request_details:{order.id}'))
 
     # 💬 Чат и 🕘 История доступны и водителю, и диспетчеру
@@ -242,3 +295,53 @@ def get_request_filter_keyboard():
     )
     markup.add(KeyboardButton('⬅️ Назад'))
     return markup
+
+
+def get_analytics_charts_keyboard() -> InlineKeyboardMarkup:
+    """Графики к «📈 Аналитика»: строка на график, кнопки — период в днях (callback mgr_chart:<график>:<дни>)."""
+    kb = InlineKeyboardMarkup(row_width=3)
+    for icon, name in (("📈", "daily"), ("🚛", "drivers"), ("🚦", "statuses")):
+        kb.row(*[InlineKeyboardButton(f"{icon} {days} дн.", callback_data=f"mgr_chart:{name}:{days}")
+                 for days in (7, 30, 90)])
+    return kb
+
+
+# Подписи кнопок массовых действий (действия и допустимые статусы — из services/state_machine.py)
+BULK_ACTION_LABELS = {
+    state_machine.CANCEL: "❌ Отменить",
+    state_machine.CLOSE: "📦 Доставлено",
+}
+
+
+def get_bulk_select_keyboard(orders, selected: set, status: int, statuses: tuple[int, ...], page: int, pages: int,
+                             bulk_actions: tuple[str, ...]) -> InlineKeyboardMarkup:
+    """
+    Список выбора заявок для массового действия (одно сообщение, правится на месте):
+    вкладки статусов, заявки страницы с отметкой ☑️/⬜, листание, «вся страница»/«сбросить» и действия.
+    callback_data: bulk:f:<статус> / bulk:t:<id> / bulk:p:<страница> / bulk:all / bulk:clr / bulk:do:<действие> /
+    bulk:exit
+    """
+    kb = InlineKeyboardMarkup(row_width=3)
+    kb.add(*[InlineKeyboardButton(("• " if s == status else "") + OrderStatus(s).label, callback_data=f"bulk:f:{s}")
+             for s in statuses])
+    for order in orders:
+        mark = "☑️" if order.id in selected else "⬜"
+        route = f"{order.from_addr} → {order.to_addr}"
+        if len(route) > 36:
+            route = route[:35] + "…"
+        kb.row(InlineKeyboardButton(f"{mark} #{order.id} · {order.datetime:%d.%m} · {route}",
+                                    callback_data=f"bulk:t:{order.id}"))
+    if pages > 1:
+        kb.row(
+            InlineKeyboardButton("◀️", callback_data=f"bulk:p:{(page - 1) % pages}"),
+            InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="bulk:noop"),
+            InlineKeyboardButton("▶️", callback_data=f"bulk:p:{(page + 1) % pages}"),
+        )
+    kb.row(InlineKeyboardButton("✔️ Вся страница", callback_data="bulk:all"),
+           InlineKeyboardButton("🧹 Сбросить", callback_data="bulk:clr"))
+    if selected:
+        kb.row(*[InlineKeyboardButton(f"{BULK_ACTION_LABELS[action]} ({len(selected)})",
+                                      callback_data=f"bulk:do:{action}")
+                 for action in bulk_actions])
+    kb.row(InlineKeyboardButton("✖️ Закрыть", callback_data="bulk:exit"))
+    return kb
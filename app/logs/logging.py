@@ -1,25 +1,199 @@
+# logs/logging.py
+import atexit
+import json
+import logging
 import os
+import queue
+import re
 import sys
+import threading
+import traceback
+from logging.handlers import RotatingFileHandler
+
 from loguru import logger
 
-LOG_OUTPUT_PATH = os.path.join("logs/bot.log")
-LOG_FORMAT = ("<green>{time:YYYY.MM.DD HH:mm:ss.SSS zz}</green> | "
-              "<level>{level: <8}</level> | <yellow>Line {line: >4} "
-              "({file}):</yellow> <b>{message}</b>")
+from app.config.settings import settings
+
+_ORDER_ID = re.compile(r":(\d+)")
+_STOP = object()
+
+
+def _parse_levels(spec: str) -> dict[str, str]:
+    """"app.handlers.driver=DEBUG,telebot=ERROR" -> {"app.handlers.driver": "DEBUG", "telebot": "ERROR"}"""
+    levels = {}
+    for item in spec.split(","):
+        module, _, level = item.partition("=")
+        if module.strip() and level.strip():
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def _context(call) -> dict:
+    """handler / user_id / order_id выполняющегося хендлера (services/metrics.py)."""
+    if call is None:
+        return {}
+    ctx = {"handler": call.name}
+    event = call.event
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        ctx["user_id"] = user.id
+    data = getattr(event, "data", None)
+    if isinstance(data, str):
+        m = _ORDER_ID.search(data)
+        if m:
+            ctx["order_id"] = int(m.group(1))
+    return ctx
+
+
+class InterceptHandler(logging.Handler):
+    """Стандартный logging (telebot, старые модули) -> loguru, с правильным модулем и строкой."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        # поднимаемся до кода, который вызвал logging, — его модуль и строка попадут в запись
+        frame, depth = sys._getframe(), 0
+        while frame is not None and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+class LogPipeline:
+    """
+    Неблокирующий вывод логов.
+
+    Sink loguru в потоке хендлера только кладёт запись в ограниченную очередь (вместе с контекстом
+    хендлера); форматирование, JSON и запись в stdout/файл делает один фоновый поток —
+    схема QueueHandler/QueueListener. Если писатель не успевает и очередь полна, запись отбрасывается
+    (счётчик dropped), а не тормозит обработку апдейтов.
+    """
+
+    def __init__(self, stream_format: str = "text", file_path: str = "", max_bytes: int = 5 * 1024 * 1024,
+                 backups: int = 3, queue_size: int = 10000, stream=None):
+        self.stream_format = stream_format
+        self.stream = stream or sys.stderr
+        self.records = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self.queue_size = queue_size
+        # SimpleQueue реализована на C и не берёт Condition на каждую запись — дешевле queue.Queue в горячем пути
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file = None
+        if file_path:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            self._file = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            self._file.setFormatter(logging.Formatter("%(message)s"))
+        from app.services.metrics import metrics
+        self._current_call = metrics.current_call
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- поток хендлера ----------
+    def sink(self, message) -> None:
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            return
+        self._queue.put((message.record, self._current_call()))
+        self.records += 1
+
+    # ---------- фоновый писатель ----------
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                print(f"log writer failed: {e!r}", file=sys.__stderr__)
+            if self.dropped != self._reported_dropped and self._queue.empty():
+                lost, self._reported_dropped = self.dropped - self._reported_dropped, self.dropped
+                print(f"log queue overflow: {lost} records dropped", file=self.stream)
+
+    def _write(self, record: dict, call) -> None:
+        ctx = _context(call)
+        json_line = None
+        if self.stream_format == "json":
+            json_line = self._json(record, ctx)
+            self.stream.write(json_line + "\n")
+        else:
+            self.stream.write(self._text(record, ctx) + "\n")
+        self.stream.flush()
+        if self._file is not None:
+            self._file.emit(logging.makeLogRecord({"msg": json_line or self._json(record, ctx)}))
+
+    @staticmethod
+    def _text(record: dict, ctx: dict) -> str:
+        where = f"{record['name']}:{record['function']}:{record['line']}"
+        extra = " ".join(f"{k}={v}" for k, v in {**ctx, **record["extra"]}.items())
+        line = (f"{record['time']:%Y.%m.%d %H:%M:%S.%f}"[:-3] + f" | {record['level'].name:<8} | {where} | "
+                f"{record['message']}" + (f" | {extra}" if extra else ""))
+        exception = record["exception"]
+        if exception is not None:
+            line += "\n" + "".join(traceback.format_exception(exception.type, exception.value,
+                                                              exception.traceback)).rstrip()
+        return line
+
+    @staticmethod
+    def _json(record: dict, ctx: dict) -> str:
+        data = {
+            "ts": record["time"].isoformat(timespec="milliseconds"),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "func": record["function"],
+            "line": record["line"],
+            "thread": record["thread"].name,
+            "msg": record["message"],
+            **ctx,
+            **record["extra"],
+        }
+        exception = record["exception"]
+        if exception is not None:
+            data["exc"] = "".join(traceback.format_exception(exception.type, exception.value,
+                                                             exception.traceback))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+    def stop(self, timeout: float = 5) -> None:
+        """Дописывает очередь и останавливает поток."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._file is not None:
+            self._file.close()
+
+
+_pipeline: LogPipeline | None = None
+
 
+def setup_logging() -> LogPipeline:
+    """
+    Единая настройка логов процесса (вызывать первым делом в main и в процессах-воркерах):
+    loguru с уровнями по модулям из LOG_LEVEL/LOG_LEVELS, перехват стандартного logging,
+    неблокирующий вывод через LogPipeline.
+    """
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
 
-if not os.path.exists("logs"):
-    os.makedirs("logs")
-    logger.error(f"Не удалось создать директорию logs. Продолжаем работу с текущей директорией.")
-    sys.exit(1)
+    levels = {"": settings.LOG_LEVEL, **_parse_levels(settings.LOG_LEVELS)}
+    _pipeline = LogPipeline(stream_format=settings.LOG_FORMAT, file_path=settings.LOG_FILE,
+                            max_bytes=settings.LOG_FILE_MAX_BYTES, backups=settings.LOG_FILE_BACKUPS,
+                            queue_size=settings.LOG_QUEUE_SIZE)
+    logger.remove()
+    # format-функция без {exception}: трейсбек форматирует фоновый поток, а не хендлер
+    logger.add(_pipeline.sink, level=0, filter=levels, format=lambda record: "{message}",
+               backtrace=False, diagnose=False, catch=True)
 
+    # стандартный logging: записи ниже самого подробного из уровней даже не создаются
+    lowest = min(logger.level(level).no for level in levels.values())
+    logging.basicConfig(handlers=[InterceptHandler()], level=lowest, force=True)
+    telebot_logger = logging.getLogger("TeleBot")
+    telebot_logger.handlers.clear()     # свой StreamHandler telebot дублировал бы вывод
+    telebot_logger.setLevel(logging.NOTSET)
 
-# def logging(message):
-#     """
-#     Логирование в logs/bot.log юзернейма и отправленного сообщения пользователем.
-#     :param message:
-#     :return:
-#     """
-#     logger.add("logs/Next'25.log", format=LOG_FORMAT, colorize=False, backtrace=True, diagnose=True)
-#     logger.info(f"Пользователь: {message.from_user.username}")
-#     logger.info(f"Отправил сообщение: {message.text}")
+    atexit.register(_pipeline.stop)
+    return _pipeline
@@ -11,24 +11,94 @@ from app.handlers.driver import register_driver_handlers
 from app.handlers.dispatcher import register_dispatcher_handlers
 from app.handlers.chat import register_chat_handlers
 from app.handlers.delete_user import register_delete_user_handlers
+from app.handlers.admin import register_admin_handlers
+from app.handlers.bulk_actions import register_bulk_actions_handlers
+from app.services.notifications import register_notification_subscribers
+from app.services.dedup import install_update_dedup
+from app.services.scheduler import install_chat_scheduler
+from app.services.supervisor import start_supervisor
+from app.services.webhook import run_webhook
+from app.services.async_runtime import run_async
+from app.services.metrics import install_instrumentation, metrics, start_metrics_server
+from app.services.slow_queries import install_query_log
+from app.services.archive import start_archiver
+from app.services.rollup import backfill_rollup, register_rollup_subscriber
+from app.services.charts import chart_cache
+from app.services.assignment import register_assignment_scorer
+from app.services.roster import register_roster
 from app.config.settings import settings
+from app.logs.logging import setup_logging
 
 
-# db
-create_all_tables()
-#### delete row in the DB
 
+def setup_bot(bot: TeleBot):
+    """
+    Хендлеры и подписчики событий. Общая часть для обычного запуска и процессов-воркеров супервизора.
+    Возвращает подписчика уведомлений (его нужно сбросить при остановке).
+    """
+    # handlers
+    register_handlers(bot) ### хендлер для первичной регистраци юзеров
+    register_profile_handlers(bot) ### хендлер для вывода профиля /profile
+    register_driver_handlers(bot)
+    register_dispatcher_handlers(bot)
+    register_manager_handlers(bot)
+    register_bulk_actions_handlers(bot)  ### выбор нескольких заявок и одно действие на все (диспетчер, руководитель)
+    register_delete_user_handlers(bot)
+    register_admin_handlers(bot)  ### /perf для ADMIN_IDS
+    install_instrumentation(bot)  ### время, SQL и вызовы API каждого хендлера — после регистрации всех
+    install_query_log(bot)  ### медленные SQL, EXPLAIN новых запросов и сводка админам
+    metrics.add_source("charts", chart_cache.snapshot)  ### попадания в кэш графиков аналитики — в /perf
 
-# handlers
-register_handlers(bot) ### хендлер для первичной регистраци юзеров
-register_profile_handlers(bot) ### хендлер для вывода профиля /profile
-register_driver_handlers(bot)
-register_dispatcher_handlers(bot)
-register_manager_handlers(bot)
-register_delete_user_handlers(bot)
-logger.info("Bot is up")
+    # events
+    metrics.add_source("roster", register_roster().snapshot)  ### снимок активных пользователей для списков и ролей
+    register_rollup_subscriber()  ### дневные сводки для «📈 Аналитика» пополняются по событиям заявок
+    metrics.add_source("assignment", register_assignment_scorer().snapshot)  ### агрегаты подбора водителя
+    return register_notification_subscribers(bot)  ### уведомления участникам заявки через шину событий
+
+
+def main():
+    setup_logging()  ### один неблокирующий вывод логов на процесс, уровни из LOG_LEVEL/LOG_LEVELS
+
+    # db
+    create_all_tables()
+    backfill_rollup()  ### один раз: сводки по уже существующим заявкам (пока хендлеры не запущены)
+    start_archiver()  ### старые завершённые заявки переезжают в *_archive (один процесс, не воркеры)
+    #### delete row in the DB
+
+    supervisor = scheduler = notifications = None
+    if settings.SUPERVISOR_WORKERS > 0:
+        # хендлеры работают в процессах-воркерах, здесь только приём апдейтов
+        supervisor = start_supervisor(bot)
+    else:
+        notifications = setup_bot(bot)
+        # только для polling: у webhook и async свой пул хендлеров и своё ограничение (429 / max_in_flight),
+        # а неограниченные очереди шардов планировщика забирали бы апдейты в обход него
+        if settings.BOT_MODE == "polling":
+            scheduler = install_chat_scheduler(bot)  ### апдейты одного чата по очереди, разные чаты параллельно
+        if scheduler is not None:
+            metrics.add_source("scheduler", scheduler.snapshot)
+        start_metrics_server()  ### /metrics для Prometheus, если задан METRICS_PORT
+
+    # updates
+    install_update_dedup(bot)  ### дубли апдейтов и двойные нажатия отбрасываются до хендлеров
+    logger.info("Bot is up")
+
+    # если обработанные update_id сохраняются в БД — очередь после рестарта можно не выбрасывать
+    try:
+        if settings.BOT_MODE == "webhook":
+            run_webhook(bot, drop_pending=not settings.DEDUP_PERSIST)
+        elif settings.BOT_MODE == "async":
+            run_async(bot, skip_pending=not settings.DEDUP_PERSIST)
+        else:
+            bot.infinity_polling(skip_pending=not settings.DEDUP_PERSIST)
+    finally:
+        if supervisor is not None:
+            supervisor.stop()
+        if scheduler is not None:
+            scheduler.stop()
+        if notifications is not None:
+            notifications.flush_all()
 
-bot.infinity_polling(skip_pending=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+# services/assignment.py
+import heapq
+import threading
+import time
+from datetime import date, datetime
+from typing import Iterable
+
+from peewee import fn
+
+from app.config.settings import settings
+from app.database.models import Order, OrderStatus, OrderStatusHistory, User, UserRole
+from app.services import events
+from app.services.events import Event, EventBus, bus
+from app.services.state_machine import TERMINAL
+
+# веса оценки: опыт на маршруте и недавняя активность в плюс, каждая заявка в работе в минус
+W_ROUTE, W_FRESH, W_LOAD = 2.0, 1.0, 1.0
+
+
+def route_key(from_addr: str | None, to_addr: str | None) -> tuple[str, str]:
+    """Маршрут с точностью до населённого пункта: часть адреса до первой запятой, без регистра и «ё»."""
+    def place(addr):
+        return " ".join((addr or "").split(",")[0].lower().replace("ё", "е").split())
+    return place(from_addr), place(to_addr)
+
+
+class DriverLoad:
+    """Агрегаты водителя: заявок в работе, эпоха последней смены статуса им самим, доставки по маршрутам."""
+    __slots__ = ("active", "last_update", "routes")
+
+    def __init__(self):
+        self.active = 0
+        self.last_update: float | None = None
+        self.routes: dict[tuple[str, str], int] = {}
+
+
+class Suggestion:
+    __slots__ = ("driver_id", "score", "active", "route_deliveries", "last_update")
+
+    def __init__(self, driver_id: int, score: float, load: DriverLoad, route_deliveries: int):
+        self.driver_id = driver_id
+        self.score = score
+        self.active = load.active
+        self.route_deliveries = route_deliveries
+        self.last_update = load.last_update
+
+
+_EMPTY = DriverLoad()
+
+
+class AssignmentScorer:
+    """
+    Подбор водителя для заявки.
+
+    Агрегаты по водителям (DriverLoad) держатся в памяти: подписчик шины пересчитывает их из БД только для
+    водителей, затронутых событием (несколько GROUP BY по индексу driver), а suggest() — проход по словарю
+    без запросов. Словарь заменяется целиком (copy-on-write), поэтому чтение идёт без блокировки.
+    События других процессов (воркеры супервизора) сюда не доходят — раз в refresh_seconds агрегаты
+    пересчитываются полностью.
+
+    Оценка: W_ROUTE·n/(n+2) за n доставок по тому же маршруту за window_days дней,
+    W_FRESH/(1 + часы с последней смены статуса/24) и −W_LOAD за каждую заявку в работе.
+    """
+
+    def __init__(self, window_days: int = 90, refresh_seconds: float = 300):
+        self.window_days = window_days
+        self.refresh_seconds = refresh_seconds
+        self._drivers: dict[int, DriverLoad] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.suggestions = 0
+
+    def attach(self, event_bus: EventBus) -> None:
+        for name in (events.ORDER_CREATED, events.ORDER_STATUS_CHANGED, events.ORDER_ACCEPTED,
+                     events.ORDER_DRIVER_ASSIGNED, events.ORDERS_IMPORTED, events.ORDERS_STATUS_CHANGED):
+            event_bus.subscribe(name, self)
+
+    def __call__(self, event: Event) -> None:
+        orders = event.payload.get("orders") or ([event.order] if event.order is not None else [])
+        driver_ids = {order.driver_id for order in orders if order.driver_id}
+        if event.payload.get("prev_driver_id"):
+            driver_ids.add(event.payload["prev_driver_id"])
+        if driver_ids and self._loaded_at:
+            self.refresh(driver_ids)
+
+    # ---------- пересчёт ----------
+    def refresh(self, driver_ids: Iterable[int] | None = None) -> None:
+        """Пересчитать агрегаты из БД для driver_ids (None — для всех водителей)."""
+        ids = None if driver_ids is None else list(driver_ids)
+        loads: dict[int, DriverLoad] = {i: DriverLoad() for i in ids} if ids is not None else {}
+
+        def load(driver_id) -> DriverLoad:
+            return loads.setdefault(driver_id, DriverLoad())
+
+        active = Order.select(Order.driver, fn.COUNT(Order.id)).where(Order.status.not_in(list(TERMINAL)))
+        history = (OrderStatusHistory.select(OrderStatusHistory.by_user, fn.MAX(OrderStatusHistory.created_at))
+                   .join(User, on=(OrderStatusHistory.by_user == User.id))
+                   .where(User.role == int(UserRole.DRIVER)))
+        delivered = Order.select(Order.driver, Order.from_addr, Order.to_addr).where(
+            (Order.status == int(OrderStatus.DELIVERED)) &
+            (Order.day_bucket >= date.today().toordinal() - self.window_days))
+        if ids is not None:
+            active = active.where(Order.driver.in_(ids))
+            history = history.where(OrderStatusHistory.by_user.in_(ids))
+            delivered = delivered.where(Order.driver.in_(ids))
+        else:
+            active = active.where(Order.driver.is_null(False))
+            delivered = delivered.where(Order.driver.is_null(False))
+
+        for driver_id, count in active.group_by(Order.driver).tuples():
+            load(driver_id).active = count
+        for driver_id, last in history.group_by(OrderStatusHistory.by_user).tuples():
+            if isinstance(last, str):
+                last = datetime.fromisoformat(last)
+            if last is not None:
+                load(driver_id).last_update = last.timestamp()
+        for driver_id, from_addr, to_addr in delivered.tuples().iterator():
+            routes = load(driver_id).routes
+            key = route_key(from_addr, to_addr)
+            routes[key] = routes.get(key, 0) + 1
+
+        with self._lock:
+            self._drivers = loads if ids is None else {**self._drivers, **loads}
+            if ids is None:
+                self._loaded_at = time.monotonic()
+            self.refreshes += 1
+
+    # ---------- подбор ----------
+    def suggest(self, candidates: Iterable[int], from_addr: str | None = None, to_addr: str | None = None,
+                limit: int = 3) -> list[Suggestion]:
+        """Лучшие limit водителей из candidates (id активных водителей) для маршрута from_addr → to_addr."""
+        if time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.refresh()
+        drivers = self._drivers
+        route = route_key(from_addr, to_addr) if from_addr and to_addr else None
+        now = time.time()
+        scored = []
+        for driver_id in candidates:
+            load = drivers.get(driver_id, _EMPTY)
+            deliveries = load.routes.get(route, 0) if route else 0
+            fresh = 1 / (1 + (now - load.last_update) / 86400) if load.last_update else 0.0
+            score = W_ROUTE * deliveries / (deliveries + 2) + W_FRESH * fresh - W_LOAD * load.active
+            scored.append(Suggestion(driver_id, score, load, deliveries))
+        self.suggestions += 1
+        return heapq.nlargest(limit, scored, key=lambda s: s.score)
+
+    def snapshot(self) -> dict:
+        return {"drivers": len(self._drivers), "refreshes": self.refreshes, "suggestions": self.suggestions}
+
+
+assignment = AssignmentScorer(window_days=settings.ASSIGN_ROUTE_WINDOW_DAYS,
+                              refresh_seconds=settings.ASSIGN_REFRESH_SECONDS)
+
+
+def register_assignment_scorer() -> AssignmentScorer:
+    """Подключает пересчёт агрегатов подбора водителя к общей шине событий."""
+    assignment.attach(bus)
+    return assignment
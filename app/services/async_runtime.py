@@ -0,0 +1,128 @@
+# services/async_runtime.py
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from loguru import logger
+from telebot import TeleBot, apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from app.config.settings import settings
+
+
+class _SyncResponse:
+    """Ответ в виде, который ожидает синхронный apihelper (status_code/reason/text/json)."""
+    __slots__ = ("status_code", "reason", "text")
+
+    def __init__(self, status_code: int, reason: str, text: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncRuntime:
+    """
+    Асинхронный движок приёма и отправки поверх существующих хендлеров.
+
+    - апдейты забирает AsyncTeleBot (long polling в event loop, без потока-поллера);
+    - каждый апдейт уходит в ограниченный пул потоков: хендлеры и блокирующие вызовы peewee остаются
+      синхронными, а число одновременных соединений SQLite ограничено размером пула (у peewee
+      соединение на поток);
+    - все исходящие запросы хендлеров (send_message и т.д.) идут через одну aiohttp-сессию с keep-alive
+      в том же event loop, вместо отдельной requests-сессии в каждом потоке;
+    - max_in_flight ограничивает число апдейтов в работе: при насыщении loop перестаёт забирать новые.
+    """
+
+    def __init__(self, bot: TeleBot, workers: int = 16, max_in_flight: int = 256, connections: int = 32):
+        self.bot = bot
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.connections = connections
+        self.processed = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._stopping = False
+
+    # ---------- исходящие запросы ----------
+    async def _request(self, method: str, url: str, params, files, timeout) -> _SyncResponse:
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        async with self._session.request(method=method, url=url,
+                                         data=asyncio_helper._prepare_data(params, files),
+                                         timeout=aiohttp.ClientTimeout(total=read_timeout)) as resp:
+            return _SyncResponse(resp.status, resp.reason or "", await resp.text())
+
+    def _send(self, method, url, params=None, files=None, timeout=None, proxies=None, **kwargs):
+        """apihelper.CUSTOM_REQUEST_SENDER: вызов из потока хендлера, выполнение в event loop."""
+        future = asyncio.run_coroutine_threadsafe(self._request(method, url, params, files, timeout), self._loop)
+        return future.result()
+
+    # ---------- обработка ----------
+    def _process(self, update) -> None:
+        try:
+            self.bot.process_new_updates([update])
+        except Exception:
+            logger.exception(f"Failed to process update {update.update_id}")
+
+    async def run(self, skip_pending: bool = True) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=self.connections, keepalive_timeout=60, ssl=asyncio_helper.session_manager.ssl_context))
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix="handlers")
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        previous_sender = apihelper.CUSTOM_REQUEST_SENDER
+        apihelper.CUSTOM_REQUEST_SENDER = self._send
+        # хендлеры выполняются в нашем пуле; собственный пул telebot здесь не нужен
+        self.bot.threaded = False
+
+        poller = AsyncTeleBot(self.bot.token)
+        offset = None
+        try:
+            if skip_pending:
+                await poller.skip_updates()
+            while not self._stopping:
+                try:
+                    updates = await poller.get_updates(offset=offset, timeout=20, request_timeout=30)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("getUpdates failed")
+                    await asyncio.sleep(3)
+                    continue
+                for update in updates:
+                    offset = update.update_id + 1
+                    await in_flight.acquire()
+                    task = self._loop.run_in_executor(executor, self._process, update)
+                    task.add_done_callback(lambda _: self._done(in_flight))
+        finally:
+            apihelper.CUSTOM_REQUEST_SENDER = previous_sender
+            # дожидаемся начатых хендлеров: им ещё нужен loop для отправки ответов
+            await self._loop.run_in_executor(None, executor.shutdown, True)
+            await poller.close_session()
+            await self._session.close()
+
+    def _done(self, in_flight: asyncio.Semaphore) -> None:
+        self.processed += 1
+        in_flight.release()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+
+def run_async(bot: TeleBot, skip_pending: bool = True) -> None:
+    """Запускает бота на асинхронном движке с параметрами из настроек."""
+    runtime = AsyncRuntime(
+        bot,
+        workers=settings.ASYNC_WORKERS,
+        max_in_flight=settings.ASYNC_MAX_IN_FLIGHT,
+        connections=settings.ASYNC_HTTP_CONNECTIONS,
+    )
+    logger.info(f"Async runtime: {settings.ASYNC_WORKERS} handler threads, "
+                f"{settings.ASYNC_HTTP_CONNECTIONS} keep-alive connections")
+    try:
+        asyncio.run(runtime.run(skip_pending=skip_pending))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,221 @@
+# services/charts.py
+import io
+import math
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from loguru import logger
+from PIL import Image, ImageDraw, ImageFont
+from telebot import TeleBot
+
+from app.config.settings import settings
+from app.database.models import OrderStatus, User
+from app.services import rollup
+
+WIDTH, HEIGHT = 900, 480
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 70, 30, 60, 60
+BACKGROUND, GRID, AXIS, TEXT = "#ffffff", "#e6e6e6", "#999999", "#333333"
+PALETTE = ("#2f6fdf", "#2ca25f", "#e34a33", "#f5a300", "#8856a7", "#43a2ca", "#636363")
+
+_fonts: dict[int, ImageFont.ImageFont] = {}
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    """CHART_FONT, иначе DejaVuSans из системных шрифтов (кириллица), иначе встроенный шрифт Pillow."""
+    font = _fonts.get(size)
+    if font is None:
+        for name in filter(None, (settings.CHART_FONT, "DejaVuSans.ttf")):
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            font = ImageFont.load_default(size)
+        _fonts[size] = font
+    return font
+
+
+def _nice_max(value: float) -> float:
+    """Верх шкалы: ближайшее сверху 1/2/5 × 10^k."""
+    if value <= 0:
+        return 1
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+    return 10 * magnitude
+
+
+def _canvas(title: str) -> tuple[Image.Image, ImageDraw.ImageDraw]:
+    image = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.text((MARGIN_LEFT, 18), title, fill=TEXT, font=_font(20))
+    return image, draw
+
+
+def _png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def render_line_chart(title: str, labels: tuple[str, ...], series: tuple[tuple[str, tuple[int, ...]], ...]) -> bytes:
+    """Линии по дням: labels — подписи оси X, series — (название, значения) для каждой линии."""
+    image, draw = _canvas(title)
+    small = _font(12)
+    left, top, right, bottom = MARGIN_LEFT, MARGIN_TOP, WIDTH - MARGIN_RIGHT, HEIGHT - MARGIN_BOTTOM
+    top_value = _nice_max(max((max(values, default=0) for _, values in series), default=0))
+
+    for i in range(5):
+        y = bottom - (bottom - top) * i / 4
+        draw.line((left, y, right, y), fill=GRID)
+        draw.text((left - 8, y), f"{top_value * i / 4:g}", fill=TEXT, font=small, anchor="rm")
+    draw.line((left, top, left, bottom), fill=AXIS)
+    draw.line((left, bottom, right, bottom), fill=AXIS)
+
+    count = len(labels)
+    step_x = (right - left) / max(count - 1, 1)
+    every = max(1, math.ceil(count / 12))       # не больше 12 подписей дат
+    for i in range(0, count, every):
+        draw.text((left + i * step_x, bottom + 8), labels[i], fill=TEXT, font=small, anchor="mt")
+
+    legend_x = right
+    for (name, values), color in reversed(list(zip(series, PALETTE))):
+        points = [(left + i * step_x, bottom - (bottom - top) * value / top_value) for i, value in enumerate(values)]
+        if len(points) > 1:
+            draw.line(points, fill=color, width=3, joint="curve")
+        if count <= 31:
+            for x, y in points:
+                draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=color)
+        legend_x -= draw.textlength(name, font=small) + 26
+        draw.rectangle((legend_x, 24, legend_x + 12, 36), fill=color)
+        draw.text((legend_x + 16, 30), name, fill=TEXT, font=small, anchor="lm")
+    return _png(image)
+
+
+def render_bar_chart(title: str, bars: tuple[tuple[str, int], ...]) -> bytes:
+    """Горизонтальные столбцы (подпись, значение) — по водителям, по статусам."""
+    image, draw = _canvas(title)
+    font = _font(14)
+    if not bars:
+        draw.text((WIDTH / 2, HEIGHT / 2), "нет данных", fill=AXIS, font=font, anchor="mm")
+        return _png(image)
+
+    label_width = min(260, max(draw.textlength(label, font=font) for label, _ in bars) + 16)
+    left, top, right, bottom = MARGIN_LEFT + label_width, MARGIN_TOP, WIDTH - MARGIN_RIGHT - 50, HEIGHT - 30
+    row = min((bottom - top) / len(bars), 44)
+    top_value = max(value for _, value in bars) or 1
+    for i, ((label, value), color) in enumerate(zip(bars, PALETTE * len(bars))):
+        y = top + i * row
+        middle = y + row / 2
+        draw.text((left - 10, middle), label, fill=TEXT, font=font, anchor="rm")
+        draw.rectangle((left, y + row * 0.15, left + (right - left) * value / top_value, y + row * 0.85), fill=color)
+        draw.text((left + (right - left) * value / top_value + 8, middle), str(value), fill=TEXT, font=font,
+                  anchor="lm")
+    return _png(image)
+
+
+# ---------- данные графиков (из дневных сводок services/rollup.py) ----------
+def _daily_data(days: int) -> tuple:
+    today = date.today().toordinal()
+    first = today - days + 1
+    rows = rollup.daily(first)
+    span = range(first, today + 1)
+    labels = tuple(f"{date.fromordinal(day):%d.%m}" for day in span)
+    series = tuple((name, tuple(rows.get(day, {}).get(counter, 0) for day in span))
+                   for name, counter in (("Создано", "created"), ("Доставлено", "delivered"),
+                                         ("Отменено", "cancelled")))
+    return labels, series
+
+
+def _drivers_data(days: int) -> tuple:
+    top = rollup.top_keys("driver", date.today().toordinal() - days + 1, limit=10)
+    names = {u.id: f"{u.first_name or ''} {u.last_name or ''}".strip() or f"ID {u.id}"
+             for u in User.select().where(User.id.in_([key for key, _ in top]))} if top else {}
+    return (tuple((names.get(key, f"ID {key}"), count) for key, count in top),)
+
+
+def _statuses_data(days: int) -> tuple:
+    counts = dict(rollup.top_keys("status", date.today().toordinal() - days + 1, counter="transitions",
+                                  limit=len(OrderStatus)))
+    return (tuple((status.label, counts[int(status)]) for status in OrderStatus if counts.get(int(status))),)
+
+
+# название -> (заголовок, загрузка данных, отрисовка)
+CHARTS = {
+    "daily": ("Заявки по дням", _daily_data, render_line_chart),
+    "drivers": ("Доставки по водителям", _drivers_data, render_bar_chart),
+    "statuses": ("Смены статусов", _statuses_data, render_bar_chart),
+}
+
+
+class CachedChart:
+    __slots__ = ("png", "file_id")
+
+    def __init__(self, png: bytes):
+        self.png = png
+        self.file_id: str | None = None
+
+
+class ChartCache:
+    """
+    LRU отрисованных графиков на capacity записей.
+
+    Ключ — (график, период, данные): сами данные из сводок и служат отметкой актуальности, поэтому новый
+    день или новая доставка дают новый ключ, а старый вытесняется. После первой отправки запоминается
+    file_id фото в Telegram: повторный показ — один send_photo по file_id, без отрисовки и выгрузки.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.hits = self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> CachedChart | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, png: bytes) -> CachedChart:
+        with self._lock:
+            entry = self._entries[key] = CachedChart(png)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            return entry
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+chart_cache = ChartCache(settings.CHART_CACHE_SIZE)
+
+
+def send_chart(bot: TeleBot, chat_id: int, name: str, days: int) -> None:
+    """Отправляет график name за последние days дней, по возможности из кэша."""
+    title, load, render = CHARTS[name]
+    caption = f"{title} за {days} дн."
+    data = load(days)
+    key = (name, days, data)
+    entry = chart_cache.get(key)
+    if entry is not None and entry.file_id:
+        try:
+            bot.send_photo(chat_id, entry.file_id, caption=caption)
+            return
+        except Exception:
+            logger.warning(f"Cached chart file_id rejected, uploading {name} again")
+            entry.file_id = None
+    if entry is None:
+        entry = chart_cache.put(key, render(caption, *data))
+    message = bot.send_photo(chat_id, entry.png, caption=caption)
+    if message is not None and message.photo:
+        entry.file_id = message.photo[-1].file_id
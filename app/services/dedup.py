@@ -0,0 +1,135 @@
+# services/dedup.py
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+from telebot import TeleBot, types
+
+from app.config.settings import settings
+from app.database.models import ProcessedUpdate, db
+
+
+class UpdateDeduplicator:
+    """
+    Отбрасывает повторные апдейты до того, как их увидит любой хендлер.
+
+    Апдейт считается дублем, если:
+      - его update_id (или id callback_query) уже встречался — повтор после рестарта/ретрая доставки;
+      - это callback_query с теми же (пользователь, callback_data), что и нажатие меньше window секунд назад —
+        двойной тап на плохой мобильной связи.
+
+    Память ограничена capacity записей (кольцо на OrderedDict).
+    При persist=True обработанные update_id пишутся в таблицу processed_updates и подгружаются при старте.
+    """
+
+    def __init__(self, window: float = 2.0, capacity: int = 4096, persist: bool = False):
+        self.window = window
+        self.capacity = capacity
+        self.persist = persist
+        self.dropped = 0
+        self._seen: OrderedDict = OrderedDict()      # update_id / callback id -> None
+        self._taps: OrderedDict = OrderedDict()      # (user_id, callback_data) -> monotonic ts
+        self._lock = threading.Lock()
+        if persist:
+            self._load_persisted()
+
+    # ---------- кольцо ----------
+    def _remember(self, ring: OrderedDict, key, value=None) -> None:
+        ring[key] = value
+        ring.move_to_end(key)
+        while len(ring) > self.capacity:
+            ring.popitem(last=False)
+
+    def _load_persisted(self) -> None:
+        try:
+            rows = (ProcessedUpdate
+                    .select(ProcessedUpdate.update_id)
+                    .order_by(ProcessedUpdate.update_id.desc())
+                    .limit(self.capacity)
+                    .tuples())
+            for (update_id,) in reversed(list(rows)):
+                self._remember(self._seen, ("u", update_id))
+        except Exception:
+            logger.exception("Failed to load processed updates")
+
+    def _persist(self, update_ids: list[int]) -> None:
+        try:
+            with db.atomic():
+                ProcessedUpdate.insert_many([{"update_id": u} for u in update_ids]).on_conflict_ignore().execute()
+                # держим таблицу того же размера, что и кольцо в памяти
+                ProcessedUpdate.delete().where(
+                    ProcessedUpdate.update_id <= max(update_ids) - self.capacity
+                ).execute()
+        except Exception:
+            logger.exception("Failed to persist processed updates")
+
+    # ---------- проверка ----------
+    def is_duplicate(self, update: types.Update) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            key = ("u", update.update_id)
+            if key in self._seen:
+                return True
+            self._remember(self._seen, key)
+
+            call = update.callback_query
+            if call is None:
+                return False
+
+            call_key = ("c", call.id)
+            if call_key in self._seen:
+                return True
+            self._remember(self._seen, call_key)
+
+            tap = (call.from_user.id, call.data)
+            last = self._taps.get(tap)
+            self._remember(self._taps, tap, now)
+            return last is not None and now - last < self.window
+
+    def filter(self, updates: list[types.Update]) -> list[types.Update]:
+        fresh = []
+        for update in updates:
+            if self.is_duplicate(update):
+                self.dropped += 1
+                logger.debug(f"Duplicate update {update.update_id} dropped")
+                continue
+            fresh.append(update)
+        if self.persist and fresh:
+            self._persist([u.update_id for u in fresh])
+        return fresh
+
+    def install(self, bot: TeleBot) -> None:
+        """Встраивается перед bot.process_new_updates: дубли не доходят ни до одного хендлера."""
+        process = bot.process_new_updates
+
+        def process_new_updates(updates):
+            # offset для getUpdates telebot сдвигает внутри process_new_updates — отброшенные апдейты
+            # тоже нужно учесть, иначе polling будет получать их снова
+            for update in updates:
+                bot.last_update_id = max(bot.last_update_id, update.update_id)
+            fresh = self.filter(updates)
+            if len(fresh) != len(updates):
+                ids = {id(u) for u in fresh}
+                for update in updates:
+                    # гасим «часики» на кнопке у повторного нажатия, иначе клиент будет ждать ответа
+                    if id(update) not in ids and update.callback_query is not None:
+                        try:
+                            bot.answer_callback_query(update.callback_query.id)
+                        except Exception:
+                            pass
+            if fresh:
+                process(fresh)
+
+        bot.process_new_updates = process_new_updates
+
+
+def install_update_dedup(bot: TeleBot) -> UpdateDeduplicator:
+    """Подключает фильтр дублей к боту с параметрами из настроек."""
+    dedup = UpdateDeduplicator(
+        window=settings.DEDUP_WINDOW_SECONDS,
+        capacity=settings.DEDUP_CAPACITY,
+        persist=settings.DEDUP_PERSIST,
+    )
+    dedup.install(bot)
+    return dedup
@@ -0,0 +1,82 @@
+# services/events.py
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from loguru import logger
+
+# ---------- Имена событий жизненного цикла заявки ----------
+ORDER_CREATED = "order.created"
+ORDER_UPDATED = "order.updated"                  # правка полей (адреса, дата, груз...)
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_ACCEPTED = "order.accepted"                # водитель принял заявку
+ORDER_DRIVER_ASSIGNED = "order.driver_assigned"
+ORDER_COMMENT_ADDED = "order.comment_added"
+ATTACHMENT_ADDED = "attachment.added"
+ORDERS_IMPORTED = "orders.imported"              # импорт файла: order=None, payload["orders"] — созданные заявки
+ORDERS_STATUS_CHANGED = "orders.status_changed"  # массовая смена статуса: order=None, payload["orders"] (уже
+                                                 # в новом статусе), ["status"], ["prev_statuses"], ["reason"]
+
+# ---------- Имена событий пользователей ----------
+USER_CHANGED = "user.changed"                    # регистрация, смена роли/данных, (де)активация: payload["user"]
+
+ALL_EVENTS = "*"
+
+
+@dataclass(frozen=True)
+class Event:
+    """
+    Событие шины.
+    order/actor — уже загруженные модели (Order / User), чтобы подписчикам не ходить в БД повторно.
+    payload — произвольные данные конкретного события.
+    """
+    name: str
+    order: Any = None
+    actor: Any = None
+    payload: dict = field(default_factory=dict)
+    ts: datetime = field(default_factory=datetime.now)
+
+    @property
+    def order_id(self) -> int | None:
+        return self.order.id if self.order is not None else None
+
+
+class EventBus:
+    """
+    Синхронная внутрипроцессная шина событий.
+    Подписчики вызываются в потоке публикующего хендлера; ошибка подписчика
+    логируется и не ломает ни хендлер, ни остальных подписчиков.
+    Списки подписчиков — неизменяемые кортежи (copy-on-write), поэтому publish работает без блокировки.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, tuple[Callable[[Event], None], ...]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, name: str, handler: Callable[[Event], None]) -> None:
+        """Подписать handler на событие name (или на все события через "*")."""
+        with self._lock:
+            current = self._subscribers.get(name, ())
+            if handler not in current:
+                self._subscribers[name] = current + (handler,)
+
+    def unsubscribe(self, name: str, handler: Callable[[Event], None]) -> None:
+        with self._lock:
+            current = self._subscribers.get(name, ())
+            self._subscribers[name] = tuple(h for h in current if h is not handler)
+
+    def publish(self, name: str, order=None, actor=None, **payload) -> Event:
+        """Создаёт событие и синхронно раздаёт его подписчикам."""
+        event = Event(name=name, order=order, actor=actor, payload=payload)
+        handlers = self._subscribers.get(name, ()) + self._subscribers.get(ALL_EVENTS, ())
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception(f"Event subscriber {handler!r} failed on {name}")
+        return event
+
+
+# общий экземпляр шины (как bot в utils/loader.py)
+bus = EventBus()
@@ -0,0 +1,354 @@
+# services/metrics.py
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger
+from telebot import TeleBot, apihelper
+
+from app.config.settings import settings
+from app.database.session import db
+
+# списки хендлеров TeleBot, которые оборачиваем (остальные типы апдейтов бот не использует)
+_HANDLER_LISTS = ("message_handlers", "edited_message_handlers", "callback_query_handlers",
+                  "inline_handlers", "my_chat_member_handlers", "chat_member_handlers")
+
+# лог-линейные корзины как в HdrHistogram: 16 корзин на каждую степень двойки (~6% точности)
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+_BUCKETS = 64 * _SUB
+
+
+def _bucket_value(index: int) -> int:
+    """Середина корзины в микросекундах."""
+    if index < 2 * _SUB:
+        return index
+    shift = index // _SUB - 1
+    return ((index - shift * _SUB) << shift) + (1 << shift) // 2
+
+
+class RollingHistogram:
+    """
+    Гистограмма длительностей (мкс) за скользящее окно: текущее и предыдущее окно,
+    при снятии они складываются — видно последние window..2*window секунд, старое выпадает.
+    """
+    __slots__ = ("window", "_started", "_current", "_previous")
+
+    def __init__(self, window: float):
+        self.window = window
+        self._started = time.monotonic()
+        self._current = [0] * _BUCKETS
+        self._previous = [0] * _BUCKETS
+
+    def _rotate(self, now: float) -> None:
+        if now - self._started >= 2 * self.window:
+            self._previous = [0] * _BUCKETS
+        else:
+            self._previous = self._current
+        self._current = [0] * _BUCKETS
+        self._started = now
+
+    def record(self, seconds: float, now: float) -> None:
+        if now - self._started >= self.window:
+            self._rotate(now)
+        # корзина: мелкие значения точно, дальше старшие _SUB_BITS + 1 бит (обратное — _bucket_value);
+        # считается здесь же, без вызова функции — это путь каждого хендлера
+        us = int(seconds * 1_000_000)      # 64 степени двойки в корзинах — переполнения нет
+        if us < 2 * _SUB:
+            self._current[us] += 1
+        else:
+            shift = us.bit_length() - _SUB_BITS - 1
+            self._current[shift * _SUB + (us >> shift)] += 1
+
+    def merged(self, now: float) -> list[int]:
+        if now - self._started >= self.window:
+            self._rotate(now)
+        return [a + b for a, b in zip(self._current, self._previous)]
+
+
+def _percentiles(counts: list[int], *pcts: float) -> tuple[int, list[float]]:
+    """Количество наблюдений и перцентили (мс) по корзинам гистограммы."""
+    total = sum(counts)
+    result = []
+    for pct in pcts:
+        if not total:
+            result.append(0.0)
+            continue
+        rank, seen = pct / 100 * total, 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                result.append(_bucket_value(index) / 1000)
+                break
+    return total, result
+
+
+class HandlerMetrics:
+    """Накопительные счётчики хендлера (для Prometheus) и гистограммы за окно (для /perf)."""
+    __slots__ = ("calls", "errors", "wall", "db_queries", "db_time", "api_calls", "api_time", "last_error",
+                 "wall_hist", "db_hist", "api_hist")
+
+    def __init__(self, window: float):
+        self.calls = self.errors = self.db_queries = self.api_calls = 0
+        self.wall = self.db_time = self.api_time = 0.0
+        self.last_error: str | None = None
+        self.wall_hist = RollingHistogram(window)
+        self.db_hist = RollingHistogram(window)
+        self.api_hist = RollingHistogram(window)
+
+
+class _Call:
+    """Счётчики одного выполняющегося хендлера (живут в thread-local); event — Message/CallbackQuery."""
+    __slots__ = ("name", "event", "db_queries", "db_time", "api_calls", "api_time")
+
+    def __init__(self, name: str, event=None):
+        self.name = name
+        self.event = event
+        self.db_queries = self.api_calls = 0
+        self.db_time = self.api_time = 0.0
+
+
+class Metrics:
+    """
+    Инструментирование хендлеров.
+
+    install(bot) оборачивает все зарегистрированные хендлеры: на время вызова в потоке открыт _Call,
+    в который наблюдатель db (ObservedSqliteDatabase.observers) пишет число и время SQL-запросов,
+    а хук apihelper._make_request — вызовы Bot API. По завершении всё складывается в метрики хендлера
+    «модуль.функция».
+    Вне хендлеров хуки только проверяют thread-local и ничего не считают.
+    """
+
+    def __init__(self, window: float = 300.0, slow_handler_ms: float = 1000.0):
+        self.window = window
+        self.slow_handler = slow_handler_ms / 1000 if slow_handler_ms > 0 else float("inf")
+        self._lock = threading.Lock()
+        self._handlers: dict[str, HandlerMetrics] = {}
+        self._local = threading.local()
+        self._active: dict[int, str] = {}       # поток -> выполняемый хендлер (для профилировщика)
+        self._sources: dict[str, callable] = {}
+        self._hooked = False
+
+    # ---------- подключение ----------
+    def install(self, bot: TeleBot) -> None:
+        """Вызывать после регистрации всех хендлеров."""
+        self._install_hooks()
+        for attr in _HANDLER_LISTS:
+            for handler in getattr(bot, attr, ()):
+                func = handler["function"]
+                if not getattr(func, "__instrumented__", False):
+                    handler["function"] = self.instrument(func)
+
+    def _install_hooks(self) -> None:
+        if self._hooked:
+            return
+        self._hooked = True
+        local = self._local
+        make_request = apihelper._make_request
+
+        # время SQL меряет сама база (ObservedSqliteDatabase) — один раз для всех наблюдателей
+        def observe_sql(sql, params, seconds):
+            call = getattr(local, "call", None)
+            if call is not None:
+                call.db_queries += 1
+                call.db_time += seconds
+
+        def timed_make_request(*args, **kwargs):
+            call = getattr(local, "call", None)
+            if call is None:
+                return make_request(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return make_request(*args, **kwargs)
+            finally:
+                call.api_calls += 1
+                call.api_time += time.perf_counter() - started
+
+        db.observers.append(observe_sql)
+        apihelper._make_request = timed_make_request
+
+    def instrument(self, func):
+        name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        # всё, что нужно на каждом вызове, — в локальных переменных замыкания, без поиска атрибутов
+        local, active, record = self._local, self._active, self._record
+        get_ident, perf_counter = threading.get_ident, time.perf_counter
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = getattr(local, "call", None)    # хендлер, вызванный из другого хендлера, считаем отдельно
+            call = local.call = _Call(name, args[0] if args else None)
+            ident = get_ident()
+            active[ident] = name
+            error = None
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                record(call, perf_counter() - started, error)
+                local.call = outer
+                if outer is None:
+                    active.pop(ident, None)
+                else:
+                    active[ident] = outer.name
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    def _record(self, call: _Call, wall: float, error: Exception | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            m = self._handlers.get(call.name)
+            if m is None:
+                m = self._handlers[call.name] = HandlerMetrics(self.window)
+            m.calls += 1
+            m.wall += wall
+            m.db_queries += call.db_queries
+            m.db_time += call.db_time
+            m.api_calls += call.api_calls
+            m.api_time += call.api_time
+            if error is not None:
+                m.errors += 1
+                m.last_error = f"{type(error).__name__}: {error}"[:200]
+            m.wall_hist.record(wall, now)
+            m.db_hist.record(call.db_time, now)
+            m.api_hist.record(call.api_time, now)
+        if wall >= self.slow_handler:
+            logger.bind(latency_ms=round(wall * 1000, 1), db_queries=call.db_queries, api_calls=call.api_calls) \
+                .warning(f"Slow handler {call.name}: {wall * 1000:.0f} ms "
+                         f"(sql {call.db_queries} / {call.db_time * 1000:.0f} ms, "
+                         f"api {call.api_calls} / {call.api_time * 1000:.0f} ms)")
+
+    # ---------- чтение ----------
+    def active_handlers(self) -> dict[int, str]:
+        """Какой хендлер сейчас выполняет каждый поток."""
+        return dict(self._active)
+
+    def current_handler(self) -> str | None:
+        """Хендлер, который выполняется в текущем потоке."""
+        call = getattr(self._local, "call", None)
+        return call.name if call is not None else None
+
+    def current_call(self) -> _Call | None:
+        return getattr(self._local, "call", None)
+
+    def add_source(self, name: str, snapshot) -> None:
+        """Дополнительная статистика для /perf (например, scheduler.snapshot)."""
+        self._sources[name] = snapshot
+
+    def sources(self) -> dict[str, dict]:
+        result = {}
+        for name, snapshot in self._sources.items():
+            try:
+                result[name] = snapshot()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
+
+    def snapshot(self) -> dict[str, dict]:
+        """Метрики хендлеров: перцентили за окно, остальное — с момента запуска."""
+        now = time.monotonic()
+        with self._lock:
+            items = [(name, m, m.wall_hist.merged(now), m.db_hist.merged(now), m.api_hist.merged(now))
+                     for name, m in self._handlers.items()]
+        result = {}
+        for name, m, wall, db_hist, api_hist in items:
+            window_calls, (p50, p95, p99) = _percentiles(wall, 50, 95, 99)
+            _, (db_p95,) = _percentiles(db_hist, 95)
+            _, (api_p95,) = _percentiles(api_hist, 95)
+            result[name] = {
+                "calls": m.calls, "errors": m.errors, "last_error": m.last_error,
+                "window_calls": window_calls, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+                "db_p95_ms": db_p95, "api_p95_ms": api_p95,
+                "wall_seconds": m.wall,
+                "db_queries": m.db_queries, "db_seconds": m.db_time,
+                "api_calls": m.api_calls, "api_seconds": m.api_time,
+            }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат Prometheus: перцентили за окно как summary, остальное — счётчики."""
+        lines = []
+        snapshot = self.snapshot()
+        metrics = (
+            ("bot_handler_calls_total", "counter", "calls"),
+            ("bot_handler_errors_total", "counter", "errors"),
+            ("bot_handler_db_queries_total", "counter", "db_queries"),
+            ("bot_handler_db_seconds_total", "counter", "db_seconds"),
+            ("bot_handler_api_calls_total", "counter", "api_calls"),
+            ("bot_handler_api_seconds_total", "counter", "api_seconds"),
+        )
+        for metric, kind, key in metrics:
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f'{metric}{{handler="{name}"}} {s[key]}' for name, s in snapshot.items())
+        lines.append("# TYPE bot_handler_seconds summary")
+        for name, s in snapshot.items():
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'bot_handler_seconds{{handler="{name}",quantile="{q}"}} {s[key] / 1000}')
+            lines.append(f'bot_handler_seconds_sum{{handler="{name}"}} {s["wall_seconds"]}')
+            lines.append(f'bot_handler_seconds_count{{handler="{name}"}} {s["calls"]}')
+        for source, values in self.sources().items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"bot_{source}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(window=settings.METRICS_WINDOW_SECONDS, slow_handler_ms=settings.LOG_SLOW_HANDLER_MS)
+
+
+class MetricsServer:
+    """Локальный HTTP-эндпоинт /metrics для Prometheus."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def install_instrumentation(bot: TeleBot) -> None:
+    """Оборачивает хендлеры бота (METRICS_ENABLED=0 — выключено)."""
+    if settings.METRICS_ENABLED:
+        metrics.install(bot)
+
+
+def start_metrics_server() -> MetricsServer | None:
+    """Поднимает /metrics, если задан METRICS_PORT."""
+    if not settings.METRICS_PORT:
+        return None
+    server = MetricsServer(settings.METRICS_HOST, settings.METRICS_PORT).start()
+    logger.info(f"Prometheus metrics on http://{settings.METRICS_HOST}:{server.port}/metrics")
+    return server
@@ -0,0 +1,214 @@
+# services/notifications.py
+import threading
+
+from loguru import logger
+from telebot import TeleBot
+
+from app.config.settings import settings
+from app.database.models import OrderStatus, User
+from app.services import events
+from app.services.events import Event, EventBus, bus
+from app.utils.formatters import format_order_numbers
+
+
+def _user_name(user) -> str:
+    if not user:
+        return "—"
+    return f"{user.first_name or ''} {user.last_name or ''}".strip() or "—"
+
+
+def _tg_id(user) -> int | None:
+    return getattr(user, "tg_id", None) if user else None
+
+
+class NotificationSubscriber:
+    """
+    Подписчик шины, который рассылает уведомления участникам заявки.
+
+    Текстовые уведомления копятся по ключу (получатель, заявка) в течение debounce-окна
+    и уходят одним сообщением: водитель, прокликавший LOADING → ENROUTE → DELIVERED за пару секунд,
+    порождает одно уведомление диспетчеру вместо трёх.
+    Файлы (фото/документы) объединить нельзя — они пересылаются сразу.
+    """
+
+    def __init__(self, bot: TeleBot, window: float = 3.0):
+        self.bot = bot
+        self.window = window
+        self._pending: dict[tuple[int, int], list[str]] = {}
+        self._timers: dict[tuple[int, int], threading.Timer] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, event_bus: EventBus) -> None:
+        for name in (events.ORDER_CREATED, events.ORDER_UPDATED, events.ORDER_STATUS_CHANGED,
+                     events.ORDER_ACCEPTED, events.ORDER_DRIVER_ASSIGNED, events.ORDER_COMMENT_ADDED,
+                     events.ATTACHMENT_ADDED, events.ORDERS_IMPORTED, events.ORDERS_STATUS_CHANGED):
+            event_bus.subscribe(name, self)
+
+    # ---------- приём событий ----------
+    def __call__(self, event: Event) -> None:
+        if event.name == events.ORDERS_IMPORTED:
+            self._notify_imported(event)
+            return
+        if event.name == events.ORDERS_STATUS_CHANGED:
+            self._notify_bulk_status(event)
+            return
+
+        order = event.order
+        if order is None:
+            return
+
+        if event.name == events.ATTACHMENT_ADDED:
+            for tg_id in self._counterparts(event):
+                self._send_file(tg_id, event)
+            return
+
+        for tg_id, line in self._render(event):
+            self._enqueue(tg_id, order.id, line)
+
+    def _notify_imported(self, event: Event) -> None:
+        """Импорт файла: каждому назначенному водителю одно сообщение на все его новые заявки."""
+        by_driver: dict[int, list[int]] = {}
+        for order in event.payload["orders"]:
+            if order.driver_id:
+                by_driver.setdefault(order.driver_id, []).append(order.id)
+        if not by_driver:
+            return
+        actor_tg = _tg_id(event.actor)
+        for driver in User.select().where(User.id.in_(list(by_driver))):
+            ids = by_driver[driver.id]
+            if not driver.tg_id or driver.tg_id == actor_tg:
+                continue
+            self._send_text(driver.tg_id, 0,
+                            [f"🆕 Вам назначено новых заявок: {len(ids)} ({format_order_numbers(ids)})"])
+
+    def _notify_bulk_status(self, event: Event) -> None:
+        """Массовая смена статуса: каждому участнику (диспетчеру, водителю) одна сводка по всем его заявкам."""
+        by_user: dict[int, list[int]] = {}
+        for order in event.payload["orders"]:
+            for user_id in {order.dispatcher_id, order.driver_id}:
+                if user_id:
+                    by_user.setdefault(user_id, []).append(order.id)
+        if not by_user:
+            return
+        actor_tg = _tg_id(event.actor)
+        label = OrderStatus(event.payload["status"]).label
+        reason = event.payload.get("reason")
+        for user in User.select().where(User.id.in_(list(by_user))):
+            if not user.tg_id or user.tg_id == actor_tg:
+                continue
+            ids = sorted(by_user[user.id])
+            text = (f"🚦 Статус изменён на «{label}» — заявок: {len(ids)} ({format_order_numbers(ids)})\n"
+                    f"👤 {_user_name(event.actor)}")
+            if reason:
+                text += f"\n🚫 Причина: {reason}"
+            self._send_text(user.tg_id, 0, [text])
+
+    def _counterparts(self, event: Event) -> list[int]:
+        """Участники заявки (диспетчер и водитель), кроме инициатора события."""
+        order = event.order
+        actor_tg = _tg_id(event.actor)
+        result = []
+        for user in (order.dispatcher, order.driver):
+            tg_id = _tg_id(user)
+            if tg_id and tg_id != actor_tg and tg_id not in result:
+                result.append(tg_id)
+        return result
+
+    def _render(self, event: Event) -> list[tuple[int, str]]:
+        """Возвращает пары (получатель, строка уведомления) для события."""
+        order = event.order
+        p = event.payload
+        name = event.name
+
+        if name == events.ORDER_CREATED:
+            driver_tg = _tg_id(order.driver)
+            if not driver_tg:
+                return []
+            return [(driver_tg, f"🆕 Вам назначена новая заявка #{order.id}: {order.from_addr} → {order.to_addr}")]
+
+        if name == events.ORDER_DRIVER_ASSIGNED:
+            result = []
+            driver_tg = _tg_id(order.driver)
+            if driver_tg and driver_tg != _tg_id(event.actor):
+                result.append((driver_tg, f"👨‍💼 Вам назначена заявка #{order.id}: {order.from_addr} → {order.to_addr}"))
+            prev_tg = p.get("prev_driver_tg_id")
+            if prev_tg and prev_tg != driver_tg:
+                result.append((prev_tg, f"↩️ Заявка #{order.id} снята с вас."))
+            return result
+
+        if name == events.ORDER_ACCEPTED:
+            text = f"🚚 Водитель {event.actor.first_name or ''} принял заявку #{order.id}"
+        elif name == events.ORDER_STATUS_CHANGED:
+            label = OrderStatus(p["status"]).label
+            text = f"🚦 В заявке #{order.id} статус изменён на: {label}"
+            if p.get("reason"):
+                text += f"\n🚫 Причина: {p['reason']}"
+        elif name == events.ORDER_COMMENT_ADDED:
+            text = f"💬 Комментарий по заявке #{order.id} от {_user_name(event.actor)}:\n\n{p.get('text', '')}"
+        elif name == events.ORDER_UPDATED:
+            text = f"✏️ Заявка #{order.id}: {p.get('note', 'изменены данные')}"
+        else:
+            return []
+
+        return [(tg_id, text) for tg_id in self._counterparts(event)]
+
+    # ---------- debounce ----------
+    def _enqueue(self, tg_id: int, order_id: int, line: str) -> None:
+        if self.window <= 0:
+            self._send_text(tg_id, order_id, [line])
+            return
+
+        key = (tg_id, order_id)
+        with self._lock:
+            self._pending.setdefault(key, []).append(line)
+            if key in self._timers:
+                return
+            timer = threading.Timer(self.window, self._flush, args=(key,))
+            timer.daemon = True
+            self._timers[key] = timer
+        timer.start()
+
+    def _flush(self, key: tuple[int, int]) -> None:
+        with self._lock:
+            lines = self._pending.pop(key, [])
+            self._timers.pop(key, None)
+        if lines:
+            self._send_text(key[0], key[1], lines)
+
+    def flush_all(self) -> None:
+        """Немедленно отправить всё накопленное (при остановке бота)."""
+        with self._lock:
+            keys = list(self._pending)
+            for timer in self._timers.values():
+                timer.cancel()
+        for key in keys:
+            self._flush(key)
+
+    # ---------- отправка ----------
+    def _send_text(self, tg_id: int, order_id: int, lines: list[str]) -> None:
+        if len(lines) == 1:
+            text = lines[0]
+        else:
+            text = f"🔔 Обновления по заявке #{order_id}:\n\n" + "\n\n".join(f"• {line}" for line in lines)
+        try:
+            self.bot.send_message(tg_id, text)
+        except Exception:
+            logger.exception(f"Failed to notify {tg_id} about order #{order_id}")
+
+    def _send_file(self, tg_id: int, event: Event) -> None:
+        p = event.payload
+        caption = f"Файл от {_user_name(event.actor)} по заявке #{event.order.id}\n{p.get('caption') or ''}"
+        try:
+            if p.get("file_type") == "image":
+                self.bot.send_photo(tg_id, p["file_id"], caption=caption)
+            else:
+                self.bot.send_document(tg_id, p["file_id"], caption=caption)
+        except Exception:
+            logger.exception(f"Failed to forward attachment of order #{event.order.id} to {tg_id}")
+
+
+def register_notification_subscribers(bot: TeleBot) -> NotificationSubscriber:
+    """Подключает рассылку уведомлений к общей шине событий."""
+    subscriber = NotificationSubscriber(bot, window=settings.NOTIFY_DEBOUNCE_SECONDS)
+    subscriber.attach(bus)
+    return subscriber
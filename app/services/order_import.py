@@ -0,0 +1,273 @@
+# services/order_import.py
+import csv
+import io
+import os
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+
+from app.database.models import Order, OrderPrefix, OrderStatus, User, UserRole, db, to_day_bucket
+from app.utils.validators import parse_weight_volume, validate_address, validate_datetime
+
+# колонки экспорта (handlers/attachments.py) — файл выгрузки можно поправить и загрузить обратно
+ORDER_COLUMNS = ("ID", "Префикс", "Статус", "Дата", "Откуда", "Куда", "Диспетчер", "Водитель",
+                 "Тип груза", "Вес/объём", "Комментарий")
+ERROR_COLUMN = "Ошибка"
+REQUIRED_COLUMNS = ("Откуда", "Куда")
+DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+
+_PREFIXES = {p.label.lower(): p for p in OrderPrefix} | {"с_ндс": OrderPrefix.WITH_VAT,
+                                                        "без_ндс": OrderPrefix.WITHOUT_VAT}
+
+
+class OrderImportError(ValueError):
+    """Файл целиком не подходит для импорта (формат, заголовок, размер); текст — для пользователя."""
+
+
+class ImportResult:
+    """
+    Итог импорта: orders — созданные заявки (с id), rejected — отклонённые строки файла с текстом ошибки,
+    header — заголовок файла (для файла с ошибками).
+    """
+    __slots__ = ("orders", "rejected", "header")
+
+    def __init__(self, orders: list[Order], rejected: list[tuple[list, str]], header: list[str]):
+        self.orders = orders
+        self.rejected = rejected
+        self.header = header
+
+
+# ---------- чтение файла ----------
+def read_table(content: bytes, filename: str) -> tuple[list[str], list[list]]:
+    """XLSX или CSV (разделитель ; , или табуляция; UTF-8 или cp1251) -> (заголовок, строки). Пустые строки пропускаются."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        try:
+            workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        except Exception:
+            raise OrderImportError("Не удалось открыть XLSX-файл.")
+        try:
+            rows = [list(row) for row in workbook.active.iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+    elif ext in (".csv", ".txt"):
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = content.decode("cp1251", errors="replace")
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = [list(row) for row in csv.reader(io.StringIO(text), dialect)]
+    else:
+        raise OrderImportError("Поддерживаются файлы .xlsx и .csv.")
+
+    rows = [row for row in rows if any(cell not in (None, "") for cell in row)]
+    if not rows:
+        raise OrderImportError("Файл пустой.")
+    header = [str(cell or "").strip() for cell in rows[0]]
+    return header, rows[1:]
+
+
+# ---------- проверка по колонкам ----------
+def _column(header: list[str], rows: list[list], name: str) -> list:
+    """Значения колонки name (по заголовку, без учёта регистра); нет колонки — None для всех строк."""
+    lowered = [h.lower() for h in header]
+    if name.lower() not in lowered:
+        return [None] * len(rows)
+    index = lowered.index(name.lower())
+    return [row[index] if index < len(row) else None for row in rows]
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _memo(check):
+    """Проверка значения с кэшем: в файле на сотни строк адреса, водители и «20 т» повторяются."""
+    cache = {}
+
+    def wrapper(value):
+        key = (type(value), value)
+        if key not in cache:
+            cache[key] = check(value)
+        return cache[key]
+    return wrapper
+
+
+def _parse_prefix(value):
+    text = _text(value).lower()
+    if not text:
+        return int(OrderPrefix.WITH_VAT), ""
+    prefix = _PREFIXES.get(text)
+    return (int(prefix), "") if prefix else (None, f"неизвестный префикс «{_text(value)}»")
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        return value, ""
+    text = _text(value)
+    if not text:
+        return None, ""
+    if validate_datetime(text, DATETIME_FORMAT):
+        return datetime.strptime(text, DATETIME_FORMAT), ""
+    if validate_datetime(text, "%d.%m.%Y"):
+        return datetime.strptime(text, "%d.%m.%Y"), ""
+    return None, f"дата «{text}» не в формате ДД.ММ.ГГГГ ЧЧ:ММ"
+
+
+def _parse_address(value):
+    text = _text(value)
+    ok, error = validate_address(text)
+    return (text, "") if ok else (None, error.lower())
+
+
+def _driver_lookup():
+    """Водитель по id, «Имя Фамилия» или имени (как в экспорте); неоднозначное имя — ошибка."""
+    by_id, by_name = {}, {}
+    for user_id, first, last in (User.select(User.id, User.first_name, User.last_name)
+                                 .where((User.role == int(UserRole.DRIVER)) & (User.is_active == True))
+                                 .tuples()):
+        by_id[str(user_id)] = user_id
+        for name in {(first or "").strip().lower(), f"{first or ''} {last or ''}".strip().lower()}:
+            if name:
+                by_name.setdefault(name, set()).add(user_id)
+
+    def lookup(value):
+        text = _text(value)
+        if not text:
+            return None, ""
+        if text in by_id:
+            return by_id[text], ""
+        ids = by_name.get(" ".join(text.lower().split()), set())
+        if len(ids) == 1:
+            return next(iter(ids)), ""
+        if ids:
+            return None, f"несколько водителей «{text}» — укажите фамилию или ID"
+        return None, f"водитель «{text}» не найден"
+    return lookup
+
+
+def _parse_weight_volume(value):
+    text = _text(value)
+    weight_kg, volume_m3, error = parse_weight_volume(text)
+    return (text or None, weight_kg, volume_m3), error.lower()
+
+
+def validate_rows(header: list[str], rows: list[list], dispatcher: User) -> tuple[list[dict], list[tuple[list, str]]]:
+    """
+    Проверяет строки по колонкам (одна колонка — один проход с кэшем проверок повторяющихся значений)
+    и собирает поля для Order.insert_many. Возвращает (готовые строки, [(исходная строка, ошибки)]).
+    """
+    missing = [name for name in REQUIRED_COLUMNS if name.lower() not in (h.lower() for h in header)]
+    if missing:
+        raise OrderImportError(f"В заголовке нет колонок: {', '.join(missing)}. "
+                               f"Ожидаются: {', '.join(ORDER_COLUMNS)}.")
+
+    # ID, «Статус» и «Диспетчер» из файла не используются: заявки создаются новыми от имени загрузившего
+    now = datetime.now()
+    prefixes = list(map(_memo(_parse_prefix), _column(header, rows, "Префикс")))
+    dates = list(map(_memo(_parse_datetime), _column(header, rows, "Дата")))
+    from_addrs = list(map(_memo(_parse_address), _column(header, rows, "Откуда")))
+    to_addrs = list(map(_memo(_parse_address), _column(header, rows, "Куда")))
+    drivers = list(map(_memo(_driver_lookup()), _column(header, rows, "Водитель")))
+    weights = list(map(_memo(_parse_weight_volume), _column(header, rows, "Вес/объём")))
+    cargo = [_text(v) or None for v in _column(header, rows, "Тип груза")]
+    comments = [_text(v) or None for v in _column(header, rows, "Комментарий")]
+
+    valid, rejected = [], []
+    for i, row in enumerate(rows):
+        checks = (prefixes[i], dates[i], from_addrs[i], to_addrs[i], drivers[i], weights[i])
+        errors = [error for _, error in checks if error]
+        if errors:
+            rejected.append((row, "; ".join(errors)))
+            continue
+        when = dates[i][0] or now
+        weight_volume, weight_kg, volume_m3 = weights[i][0]
+        valid.append({
+            "dispatcher": dispatcher.id, "driver": drivers[i][0], "prefix": prefixes[i][0],
+            "from_addr": from_addrs[i][0], "to_addr": to_addrs[i][0],
+            "datetime": when, "day_bucket": to_day_bucket(when),
+            "cargo_type": cargo[i], "weight_volume": weight_volume, "weight_kg": weight_kg, "volume_m3": volume_m3,
+            "comment": comments[i], "status": int(OrderStatus.NEW), "created_at": now, "updated_at": now,
+        })
+    return valid, rejected
+
+
+# ---------- запись ----------
+def insert_orders(rows: list[dict], chunk: int = 500) -> list[Order]:
+    """
+    INSERT пачками по chunk строк, каждая пачка — своя транзакция (блокировка записи не держится на весь файл).
+
+    Значения приводятся к виду БД (db_value) один раз и уходят через executemany одного подготовленного
+    INSERT: сборка многострочного insert_many в peewee на 10 тыс. строк занимала больше времени, чем сама запись.
+    id новых заявок — всё, что больше MAX(id) до вставки (транзакция IMMEDIATE, других писателей нет);
+    заявки собираются из тех же строк, без повторного чтения.
+    """
+    if not rows:
+        return []
+    defaults = {f.name: f.default for f in Order._meta.sorted_fields
+                if f.default is not None and not callable(f.default) and f.name not in rows[0]}
+    fields = [Order._meta.fields[name] for name in list(rows[0]) + list(defaults)]
+    table = Order._meta.table_name
+    columns = ", ".join(f'"{field.column_name}"' for field in fields)
+    sql = f'INSERT INTO "{table}" ({columns}) VALUES ({", ".join("?" * len(fields))})'
+    orders = []
+    for i in range(0, len(rows), chunk):
+        part = [{**row, **defaults} for row in rows[i:i + chunk]]
+        values = [[field.db_value(row[field.name]) for field in fields] for row in part]
+        with db.atomic("IMMEDIATE"):
+            last_id = db.execute_sql(f'SELECT MAX("id") FROM "{table}"').fetchone()[0] or 0
+            db.cursor().executemany(sql, values)
+            ids = [row[0] for row in db.execute_sql(f'SELECT "id" FROM "{table}" WHERE "id" > ? ORDER BY "id"',
+                                                    (last_id,))]
+        orders.extend(Order(id=order_id, **row) for order_id, row in zip(ids, part))
+    return orders
+
+
+def import_orders(content: bytes, filename: str, dispatcher: User, max_rows: int = 10000,
+                  chunk: int = 500) -> ImportResult:
+    """Разбор, проверка и запись файла; строки с ошибками не записываются и возвращаются в rejected."""
+    header, rows = read_table(content, filename)
+    if len(rows) > max_rows:
+        raise OrderImportError(f"Слишком много строк: {len(rows)} (максимум {max_rows}).")
+    valid, rejected = validate_rows(header, rows, dispatcher)
+    return ImportResult(insert_orders(valid, chunk), rejected, header)
+
+
+# ---------- файлы для пользователя ----------
+def rejected_file(result: ImportResult, filename: str) -> tuple[bytes, str]:
+    """Отклонённые строки в формате исходного файла с колонкой «Ошибка» — исправить и загрузить снова."""
+    header = result.header + [ERROR_COLUMN]
+    rows = [list(row) + [""] * (len(result.header) - len(row)) + [error] for row, error in result.rejected]
+    base = os.path.splitext(os.path.basename(filename or "orders"))[0]
+    if filename.lower().endswith(".csv"):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(header)
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8-sig"), f"{base}_errors.csv"
+    return _xlsx(header, rows), f"{base}_errors.xlsx"
+
+
+def template_file() -> bytes:
+    """Пустой шаблон с колонками экспорта и одной строкой-примером."""
+    return _xlsx(list(ORDER_COLUMNS), [["", OrderPrefix.WITH_VAT.label, "", datetime.now().strftime(DATETIME_FORMAT),
+                                        "Москва, ул. Складская, 1", "Тверь, ул. Заводская, 5", "", "",
+                                        "паллеты", "5 т / 30 м3", ""]])
+
+
+def _xlsx(header: list, rows: list[list]) -> bytes:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("orders")
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,134 @@
+# services/profiler.py
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from loguru import logger
+
+from app.config.settings import settings
+from app.services.metrics import metrics
+
+_THREAD_NUMBER = re.compile(r"[-_ ]?\d+$")
+# поток без хендлера, у которого верх стека в этих модулях, ждёт (пулы, long polling, HTTP-сервер) —
+# в профиль не пишем; у потоков внутри хендлера ожидание сети/блокировок — полезная информация
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "socket.py", "ssl.py", "socketserver.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def _thread_group(name: str) -> str:
+    """chat-worker-3 → chat-worker: одинаковые потоки пула складываются в одну ветку."""
+    return _THREAD_NUMBER.sub("", name) or name
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик по всем потокам процесса (пул TeleBot, планировщик чатов, вебхук).
+
+    Пока сессия идёт, фоновый поток каждые interval секунд снимает sys._current_frames()
+    и копит стеки в collapsed-формате (Brendan Gregg): «поток;handler:имя;модуль:функция;… N» —
+    файл открывается в flamegraph.pl, speedscope или inferno. Имя хендлера берётся из инструментирования
+    (services/metrics.py). Вне сессии потока нет — стоимость нулевая.
+    """
+
+    def __init__(self, interval: float = 0.01, max_seconds: float = 300):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stacks: Counter = Counter()
+        self._handlers: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, on_done=None) -> bool:
+        """Запускает сессию на seconds секунд; по окончании вызывает on_done(profiler). False — уже идёт."""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._stacks = Counter()
+            self._handlers = Counter()
+            self.samples = 0
+            self.started_at = time.monotonic()
+            seconds = min(seconds, self.max_seconds)
+            self._thread = threading.Thread(target=self._run, args=(seconds, on_done), name="sampling-profiler",
+                                            daemon=True)
+            self._thread.start()
+        logger.info(f"Profiler started for {seconds:.0f}s (interval {self.interval * 1000:.0f} ms)")
+        return True
+
+    def stop(self) -> None:
+        """Досрочная остановка — on_done всё равно вызывается."""
+        self._stop.set()
+
+    def _run(self, seconds: float, on_done) -> None:
+        me = threading.get_ident()
+        deadline = self.started_at + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            self._sample(me)
+            self._stop.wait(self.interval)
+        self.duration = time.monotonic() - self.started_at
+        logger.info(f"Profiler stopped: {self.samples} samples in {self.duration:.1f}s")
+        if on_done is not None:
+            try:
+                on_done(self)
+            except Exception:
+                logger.exception("Profiler callback failed")
+
+    def _sample(self, me: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        active = metrics.active_handlers()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            handler = active.get(ident)
+            if handler is None and self._is_idle(frame):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            prefix = [_thread_group(names.get(ident, str(ident)))]
+            if handler is not None:
+                prefix.append(f"handler:{handler}")
+                self._handlers[handler] += 1
+            self._stacks[";".join(prefix + stack)] += 1
+        self.samples += 1
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        return frame.f_code.co_filename.endswith(_IDLE_FILES)
+
+    # ---------- результат ----------
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def summary(self, top: int = 5) -> str:
+        leaves = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        lines = [f"🔥 Профиль: {self.samples} снимков за {self.duration:.1f} с, "
+                 f"шаг {self.interval * 1000:.0f} мс"]
+        if self._handlers:
+            lines.append("Хендлеры: " + ", ".join(f"{name} ×{n}" for name, n in self._handlers.most_common(top)))
+        if leaves:
+            lines.append("Верх стека: " + ", ".join(f"{name} ×{n}" for name, n in leaves.most_common(top)))
+        return "\n".join(lines)[:1000]
+
+
+profiler = SamplingProfiler(interval=settings.PROFILER_INTERVAL_MS / 1000, max_seconds=settings.PROFILER_MAX_SECONDS)
@@ -0,0 +1,177 @@
+# services/rollup.py
+from collections import defaultdict
+from datetime import datetime
+
+from loguru import logger
+from peewee import EXCLUDED, fn
+
+from app.database.models import (
+    Order, OrderArchive, OrderDailyStat, OrderStatus, OrderStatusHistory, OrderStatusHistoryArchive, db,
+)
+from app.services import events
+from app.services.events import Event, EventBus, bus
+
+COUNTERS = ("created", "transitions", "delivered", "on_time", "cancelled", "lead_seconds")
+
+
+def _dimensions(dispatcher_id, driver_id, prefix) -> list[tuple[str, int]]:
+    dims = [("all", 0), ("dispatcher", dispatcher_id), ("prefix", int(prefix))]
+    if driver_id:
+        dims.append(("driver", driver_id))
+    return dims
+
+
+def _status_counters(status: int, at: datetime, created_at: datetime | None, day_bucket: int | None) -> dict:
+    """Счётчики одной смены статуса: доставка — ещё «вовремя» и время от создания заявки."""
+    counters = {"transitions": 1}
+    if status == int(OrderStatus.DELIVERED):
+        counters["delivered"] = 1
+        counters["on_time"] = int(day_bucket is not None and at.toordinal() <= day_bucket)
+        if created_at is not None:
+            counters["lead_seconds"] = max(0, int((at - created_at).total_seconds()))
+    elif status == int(OrderStatus.CANCELLED):
+        counters["cancelled"] = 1
+    return counters
+
+
+class RollupBuffer:
+    """Накопитель строк OrderDailyStat: (dimension, key, day) -> счётчики; flush() прибавляет их к таблице."""
+
+    def __init__(self):
+        self.rows: dict[tuple[str, int, int], dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def add(self, day: int, dims: list[tuple[str, int]], counters: dict) -> None:
+        for dimension, key in dims:
+            row = self.rows[(dimension, key, day)]
+            for name, value in counters.items():
+                row[name] += value
+
+    def add_created(self, created_at: datetime, dispatcher_id, prefix) -> None:
+        # водитель к созданию не относится (и часто назначается позже) — создание считается без его разреза
+        self.add(created_at.toordinal(), _dimensions(dispatcher_id, None, prefix), {"created": 1})
+
+    def add_status(self, status: int, at: datetime, created_at, day_bucket, dispatcher_id, driver_id, prefix) -> None:
+        dims = _dimensions(dispatcher_id, driver_id, prefix) + [("status", int(status))]
+        self.add(at.toordinal(), dims, _status_counters(int(status), at, created_at, day_bucket))
+
+    def flush(self, chunk: int = 200) -> int:
+        """UPSERT с прибавлением (col = col + excluded.col): параллельные процессы не затирают счётчики друг друга."""
+        rows = [{"dimension": dimension, "key": key, "day": day, **counters}
+                for (dimension, key, day), counters in self.rows.items()]
+        update = {getattr(OrderDailyStat, name): getattr(OrderDailyStat, name) + getattr(EXCLUDED, name)
+                  for name in COUNTERS}
+        with db.atomic():
+            for i in range(0, len(rows), chunk):
+                (OrderDailyStat.insert_many(rows[i:i + chunk])
+                 .on_conflict(conflict_target=[OrderDailyStat.dimension, OrderDailyStat.key, OrderDailyStat.day],
+                              update=update)
+                 .execute())
+        self.rows.clear()
+        return len(rows)
+
+
+class RollupSubscriber:
+    """
+    Подписчик шины: создание заявки и каждая смена статуса прибавляются к дневным сводкам OrderDailyStat
+    в потоке хендлера — несколько UPSERT по первичному ключу на событие.
+    """
+
+    def attach(self, event_bus: EventBus) -> None:
+        for name in (events.ORDER_CREATED, events.ORDER_STATUS_CHANGED, events.ORDER_ACCEPTED,
+                     events.ORDERS_IMPORTED, events.ORDERS_STATUS_CHANGED):
+            event_bus.subscribe(name, self)
+
+    def __call__(self, event: Event) -> None:
+        buffer = RollupBuffer()
+        if event.name == events.ORDERS_IMPORTED:
+            # тысячи заявок из файла (или массовая смена статуса ниже) — одна запись сводок на всё событие
+            for order in event.payload["orders"]:
+                buffer.add_created(event.ts, order.dispatcher_id, order.prefix)
+            buffer.flush()
+            return
+        if event.name == events.ORDERS_STATUS_CHANGED:
+            for order in event.payload["orders"]:
+                buffer.add_status(event.payload["status"], event.ts, order.created_at, order.day_bucket,
+                                  order.dispatcher_id, order.driver_id, order.prefix)
+            buffer.flush()
+            return
+        order = event.order
+        if order is None:
+            return
+        if event.name == events.ORDER_CREATED:
+            buffer.add_created(event.ts, order.dispatcher_id, order.prefix)
+        else:
+            buffer.add_status(event.payload["status"], event.ts, order.created_at, order.day_bucket,
+                              order.dispatcher_id, order.driver_id, order.prefix)
+        buffer.flush()
+
+
+def backfill_rollup(force: bool = False) -> int:
+    """
+    Однократно строит сводки по уже существующим заявкам (горячим и архивным) и истории статусов.
+    Если сводки уже есть, ничего не делает (force=True — пересчитать заново).
+    Возвращает число записанных строк сводки.
+    """
+    with db.atomic():
+        if OrderDailyStat.select().exists():
+            if not force:
+                return 0
+            OrderDailyStat.delete().execute()
+        buffer = RollupBuffer()
+        # по каждой паре таблиц отдельно: история горячих заявок ссылается только на orders, архивная — на архив
+        for orders, history in ((Order, OrderStatusHistory), (OrderArchive, OrderStatusHistoryArchive)):
+            for created_at, dispatcher_id, prefix in (
+                    orders.select(orders.created_at, orders.dispatcher, orders.prefix).tuples().iterator()):
+                buffer.add_created(created_at, dispatcher_id, prefix)
+            for status, at, *order in (
+                    history.select(history.status, history.created_at, orders.created_at, orders.day_bucket,
+                                   orders.dispatcher, orders.driver, orders.prefix)
+                    .join(orders, on=(history.order == orders.id))
+                    .tuples().iterator()):
+                if not isinstance(at, datetime):
+                    logger.warning(f"Status history entry with unrecognized time {at!r} skipped in rollup")
+                    continue
+                buffer.add_status(status, at, *order)
+        written = buffer.flush()
+    logger.info(f"Order rollup backfilled: {written} daily rows")
+    return written
+
+
+# ---------- чтение сводок ----------
+def daily(since: int, dimension: str = "all", key: int = 0) -> dict[int, dict]:
+    """Счётчики по дням начиная с since (date.toordinal()) для одного разреза: день -> {счётчик: значение}."""
+    fields = [getattr(OrderDailyStat, name) for name in COUNTERS]
+    query = (OrderDailyStat.select(OrderDailyStat.day, *fields)
+             .where((OrderDailyStat.dimension == dimension) & (OrderDailyStat.key == key) &
+                    (OrderDailyStat.day >= since))
+             .tuples())
+    return {day: dict(zip(COUNTERS, values)) for day, *values in query}
+
+
+def totals(days: dict[int, dict], first: int, last: int) -> dict:
+    """Сумма счётчиков за дни first..last включительно."""
+    result = dict.fromkeys(COUNTERS, 0)
+    for day in range(first, last + 1):
+        for name, value in days.get(day, {}).items():
+            result[name] += value
+    return result
+
+
+def top_keys(dimension: str, since: int, counter: str = "delivered", limit: int = 3) -> list[tuple[int, int]]:
+    """Лучшие ключи разреза (например водители) по сумме counter с дня since: [(key, сумма), ...]."""
+    total = fn.SUM(getattr(OrderDailyStat, counter))
+    return list(OrderDailyStat
+                .select(OrderDailyStat.key, total)
+                .where((OrderDailyStat.dimension == dimension) & (OrderDailyStat.day >= since))
+                .group_by(OrderDailyStat.key)
+                .having(total > 0)
+                .order_by(total.desc())
+                .limit(limit)
+                .tuples())
+
+
+def register_rollup_subscriber() -> RollupSubscriber:
+    """Подключает пополнение дневных сводок к общей шине событий."""
+    subscriber = RollupSubscriber()
+    subscriber.attach(bus)
+    return subscriber
@@ -0,0 +1,149 @@
+# services/roster.py
+import threading
+import time
+
+from app.config.settings import settings
+from app.database.models import User, UserRole
+from app.services import events
+from app.services.events import Event, EventBus, bus
+
+
+class RosterEntry:
+    """Активный пользователь в снимке: только то, что нужно спискам и проверкам ролей."""
+    __slots__ = ("id", "tg_id", "first_name", "last_name", "username", "role")
+
+    def __init__(self, id: int, tg_id: int, first_name: str | None, last_name: str | None,
+                 username: str | None, role: int):
+        self.id = id
+        self.tg_id = tg_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+        self.role = role
+
+    @property
+    def name(self) -> str:
+        return f"{self.first_name or ''} {self.last_name or ''}".strip()
+
+    def key(self) -> tuple:
+        return self.id, self.tg_id, self.first_name, self.last_name, self.username, self.role
+
+
+class _Snapshot:
+    __slots__ = ("version", "built_at", "by_id", "by_tg", "by_role")
+
+    def __init__(self, version: int, entries: list[RosterEntry]):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.by_id = {e.id: e for e in entries}
+        self.by_tg = {e.tg_id: e for e in entries}
+        by_role: dict[int, list[RosterEntry]] = {}
+        for e in entries:
+            by_role.setdefault(e.role, []).append(e)
+        self.by_role = {role: tuple(items) for role, items in by_role.items()}
+
+
+def _load() -> list[RosterEntry]:
+    return [RosterEntry(*row) for row in
+            User.select(User.id, User.tg_id, User.first_name, User.last_name, User.username, User.role)
+            .where(User.is_active == True)
+            .order_by(User.first_name, User.last_name, User.id)
+            .tuples()]
+
+
+class Roster:
+    """
+    Снимок активных пользователей (водители, диспетчеры, руководители) в памяти процесса.
+
+    Событие USER_CHANGED увеличивает счётчик версии и сразу пересобирает снимок одним запросом.
+    Снимок неизменяемый и заменяется целиком, поэтому чтение идёт без блокировки. Если за время пересборки
+    пришло новое событие, собранный снимок не ставится, и его соберёт первое чтение, увидевшее старую версию.
+    Изменения из других процессов (воркеры супервизора) подхватываются раз в refresh_seconds.
+    """
+
+    def __init__(self, refresh_seconds: float = 60):
+        self.refresh_seconds = refresh_seconds
+        self._version = 0
+        self._snapshot: _Snapshot | None = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def attach(self, event_bus: EventBus) -> None:
+        event_bus.subscribe(events.USER_CHANGED, self)
+
+    def __call__(self, event: Event) -> None:
+        self.invalidate()
+        self.refresh()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+
+    def refresh(self) -> _Snapshot:
+        """Пересобрать снимок из БД (и поставить, если пока собирали, версия не сменилась)."""
+        version = self._version
+        snapshot = _Snapshot(version, _load())
+        with self._lock:
+            if self._version == version:
+                self._snapshot = snapshot
+            self.rebuilds += 1
+        return snapshot
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if (snapshot is None or snapshot.version != self._version
+                or time.monotonic() - snapshot.built_at > self.refresh_seconds):
+            snapshot = self.refresh()
+        return snapshot
+
+    # ---------- чтение ----------
+    def get(self, user_id: int, role: UserRole | None = None) -> RosterEntry | None:
+        """Активный пользователь по id (и с ролью role, если задана)."""
+        entry = self._current().by_id.get(user_id)
+        return entry if entry and (role is None or entry.role == int(role)) else None
+
+    def by_tg(self, tg_id: int) -> RosterEntry | None:
+        return self._current().by_tg.get(tg_id)
+
+    def with_role(self, role: UserRole) -> tuple[RosterEntry, ...]:
+        """Активные пользователи роли, по имени и фамилии."""
+        return self._current().by_role.get(int(role), ())
+
+    def drivers(self) -> tuple[RosterEntry, ...]:
+        return self.with_role(UserRole.DRIVER)
+
+    def count(self, role: UserRole) -> int:
+        return len(self.with_role(role))
+
+    # ---------- сверка ----------
+    def diff(self) -> list[str]:
+        """
+        Расхождения текущего снимка с БД (пустой список — совпадают); для проверок и бенчмарка.
+        Снимок сравнивается как есть, без пересборки: изменение без USER_CHANGED здесь видно.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return ["снимок ещё не собран"]
+        cached = {e.id: e.key() for e in snapshot.by_id.values()}
+        actual = {e.id: e.key() for e in _load()}
+        problems = [f"лишний в снимке: {cached[i]}" for i in cached.keys() - actual.keys()]
+        problems += [f"нет в снимке: {actual[i]}" for i in actual.keys() - cached.keys()]
+        problems += [f"устарел: {cached[i]} ≠ {actual[i]}" for i in cached.keys() & actual.keys()
+                     if cached[i] != actual[i]]
+        if snapshot.version != self._version:
+            problems.append(f"снимок версии {snapshot.version}, текущая {self._version}")
+        return problems
+
+    def snapshot(self) -> dict:
+        current = self._snapshot
+        return {"users": len(current.by_id) if current else 0, "version": self._version,
+                "rebuilds": self.rebuilds}
+
+
+roster = Roster(refresh_seconds=settings.ROSTER_REFRESH_SECONDS)
+
+
+def register_roster() -> Roster:
+    """Подключает сброс снимка активных пользователей к общей шине событий."""
+    roster.attach(bus)
+    return roster
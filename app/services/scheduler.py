@@ -0,0 +1,178 @@
+# services/scheduler.py
+import threading
+import time
+from collections import deque
+
+from loguru import logger
+from telebot import TeleBot, types
+
+from app.config.settings import settings
+
+
+def chat_key(update: types.Update) -> int:
+    """Чат, к которому относится апдейт (для callback — чат сообщения с кнопкой)."""
+    message = update.message or update.edited_message
+    if message is not None:
+        return message.chat.id
+    call = update.callback_query
+    if call is not None:
+        if call.message is not None:
+            return call.message.chat.id
+        return call.from_user.id
+    for name in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query",
+                 "my_chat_member", "chat_member", "chat_join_request"):
+        obj = getattr(update, name, None)
+        if obj is not None:
+            chat = getattr(obj, "chat", None)
+            return chat.id if chat is not None else obj.from_user.id
+    return 0
+
+
+class _Shard:
+    """Очередь одного воркера: чаты по кругу (ready) и отложенные апдейты каждого чата (pending)."""
+    __slots__ = ("cond", "ready", "pending", "depth", "max_depth", "processed", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.ready: deque = deque()             # chat_id по кругу
+        self.pending: dict[int, deque] = {}     # chat_id -> deque[(monotonic ts, update)]
+        self.depth = 0
+        self.max_depth = 0
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class ChatScheduler:
+    """
+    Планировщик апдейтов с гарантией порядка внутри чата.
+
+    Апдейт попадает в шард hash(chat_id) % workers, у каждого шарда один поток — поэтому сообщения
+    одного чата обрабатываются строго по очереди (FSM-шаги и retrieve_data не перемешиваются),
+    а разные чаты идут параллельно. Внутри шарда чаты обслуживаются по кругу по одному апдейту,
+    так что болтливый пользователь не задерживает остальных; больше per_chat_cap апдейтов
+    одного чата в очереди не держим — лишние отбрасываются.
+    """
+
+    def __init__(self, workers: int = 4, per_chat_cap: int = 50):
+        self.workers = workers
+        self.per_chat_cap = per_chat_cap
+        self.dropped = 0
+        self._shards = [_Shard() for _ in range(workers)]
+        self._threads: list[threading.Thread] = []
+        self._process = None
+        self._stopping = False
+
+    # ---------- очередь ----------
+    def submit(self, update: types.Update) -> bool:
+        """Ставит апдейт в очередь его чата. False — очередь чата переполнена, апдейт отброшен."""
+        chat_id = chat_key(update)
+        shard = self._shards[hash(chat_id) % self.workers]
+        with shard.cond:
+            queue = shard.pending.get(chat_id)
+            if queue is None:
+                queue = shard.pending[chat_id] = deque()
+                shard.ready.append(chat_id)
+            elif len(queue) >= self.per_chat_cap:
+                self.dropped += 1
+                return False
+            queue.append((time.monotonic(), update))
+            shard.depth += 1
+            shard.max_depth = max(shard.max_depth, shard.depth)
+            shard.cond.notify()
+        return True
+
+    def _worker(self, shard: _Shard) -> None:
+        while True:
+            with shard.cond:
+                while not shard.ready and not self._stopping:
+                    shard.cond.wait()
+                if not shard.ready:
+                    return
+                chat_id = shard.ready.popleft()
+                queue = shard.pending[chat_id]
+                queued_at, update = queue.popleft()
+                if queue:
+                    shard.ready.append(chat_id)     # следующий апдейт этого чата — после остальных чатов
+                else:
+                    del shard.pending[chat_id]
+                shard.depth -= 1
+                waited = time.monotonic() - queued_at
+                shard.processed += 1
+                shard.wait_total += waited
+                shard.wait_max = max(shard.wait_max, waited)
+            try:
+                self._process([update])
+            except Exception:
+                logger.exception(f"Failed to process update {update.update_id}")
+
+    # ---------- метрики ----------
+    def snapshot(self) -> dict:
+        depth, max_depth, processed, wait_total, wait_max = [], 0, 0, 0.0, 0.0
+        for shard in self._shards:
+            with shard.cond:
+                depth.append(shard.depth)
+                max_depth = max(max_depth, shard.max_depth)
+                processed += shard.processed
+                wait_total += shard.wait_total
+                wait_max = max(wait_max, shard.wait_max)
+        return {
+            "workers": self.workers,
+            "depth": depth,
+            "max_depth": max_depth,
+            "processed": processed,
+            "dropped": self.dropped,
+            "wait_avg_ms": (wait_total / processed) * 1000 if processed else 0.0,
+            "wait_max_ms": wait_max * 1000,
+        }
+
+    # ---------- подключение ----------
+    def install(self, bot: TeleBot) -> None:
+        """
+        Встраивается в bot.process_new_updates: вызов только раскладывает апдейты по очередям,
+        хендлеры выполняются в потоках планировщика (собственный пул telebot отключается).
+        """
+        self._process = bot.process_new_updates
+        bot.threaded = False
+
+        def process_new_updates(updates):
+            for update in updates:
+                # offset для getUpdates telebot сдвигает в process_new_updates, а он теперь вызывается
+                # позже, из потока шарда — сдвигаем сразу, иначе polling получит апдейт повторно
+                bot.last_update_id = max(bot.last_update_id, update.update_id)
+                if self.submit(update):
+                    continue
+                logger.warning(f"Chat queue is full, update {update.update_id} dropped")
+                if update.callback_query is not None:
+                    try:
+                        bot.answer_callback_query(update.callback_query.id, "Слишком много запросов, подождите.")
+                    except Exception:
+                        pass
+
+        bot.process_new_updates = process_new_updates
+        for i, shard in enumerate(self._shards):
+            t = threading.Thread(target=self._worker, args=(shard,), name=f"chat-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10) -> None:
+        """Дорабатывает уже поставленные апдейты и останавливает потоки."""
+        self._stopping = True
+        for shard in self._shards:
+            with shard.cond:
+                shard.cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+
+def install_chat_scheduler(bot: TeleBot) -> ChatScheduler | None:
+    """
+    Подключает планировщик с параметрами из настроек (SCHEDULER_WORKERS=0 — оставить пул telebot).
+    Только для polling: в webhook и async апдейты разбирают их собственные ограниченные пулы.
+    """
+    if settings.SCHEDULER_WORKERS <= 0:
+        return None
+    scheduler = ChatScheduler(workers=settings.SCHEDULER_WORKERS, per_chat_cap=settings.SCHEDULER_CHAT_CAP)
+    scheduler.install(bot)
+    return scheduler
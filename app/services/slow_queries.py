@@ -0,0 +1,222 @@
+# services/slow_queries.py
+import html
+import re
+import threading
+import time
+
+from loguru import logger
+from telebot import TeleBot
+
+from app.config.settings import settings
+from app.database.session import db
+from app.services.metrics import metrics
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"IN \((?:\?, )+\?\)")
+_SPACES = re.compile(r"\s+")
+_ALIAS = re.compile(r'"(\w+)" AS "(\w+)"')
+# SQLite >= 3.36 пишет "SCAN orders", старые версии — "SCAN TABLE orders"; со «USING INDEX» — не полный скан
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+_CACHE_LIMIT = 4096
+
+
+def normalize_sql(sql: str) -> str:
+    """Текст запроса без литералов и с одинаковыми IN-списками — ключ для группировки."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?…)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def params_shape(params) -> str:
+    """Типы связанных параметров (сами значения в лог не пишем)."""
+    if not params:
+        return ""
+    names = [type(p).__name__ for p in params]
+    if len(names) > 6:
+        return ", ".join(names[:5]) + f", … ×{len(names)}"
+    return ", ".join(names)
+
+
+def full_scans(sql: str, plan: list[str]) -> list[str]:
+    """Таблицы, которые план читает целиком (псевдонимы peewee "t1" разворачиваются в имена таблиц)."""
+    aliases = {alias: table for table, alias in _ALIAS.findall(sql)}
+    tables = []
+    for detail in plan:
+        m = _SCAN.match(detail.strip())
+        if m:
+            table = aliases.get(m.group(2) or m.group(1), m.group(1))
+            if table not in tables:
+                tables.append(table)
+    return tables
+
+
+class _Statement:
+    __slots__ = ("sql", "count", "total", "max", "slow", "handlers", "shape", "plan", "scans")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = self.slow = 0
+        self.total = self.max = 0.0
+        self.handlers: set[str] = set()
+        self.shape = ""
+        self.plan: list[str] | None = None
+        self.scans: list[str] = []
+
+
+class SlowQueryLog:
+    """
+    Наблюдатель за запросами общего db (ObservedSqliteDatabase.observers).
+
+    Каждый запрос учитывается по нормализованному тексту: число, суммарное и максимальное время,
+    хендлеры, из которых он выполнялся. Для каждого нового SELECT/UPDATE/DELETE один раз снимается
+    EXPLAIN QUERY PLAN — полные сканы таблиц (например, orders без индекса) сразу пишутся в лог.
+    Запросы дольше threshold_ms логируются с нормализованным SQL, типами параметров и хендлером.
+    """
+
+    def __init__(self, database=db, threshold_ms: float = 50.0, top: int = 10, explain: bool = True):
+        self.database = database
+        self.threshold = threshold_ms / 1000
+        self.top = top
+        self.explain = explain
+        self.since = time.time()
+        self._statements: dict[str, _Statement] = {}
+        self._normalized: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+
+    def attach(self) -> None:
+        if self.observe not in self.database.observers:
+            self.database.observers.append(self.observe)
+
+    def detach(self) -> None:
+        if self.observe in self.database.observers:
+            self.database.observers.remove(self.observe)
+
+    # ---------- наблюдение ----------
+    def observe(self, sql: str, params, seconds: float) -> None:
+        if getattr(self._local, "explaining", False):
+            return
+        try:
+            self._observe(sql, params, seconds)
+        except Exception:
+            logger.exception("Slow query observer failed")
+
+    def _observe(self, sql: str, params, seconds: float) -> None:
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            normalized = normalize_sql(sql)
+            if len(self._normalized) < _CACHE_LIMIT:
+                self._normalized[sql] = normalized
+        handler = metrics.current_handler()
+        slow = seconds >= self.threshold
+
+        with self._lock:
+            stmt = self._statements.get(normalized)
+            if stmt is None:
+                stmt = self._statements[normalized] = _Statement(normalized)
+            stmt.count += 1
+            stmt.total += seconds
+            stmt.max = max(stmt.max, seconds)
+            if handler is not None:
+                stmt.handlers.add(handler)
+            if slow:
+                stmt.slow += 1
+                stmt.shape = params_shape(params)
+            need_plan = stmt.plan is None and self.explain and normalized.upper().startswith(_EXPLAINABLE)
+            if need_plan:
+                stmt.plan = []      # занято: параллельный поток не будет снимать план повторно
+
+        if need_plan:
+            self._explain(stmt, sql, params, handler)
+        if slow:
+            scans = f" FULL SCAN: {', '.join(stmt.scans)}" if stmt.scans else ""
+            logger.warning(f"Slow query {seconds * 1000:.1f} ms [{handler or '-'}] {normalized} "
+                           f"params=({params_shape(params)}){scans}")
+
+    def _explain(self, stmt: _Statement, sql: str, params, handler: str | None) -> None:
+        self._local.explaining = True
+        try:
+            rows = self.database.execute_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except Exception as e:
+            logger.debug(f"EXPLAIN failed for {stmt.sql}: {e}")
+            return
+        finally:
+            self._local.explaining = False
+        stmt.plan = [str(row[-1]) for row in rows]
+        stmt.scans = full_scans(sql, stmt.plan)
+        if stmt.scans:
+            logger.warning(f"Full table scan of {', '.join(stmt.scans)} [{handler or '-'}]: {stmt.sql}")
+
+    # ---------- отчёт ----------
+    def statements(self) -> list[_Statement]:
+        with self._lock:
+            return [s for s in self._statements.values() if s.count]
+
+    def digest(self, top: int | None = None) -> str:
+        """Топ запросов по суммарному времени с момента запуска/последнего сброса, с планами EXPLAIN QUERY PLAN."""
+        rows = sorted(self.statements(), key=lambda s: s.total, reverse=True)[:top or self.top]
+        minutes = (time.time() - self.since) / 60
+        lines = [f"🐢 SQL за {minutes:.0f} мин: топ-{len(rows)} по суммарному времени "
+                 f"(медленные — дольше {self.threshold * 1000:g} мс)"]
+        size = len(lines[0])
+        for i, s in enumerate(rows, 1):
+            scans = f" ⚠️ полный скан: {', '.join(s.scans)}" if s.scans else ""
+            handlers = ", ".join(sorted(s.handlers)[:3]) or "—"
+            plan = f"\n   план: <code>{html.escape('; '.join(s.plan)[:200])}</code>" if s.plan else ""
+            line = (f"\n{i}. {s.total * 1000:.0f} мс всего, {s.count} шт, avg {s.total / s.count * 1000:.1f} мс, "
+                    f"max {s.max * 1000:.1f} мс, медленных {s.slow}{scans}\n"
+                    f"   хендлеры: {html.escape(handlers)}\n"
+                    f"   <code>{html.escape(s.sql[:300])}</code>{plan}")
+            size += len(line) + 1
+            if size > 4000:     # лимит сообщения Telegram; резать посреди HTML-тега нельзя
+                break
+            lines.append(line)
+        if not rows:
+            lines.append("запросов не было")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """Обнуляет счётчики; планы запросов остаются, EXPLAIN повторно не снимается."""
+        with self._lock:
+            for s in self._statements.values():
+                s.count = s.slow = 0
+                s.total = s.max = 0.0
+                s.handlers = set()
+        self.since = time.time()
+
+    # ---------- периодическая сводка ----------
+    def start_digest(self, bot: TeleBot, admin_ids: list[int], interval: float) -> None:
+        def loop():
+            while not self._stop.wait(interval):
+                if not self.statements():
+                    continue
+                text = self.digest()
+                self.reset()
+                for admin_id in admin_ids:
+                    try:
+                        bot.send_message(admin_id, text, parse_mode="HTML")
+                    except Exception:
+                        logger.exception(f"Failed to send slow query digest to {admin_id}")
+
+        threading.Thread(target=loop, name="slow-query-digest", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+query_log = SlowQueryLog(db, threshold_ms=settings.SLOW_QUERY_MS, top=settings.SLOW_QUERY_TOP,
+                         explain=settings.SLOW_QUERY_EXPLAIN)
+
+
+def install_query_log(bot: TeleBot) -> SlowQueryLog | None:
+    """Подключает наблюдателя к db и сводку админам раз в SLOW_QUERY_DIGEST_MINUTES (SLOW_QUERY_MS=0 — выключено)."""
+    if settings.SLOW_QUERY_MS <= 0:
+        return None
+    query_log.attach()
+    if settings.SLOW_QUERY_DIGEST_MINUTES > 0 and settings.ADMIN_IDS:
+        query_log.start_digest(bot, settings.ADMIN_IDS, settings.SLOW_QUERY_DIGEST_MINUTES * 60)
+    return query_log
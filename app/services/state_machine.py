@@ -0,0 +1,173 @@
+# services/state_machine.py
+"""
+Единая таблица жизненного цикла заявки: (роль × статус) → допустимые действия и целевые статусы.
+
+Таблица собирается и проверяется один раз при импорте модуля; хендлеры водителя/диспетчера/руководителя
+и клавиатуры действий делают по ней O(1)-поиск вместо собственных цепочек if.
+"""
+import threading
+
+from app.database.models import OrderStatus, UserRole
+
+# ---------- Действия над заявкой ----------
+EDIT = "edit"                    # правка полей заявки (адреса, дата, груз, комментарий)
+ASSIGN = "assign"                # назначить/сменить водителя
+CANCEL = "cancel"                # отменить заявку
+ACCEPT = "accept"                # водитель принимает заявку
+CHANGE_STATUS = "change_status"  # водитель двигает статус
+COMMENT = "comment"              # комментарий водителя
+PHOTO = "photo"                  # фото/документ от водителя
+REASSIGN = "reassign"            # переназначение руководителем
+DETAILS = "details"              # подробности по выполненной заявке
+CLOSE = "close"                  # закрыть доставленной за водителя (колонна доехала, отметки нет)
+
+_S = OrderStatus
+NEW, CONFIRMED, ENROUTE_TO_LOADING, LOADING, ENROUTE, DELIVERED, CANCELLED = (
+    _S.NEW, _S.CONFIRMED, _S.ENROUTE_TO_LOADING, _S.LOADING, _S.ENROUTE, _S.DELIVERED, _S.CANCELLED
+)
+TERMINAL = frozenset({int(DELIVERED), int(CANCELLED)})
+ACTIVE = (CONFIRMED, ENROUTE_TO_LOADING, LOADING, ENROUTE)
+
+# ---------- Декларация ----------
+# role -> status -> (действия, целевые статусы, «быстрые» цели для отдельных кнопок на карточке)
+_SPEC = {
+    UserRole.DRIVER: {
+        NEW: ({ACCEPT}, (CONFIRMED,), ()),
+        # можно отправиться сразу в ENROUTE или сначала в ENROUTE_TO_LOADING
+        CONFIRMED: ({CHANGE_STATUS, COMMENT, PHOTO}, (ENROUTE_TO_LOADING, ENROUTE), (ENROUTE,)),
+        ENROUTE_TO_LOADING: ({CHANGE_STATUS, COMMENT, PHOTO}, (LOADING,), ()),
+        LOADING: ({CHANGE_STATUS, COMMENT, PHOTO}, (ENROUTE,), ()),
+        ENROUTE: ({CHANGE_STATUS, COMMENT, PHOTO}, (DELIVERED,), (DELIVERED,)),
+    },
+    UserRole.DISPATCHER: {
+        NEW: ({EDIT, ASSIGN, CANCEL}, (CONFIRMED, CANCELLED), ()),
+        CONFIRMED: ({EDIT, ASSIGN, CANCEL}, (CANCELLED,), ()),
+        ENROUTE_TO_LOADING: ({ASSIGN}, (), ()),
+        LOADING: ({ASSIGN}, (), ()),
+        ENROUTE: ({ASSIGN, CLOSE}, (DELIVERED,), ()),
+    },
+    UserRole.MANAGER: {
+        NEW: ({REASSIGN, CANCEL}, (CONFIRMED, CANCELLED), ()),
+        CONFIRMED: ({REASSIGN, CANCEL}, (CANCELLED,), ()),
+        ENROUTE_TO_LOADING: ({REASSIGN, CANCEL}, (CANCELLED,), ()),
+        LOADING: ({REASSIGN, CANCEL}, (CANCELLED,), ()),
+        ENROUTE: ({REASSIGN, CANCEL, CLOSE}, (CANCELLED, DELIVERED), ()),
+        DELIVERED: ({DETAILS}, (), ()),
+    },
+}
+
+# Действия, которые меняют заявку (на финальных статусах запрещены)
+_MUTATING = frozenset({EDIT, ASSIGN, CANCEL, ACCEPT, CHANGE_STATUS, COMMENT, PHOTO, REASSIGN, CLOSE})
+
+_ROLE_CODES = {"dispatcher": int(UserRole.DISPATCHER), "driver": int(UserRole.DRIVER),
+               "manager": int(UserRole.MANAGER)}
+
+_EMPTY = (frozenset(), (), ())
+
+
+def _build() -> dict[tuple[int, int], tuple[frozenset, tuple[int, ...], tuple[int, ...]]]:
+    table = {}
+    for role in UserRole:
+        by_status = _SPEC.get(role, {})
+        for status in OrderStatus:
+            actions, targets, quick = by_status.get(status, _EMPTY)
+            table[(int(role), int(status))] = (frozenset(actions),
+                                               tuple(int(t) for t in targets),
+                                               tuple(int(q) for q in quick))
+    return table
+
+
+def _validate(table) -> None:
+    """Проверки целостности таблицы; ошибка в декларации роняет импорт, а не продакшн-хендлер."""
+    for (role, status), (actions, targets, quick) in table.items():
+        where = f"{UserRole(role).name}/{OrderStatus(status).name}"
+        if status in targets:
+            raise ValueError(f"State machine: self-transition in {where}")
+        if not set(quick) <= set(targets):
+            raise ValueError(f"State machine: quick targets outside allowed targets in {where}")
+        if status in TERMINAL and (targets or actions & _MUTATING):
+            raise ValueError(f"State machine: terminal status is mutable in {where}")
+        if role == int(UserRole.DRIVER) and bool(targets) != bool(actions & {ACCEPT, CHANGE_STATUS}):
+            raise ValueError(f"State machine: driver targets without accept/change_status in {where}")
+
+    # из NEW по переходам любых ролей достижима доставка
+    reachable, frontier = {int(NEW)}, [int(NEW)]
+    while frontier:
+        current = frontier.pop()
+        for (_, status), (_, targets, _) in table.items():
+            if status == current:
+                for t in targets:
+                    if t not in reachable:
+                        reachable.add(t)
+                        frontier.append(t)
+    if int(DELIVERED) not in reachable:
+        raise ValueError("State machine: DELIVERED is unreachable from NEW")
+
+
+_TABLE = _build()
+_validate(_TABLE)
+
+
+def _role(role) -> int:
+    if isinstance(role, str):
+        return _ROLE_CODES.get(role, 0)
+    return int(role)
+
+
+# ---------- Поиск по таблице ----------
+def actions(role, status: int) -> frozenset:
+    """Действия, доступные роли для заявки в данном статусе."""
+    return _TABLE.get((_role(role), int(status)), _EMPTY)[0]
+
+
+def can(role, status: int, action: str) -> bool:
+    return action in _TABLE.get((_role(role), int(status)), _EMPTY)[0]
+
+
+def allowed_targets(role, status: int) -> tuple[int, ...]:
+    """Целевые статусы, в которые роль может перевести заявку из status."""
+    return _TABLE.get((_role(role), int(status)), _EMPTY)[1]
+
+
+def quick_targets(role, status: int) -> tuple[int, ...]:
+    """Цели, для которых на карточке есть отдельная кнопка (например «🚛 В путь»)."""
+    return _TABLE.get((_role(role), int(status)), _EMPTY)[2]
+
+
+def is_allowed(role, from_status: int, to_status: int) -> bool:
+    return int(to_status) in _TABLE.get((_role(role), int(from_status)), _EMPTY)[1]
+
+
+def statuses_with(role, action: str) -> tuple[int, ...]:
+    """Статусы, в которых роли доступно действие (для фильтров в запросах)."""
+    r = _role(role)
+    return tuple(s for (rr, s), (acts, _, _) in _TABLE.items() if rr == r and action in acts)
+
+
+# ---------- Аналитика переходов ----------
+class TransitionStats:
+    """Счётчики и длительность применения переходов (from → to) и количество проигранных гонок."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[tuple[int, int], list] = {}   # (from, to) -> [count, total_sec, max_sec]
+        self.conflicts = 0
+
+    def record(self, from_status: int | None, to_status: int, seconds: float, ok: bool = True) -> None:
+        """from_status=None — переход из нескольких допустимых статусов (например, отмена из NEW/CONFIRMED)."""
+        with self._lock:
+            if not ok:
+                self.conflicts += 1
+                return
+            row = self._data.setdefault((int(from_status or 0), int(to_status)), [0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += seconds
+            row[2] = max(row[2], seconds)
+
+    def snapshot(self) -> dict[tuple[int, int], dict]:
+        with self._lock:
+            return {key: {"count": c, "avg_ms": (t / c) * 1000 if c else 0.0, "max_ms": m * 1000}
+                    for key, (c, t, m) in self._data.items()}
+
+
+stats = TransitionStats()
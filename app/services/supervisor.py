@@ -0,0 +1,126 @@
+# services/supervisor.py
+import importlib
+import multiprocessing
+import signal
+import threading
+
+from loguru import logger
+from telebot import TeleBot
+
+from app.config.settings import settings
+from app.services.scheduler import chat_key, install_chat_scheduler
+
+
+def _load(target: str):
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _terminate(signum, frame):
+    raise SystemExit(0)
+
+
+def _worker_main(index: int, queue, setup: str) -> None:
+    """
+    Точка входа процесса-воркера: свой экземпляр бота с хендлерами, своя память FSM.
+    Ctrl+C получает вся группа процессов — останавливает воркеров только супервизор (через None в очереди).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.logs.logging import setup_logging
+    from app.utils.loader import bot
+
+    setup_logging()
+
+    notifications = _load(setup)(bot)
+    scheduler = install_chat_scheduler(bot)
+    if scheduler is None:
+        bot.threaded = False    # без планировщика обрабатываем по порядку прямо в цикле
+    logger.info(f"Worker {index} is up")
+    while True:
+        update = queue.get()
+        if update is None:
+            break
+        try:
+            bot.process_new_updates([update])
+        except Exception:
+            logger.exception(f"Worker {index} failed to process update {update.update_id}")
+    if scheduler is not None:
+        scheduler.stop()
+    if notifications is not None:
+        notifications.flush_all()
+
+
+class Supervisor:
+    """
+    Горизонтальное масштабирование на несколько процессов.
+
+    Процесс-приёмник (polling/webhook/async — как обычно) не выполняет хендлеры: его
+    bot.process_new_updates раскладывает апдейты по K процессам-воркерам по chat_id % K.
+    Чат всегда попадает в один и тот же процесс, поэтому StateMemoryStorage, кэши и порядок
+    шагов FSM остаются согласованными без общего хранилища; общая только база SQLite (WAL).
+    Очереди ограничены: если воркер не успевает, приёмник ждёт (обратное давление на ingress).
+    Упавший воркер перезапускается при следующем апдейте для него.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 1000, setup: str = "app.main:setup_bot"):
+        self.workers = workers
+        self.setup = setup
+        self._ctx = multiprocessing.get_context("spawn")   # без fork: соединения SQLite не наследуются
+        self.queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes: list = [None] * workers
+        self.restarts = 0
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(target=_worker_main, args=(index, self.queues[index], self.setup),
+                                    name=f"bot-worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            self._spawn(i)
+
+    def dispatch(self, updates) -> None:
+        for update in updates:
+            index = chat_key(update) % self.workers
+            if not self.processes[index].is_alive():
+                logger.error(f"Worker {index} is dead (exit code {self.processes[index].exitcode}), restarting")
+                self.restarts += 1
+                self._spawn(index)
+            self.queues[index].put(update)
+
+    def install(self, bot: TeleBot) -> None:
+        """Подменяет обработку апдейтов в процессе-приёмнике на раздачу воркерам."""
+        bot.threaded = False
+
+        def process_new_updates(updates):
+            # оригинальный process_new_updates здесь не вызывается — offset для getUpdates сдвигаем сами
+            for update in updates:
+                bot.last_update_id = max(bot.last_update_id, update.update_id)
+            self.dispatch(updates)
+
+        bot.process_new_updates = process_new_updates
+
+    def stop(self, timeout: float = 30) -> None:
+        """Воркеры дорабатывают свои очереди и завершаются."""
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def start_supervisor(bot: TeleBot, setup: str = "app.main:setup_bot") -> Supervisor:
+    """Запускает воркеров и подключает раздачу апдейтов к боту-приёмнику (параметры из настроек)."""
+    supervisor = Supervisor(workers=settings.SUPERVISOR_WORKERS,
+                            queue_size=settings.SUPERVISOR_QUEUE_SIZE, setup=setup)
+    supervisor.start()
+    supervisor.install(bot)
+    # docker stop шлёт SIGTERM только главному процессу — превращаем его в штатную остановку
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _terminate)
+    logger.info(f"Supervisor: {settings.SUPERVISOR_WORKERS} worker processes")
+    return supervisor
@@ -0,0 +1,186 @@
+# services/transitions.py
+import time
+from datetime import datetime
+from typing import Iterable
+
+from app.database.models import Order, OrderStatus, OrderStatusHistory, User, db
+from app.services import state_machine
+
+_UNSET = object()
+
+
+class TransitionResult:
+    """
+    Итог попытки перехода.
+    ok=False означает, что заявку успели изменить (или она не подходит под условия) —
+    reason содержит текст, который можно показать проигравшему.
+    """
+    __slots__ = ("ok", "order", "reason")
+
+    def __init__(self, ok: bool, order: Order | None, reason: str | None = None):
+        self.ok = ok
+        self.order = order
+        self.reason = reason
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+
+def transition(order_id: int,
+               actor: User | None,
+               from_statuses: Iterable[int],
+               to_status: int,
+               *,
+               driver=_UNSET,
+               only_driver: User | None = None,
+               driver_free_or: User | None = None,
+               version: int | None = None,
+               note: str | None = None,
+               **fields) -> TransitionResult:
+    """
+    Атомарный compare-and-set перехода статуса заявки.
+
+    Выполняет одним запросом
+        UPDATE orders SET status=?, [driver=?], version=version+1 ... WHERE id=? AND status IN (...) [AND ...]
+    и в той же транзакции пишет запись в историю. Если UPDATE не затронул строку — переход проиграл гонку.
+
+    :param from_statuses: статусы, из которых переход допустим (то, что видел пользователь)
+    :param driver: новый водитель заявки (если нужно его поменять)
+    :param only_driver: переход разрешён только назначенному водителю
+    :param driver_free_or: заявка должна быть без водителя или уже у этого пользователя (принятие заявки)
+    :param version: ожидаемая версия строки (строгая защита от устаревшей карточки)
+    :param fields: дополнительные поля заявки (например cancel_reason)
+    """
+    from_statuses = [int(s) for s in from_statuses]
+    values = {Order.status: int(to_status),
+              Order.version: Order.version + 1,
+              Order.updated_at: datetime.now()}
+    if driver is not _UNSET:
+        values[Order.driver] = driver
+    for name, value in fields.items():
+        values[getattr(Order, name)] = value
+
+    cond = (Order.id == order_id) & (Order.status.in_(from_statuses))
+    if only_driver is not None:
+        cond &= (Order.driver == only_driver)
+    if driver_free_or is not None:
+        cond &= (Order.driver.is_null() | (Order.driver == driver_free_or))
+    if version is not None:
+        cond &= (Order.version == version)
+
+    started = time.perf_counter()
+    with db.atomic():
+        updated = Order.update(values).where(cond).execute()
+        if updated == 1:
+            OrderStatusHistory.create(order=order_id, by_user=actor, status=int(to_status), note=note)
+    state_machine.stats.record(from_statuses[0] if len(from_statuses) == 1 else None, to_status,
+                               time.perf_counter() - started, ok=(updated == 1))
+
+    order = Order.get_or_none(Order.id == order_id)
+    if updated == 1:
+        return TransitionResult(True, order)
+    return TransitionResult(False, order, _conflict_reason(order, from_statuses, only_driver, driver_free_or))
+
+
+def assign_driver(order: Order, actor: User | None, role, action: str, driver_id: int | None,
+                  note: str | None = None) -> TransitionResult:
+    """
+    Назначение/снятие водителя через compare-and-set: только если роли в текущем статусе заявки доступно
+    action (ASSIGN диспетчера, REASSIGN руководителя) и заявку не изменили после того, как её прочитали
+    (статус и version). Новая заявка с назначенным водителем становится подтверждённой (NEW → CONFIRMED).
+
+    :param order: заявка в том виде, в каком её видел пользователь
+    """
+    if not state_machine.can(role, order.status, action):
+        return TransitionResult(False, order, f"В статусе «{OrderStatus(order.status).label}» "
+                                              f"водителя сменить нельзя.")
+    to_status = int(order.status)
+    if to_status == int(OrderStatus.NEW) and driver_id:
+        to_status = int(OrderStatus.CONFIRMED)
+    return transition(order.id, actor, [order.status], to_status, driver=driver_id, version=order.version,
+                      note=note)
+
+
+def _conflict_reason(order: Order | None, from_statuses: list[int],
+                     only_driver: User | None, driver_free_or: User | None) -> str:
+    if order is None:
+        return "Заявка не найдена."
+    if driver_free_or is not None and order.driver_id and order.driver_id != driver_free_or.id:
+        return "Заявка уже назначена другому водителю."
+    if only_driver is not None and order.driver_id != only_driver.id:
+        return "Заявка не найдена или недоступна."
+    if int(order.status) not in from_statuses:
+        return f"Заявка уже в статусе «{OrderStatus(order.status).label}». Обновите карточку."
+    return "Заявку изменили одновременно с вами. Обновите карточку."
+
+
+class BulkResult:
+    """
+    Итог массового перехода: updated — изменённые заявки (уже в новом статусе), prev_statuses — их статусы
+    до перехода {id: статус}, skipped — id, которые не подошли (статус успел измениться, чужая заявка, нет в БД).
+    """
+    __slots__ = ("updated", "prev_statuses", "skipped")
+
+    def __init__(self, updated: list[Order], prev_statuses: dict[int, int], skipped: list[int]):
+        self.updated = updated
+        self.prev_statuses = prev_statuses
+        self.skipped = skipped
+
+
+def bulk_transition(order_ids: Iterable[int],
+                    actor: User | None,
+                    from_statuses: Iterable[int],
+                    to_status: int,
+                    *,
+                    dispatcher: User | None = None,
+                    note: str | None = None,
+                    **fields) -> BulkResult:
+    """
+    Переход статуса сразу для многих заявок в одной транзакции.
+
+    Вместо update + OrderStatusHistory.create на каждую заявку:
+        SELECT подходящих строк → один UPDATE ... WHERE id IN (...) AND status IN (...) → insert_many истории.
+    Транзакция IMMEDIATE берёт блокировку записи до SELECT, поэтому между чтением и UPDATE строки
+    не меняются и обновлено ровно то, что выбрано. Заявки, не прошедшие условия, попадают в skipped.
+
+    :param dispatcher: менять только заявки этого диспетчера
+    :param fields: дополнительные поля заявки (например cancel_reason)
+    """
+    order_ids = list(dict.fromkeys(int(i) for i in order_ids))
+    from_statuses = [int(s) for s in from_statuses]
+    if not order_ids:
+        return BulkResult([], {}, [])
+    now = datetime.now()
+    values = {Order.status: int(to_status),
+              Order.version: Order.version + 1,
+              Order.updated_at: now}
+    for name, value in fields.items():
+        values[getattr(Order, name)] = value
+
+    cond = Order.id.in_(order_ids) & Order.status.in_(from_statuses)
+    if dispatcher is not None:
+        cond &= (Order.dispatcher == dispatcher)
+
+    started = time.perf_counter()
+    with db.atomic("IMMEDIATE"):
+        orders = list(Order.select().where(cond))
+        if orders:
+            Order.update(values).where(Order.id.in_([o.id for o in orders]) & Order.status.in_(from_statuses)).execute()
+            OrderStatusHistory.insert_many([
+                {"order": o.id, "by_user": actor, "status": int(to_status), "note": note, "created_at": now}
+                for o in orders
+            ]).execute()
+    elapsed = time.perf_counter() - started
+
+    # модели собираются из прочитанных строк, без повторного SELECT
+    prev_statuses = {}
+    for order in orders:
+        prev_statuses[order.id] = int(order.status)
+        state_machine.stats.record(order.status, to_status, elapsed / len(orders))
+        order.status = int(to_status)
+        order.version += 1
+        order.updated_at = now
+        for name, value in fields.items():
+            setattr(order, name, value)
+    skipped = [i for i in order_ids if i not in prev_statuses]
+    return BulkResult(orders, prev_statuses, skipped)
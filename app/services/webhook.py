@@ -0,0 +1,165 @@
+# services/webhook.py
+import hmac
+import json
+import queue
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger
+from telebot import TeleBot, types
+
+from app.config.settings import settings
+
+_SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+_STOP = object()
+
+
+class WebhookServer:
+    """
+    Приём апдейтов вебхуком вместо long polling.
+
+    Встроенный HTTP-сервер проверяет секретный токен Telegram, кладёт апдейт в ограниченную очередь
+    и сразу отвечает 200. Очередь разбирают workers потоков, которые вызывают bot.process_new_updates —
+    это и есть пул хендлеров. Если очередь заполнена, сервер отвечает 429 с Retry-After,
+    и Telegram повторит доставку позже (обратное давление вместо неограниченного роста памяти).
+    """
+
+    def __init__(self, bot: TeleBot, host: str = "0.0.0.0", port: int = 8443, path: str = "/telegram",
+                 secret: str | None = None, queue_size: int = 256, workers: int = 4, batch: int = 32):
+        self.bot = bot
+        self.path = path
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.workers = workers
+        self.batch = batch
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.accepted = 0
+        self.rejected = 0      # 429 — очередь переполнена
+        self.forbidden = 0     # 403 — неверный секрет
+        self._threads: list[threading.Thread] = []
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    # ---------- HTTP ----------
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+                token = self.headers.get(_SECRET_HEADER, "")
+                if not hmac.compare_digest(token.encode(), server.secret.encode()):
+                    server.forbidden += 1
+                    return self._reply(403)
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    update = types.Update.de_json(json.loads(self.rfile.read(length)))
+                except Exception:
+                    return self._reply(400)
+                try:
+                    server.queue.put_nowait(update)
+                except queue.Full:
+                    server.rejected += 1
+                    return self._reply(429, retry_after=1)
+                server.accepted += 1
+                self._reply(200)
+
+            def _reply(self, code: int, retry_after: int | None = None):
+                self.send_response(code)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                # access-лог http.server пишет в stderr на каждый апдейт — выключаем
+                pass
+
+        return Handler
+
+    # ---------- пул хендлеров ----------
+    def _worker(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            updates = [item]
+            # добираем то, что уже лежит в очереди: один вызов на пачку (дедуп пишет её одной транзакцией)
+            while len(updates) < self.batch:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self.queue.put(_STOP)
+                    break
+                updates.append(item)
+            try:
+                # атрибут читаем при каждом вызове: обёртки (дедуп и т.п.) ставятся на экземпляр бота
+                self.bot.process_new_updates(updates)
+            except Exception:
+                logger.exception("Webhook worker failed to process updates")
+
+    def start(self) -> None:
+        """Запускает пул обработчиков и HTTP-сервер в фоновых потоках."""
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"webhook-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._httpd.serve_forever, name="webhook-http", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: float = 10) -> None:
+        """Перестаёт принимать апдейты и дожидается обработки уже принятых."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for _ in range(self.workers):
+            self.queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+
+def create_webhook_server(bot: TeleBot) -> WebhookServer:
+    """Создаёт сервер вебхука с параметрами из настроек."""
+    # хендлеры выполняются в потоках сервера; собственный пул telebot не ограничен по очереди
+    bot.threaded = False
+    return WebhookServer(
+        bot,
+        host=settings.WEBHOOK_HOST,
+        port=settings.WEBHOOK_PORT,
+        path=settings.WEBHOOK_PATH,
+        secret=settings.WEBHOOK_SECRET,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        workers=settings.WEBHOOK_WORKERS,
+    )
+
+
+def run_webhook(bot: TeleBot, drop_pending: bool = True) -> None:
+    """Регистрирует вебхук в Telegram и обслуживает его до остановки процесса."""
+    if not settings.WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is required for BOT_MODE=webhook")
+    server = create_webhook_server(bot)
+    server.start()
+    bot.remove_webhook()
+    bot.set_webhook(
+        url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=server.secret,
+        max_connections=settings.WEBHOOK_WORKERS * 10,
+        drop_pending_updates=drop_pending,
+    )
+    logger.info(f"Webhook is listening on {settings.WEBHOOK_HOST}:{server.port}{settings.WEBHOOK_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.stop()
@@ -16,6 +16,7 @@ class RequestsStates(StatesGroup):
     order_weight_volume = State()
     order_comment = State()
     order_file = State()
+    import_orders = State()  # ожидание файла XLSX/CSV для импорта заявок
 
     show_attachments = State()  # ожидание ввода ID заявки для просмотра вложений (reply flow)
     export_reports = State()  # ожидание выбора периода экспорта
@@ -33,13 +34,16 @@ class RequestsStates(StatesGroup):
     edit_cargo = State()
     edit_weight = State()
 
-    # назначение и комментарий водителя
-    assign_driver = State()
+    # комментарий водителя
     driver_comment = State()
     driver_attach = State()
 
     # отмена с причиной
     cancel_reason = State()
 
+    # массовые действия: выбор заявок в списке и причина отмены выбранных
+    bulk_select = State()
+    bulk_cancel_reason = State()
+
     # чат по заявке
     chat = State()
\ No newline at end of file
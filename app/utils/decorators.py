@@ -11,18 +11,17 @@ def debug_handler(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            message = args[0]
-            logger.debug(f"Обработчик {func.__name__} вызван с сообщением: {message.text}")
-            logger.debug(f"User ID: {message.from_user.id}, Chat ID: {message.chat.id}")
-
-            # Логируем текущее состояние
-            from ..utils.loader import bot
-            current_state = bot.get_state(message.from_user.id, message.chat.id)
-            logger.debug(f"Текущее состояние: {current_state}")
+            # без DEBUG не форматируем строки и не читаем состояние FSM
+            if logger.isEnabledFor(logging.DEBUG):
+                message = args[0]
+                from ..utils.loader import bot
+                logger.debug("Обработчик %s вызван с сообщением: %s (user %s, chat %s, состояние %s)",
+                             func.__name__, message.text, message.from_user.id, message.chat.id,
+                             bot.get_state(message.from_user.id, message.chat.id))
 
             return func(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Ошибка в обработчике {func.__name__}: {e}")
+            logger.error("Ошибка в обработчике %s: %s", func.__name__, e)
             raise
 
     return wrapper
\ No newline at end of file
@@ -0,0 +1,6 @@
+# utils/formatters.py
+
+
+def format_order_numbers(ids: list[int], limit: int = 20) -> str:
+    """«#1, #2, #3 и ещё 40» — номера заявок для сводных сообщений."""
+    return ", ".join(f"#{i}" for i in ids[:limit]) + (f" и ещё {len(ids) - limit}" if len(ids) > limit else "")
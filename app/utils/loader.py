@@ -1,7 +1,10 @@
-from telebot import TeleBot
+from telebot import TeleBot, apihelper
 from telebot.storage import StateMemoryStorage
 from app.config.settings import settings
 
+if settings.TELEGRAM_API_URL:
+    apihelper.API_URL = settings.TELEGRAM_API_URL
+
 # Упрощенная инициализация storage
 state_storage = StateMemoryStorage()
-bot = TeleBot(settings.BOT_TOKEN, state_storage=state_storage)
\ No newline at end of file
+bot = TeleBot(settings.BOT_TOKEN, state_storage=state_storage)
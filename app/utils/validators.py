@@ -1,7 +1,7 @@
 import re
 import phonenumbers
 from datetime import datetime
-from typing import Union, Tuple
+from typing import Optional, Union, Tuple
 
 
 def validate_phone_number(phone: str) -> bool:
@@ -84,6 +84,54 @@ def validate_volume(volume: Union[str, int, float]) -> Tuple[bool, str]:
         return False, "Объем должен быть числом"
 
 
+# число и необязательная единица: «20 т», «1500кг», «3,5 тонны», «40 м³», «82 куба»
+_WEIGHT_VOLUME_TOKEN = re.compile(
+    r"(\d+(?:[.,]\d+)?)\s*(тонн\w*|тн|т|t|кг|kg|м3|м³|m3|куб\w*)?(?![а-яa-z])", re.IGNORECASE)
+_TONS = ("т", "тн", "t")
+# пробел (в т.ч. неразрывный) между разрядами: «1 200 кг» — одно число 1200, а не «1» без единицы и 200 кг
+_DIGIT_GROUP_SPACE = re.compile(r"(?<=\d)[ \u00a0\u202f](?=\d{3}\b)")
+
+
+def parse_weight_volume(text: str) -> Tuple[Optional[float], Optional[float], str]:
+    """
+    Разбор свободного текста «вес/объём» в числа: (weight_kg, volume_m3, error_message).
+
+    Понимает тонны (т, тн, тонн…), килограммы (кг) и кубометры (м3, м³, куб…), в любом порядке
+    («5 т / 30 м3»). Число без единицы — вес: до 100 — в тоннах, больше — в килограммах.
+    Разряды можно разделять пробелом («1 200 кг»). Текст без чисел с единицами (например «3 паллеты»)
+    даёт (None, None, "") — остаётся только строкой.
+    Значения проверяются validate_weight / validate_volume; при ошибке возвращается её текст.
+    """
+    if not text or not text.strip():
+        return None, None, ""
+    weight_kg = volume_m3 = None
+    text = _DIGIT_GROUP_SPACE.sub("", text)
+    tokens = _WEIGHT_VOLUME_TOKEN.findall(text.strip())
+    bare = re.fullmatch(r"\s*(\d+(?:[.,]\d+)?)\s*", text)
+    for number, unit in tokens:
+        value = float(number.replace(",", "."))
+        unit = unit.lower()
+        if unit.startswith("тонн") or unit in _TONS:
+            weight_kg = value * 1000
+        elif unit in ("кг", "kg"):
+            weight_kg = value
+        elif unit in ("м3", "м³", "m3") or unit.startswith("куб"):
+            volume_m3 = value
+    if bare:
+        value = float(bare.group(1).replace(",", "."))
+        weight_kg = value * 1000 if value <= 100 else value
+
+    if weight_kg is not None:
+        ok, error = validate_weight(weight_kg)
+        if not ok:
+            return None, None, error
+    if volume_m3 is not None:
+        ok, error = validate_volume(volume_m3)
+        if not ok:
+            return None, None, error
+    return weight_kg, volume_m3, ""
+
+
 def validate_address(address: str) -> Tuple[bool, str]:
     """
     Валидация адреса.
@@ -0,0 +1,121 @@
+# benchmarks/archive_split.py
+"""
+Горячая таблица заявок против архива (services/archive.py).
+
+База наполняется --history завершёнными заявками за прошлые годы и --active текущими; запросы рабочих
+экранов (активные заявки водителя, счётчик активных у диспетчера, карточка по id) и запросы истории
+(статистика руководителя, «Завершённые заявки» водителя — через OrderAll) замеряются до переноса в архив и после.
+Цель — время рабочих запросов не зависит от объёма истории, а история остаётся полной.
+
+Запуск:  python -m benchmarks.archive_split --history 200000 --active 2000 --repeats 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _seed(args):
+    from peewee import Value
+    from app.database.models import Order, OrderStatus, OrderStatusHistory, User, UserRole, db, to_day_bucket
+
+    rnd = random.Random(args.seed)
+    now = datetime.now()
+    users = [{"tg_id": i, "first_name": f"User{i}",
+              "role": int(UserRole.DRIVER if i <= args.drivers else UserRole.DISPATCHER)}
+             for i in range(1, args.drivers + args.dispatchers + 1)]
+    User.insert_many(users).execute()
+
+    def order(old: bool) -> dict:
+        when = now - timedelta(days=rnd.uniform(120, 1000) if old else rnd.uniform(0, 7))
+        status = (rnd.choice((OrderStatus.DELIVERED, OrderStatus.DELIVERED, OrderStatus.CANCELLED)) if old
+                  else rnd.choice((OrderStatus.NEW, OrderStatus.CONFIRMED, OrderStatus.ENROUTE)))
+        return {"dispatcher": args.drivers + 1 + rnd.randrange(args.dispatchers),
+                "driver": 1 + rnd.randrange(args.drivers), "from_addr": "А", "to_addr": "Б",
+                "datetime": when, "day_bucket": to_day_bucket(when), "created_at": when, "updated_at": when,
+                "status": int(status)}
+
+    rows = [order(True) for _ in range(args.history)] + [order(False) for _ in range(args.active)]
+    rows.sort(key=lambda r: r["created_at"])
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            Order.insert_many(rows[i:i + 500]).execute()
+        # две записи истории статусов на заявку, как у реальных переходов
+        for _ in range(2):
+            OrderStatusHistory.insert_from(
+                Order.select(Order.id, Order.status, Value(str(now)), Value(str(now))),
+                [OrderStatusHistory.order, OrderStatusHistory.status, OrderStatusHistory.created_at,
+                 OrderStatusHistory.updated_at]).execute()
+
+
+def _queries(args):
+    from app.database.models import Order, OrderAll, OrderStatus
+    from app.services.archive import FINISHED, count_orders
+
+    rnd = random.Random(args.seed + 1)
+    last_id = Order.select().order_by(Order.id.desc()).get().id
+    active_ids = range(last_id - args.active + 1, last_id + 1)
+    return {
+        "driver active list": lambda: list(Order.select().where(
+            (Order.driver == 1 + rnd.randrange(args.drivers)) & Order.status.not_in(FINISHED))),
+        "dispatcher active count": lambda: Order.select().where(
+            (Order.driver == 1 + rnd.randrange(args.drivers)) & Order.status.not_in(FINISHED)).count(),
+        "order card by id": lambda: Order.get_or_none(Order.id == rnd.choice(active_ids)),
+        "manager stats (all)": lambda: count_orders(lambda m: m.status == int(OrderStatus.DELIVERED)),
+        "driver completed (all)": lambda: list(OrderAll.select().where(
+            (OrderAll.driver == 1 + rnd.randrange(args.drivers)) & OrderAll.status.in_(FINISHED))
+            .order_by(OrderAll.datetime.desc()).limit(20)),
+    }
+
+
+def _measure(queries: dict, repeats: int) -> dict:
+    result = {}
+    for name, query in queries.items():
+        query()     # прогрев кэша страниц
+        started = time.perf_counter()
+        for _ in range(repeats):
+            query()
+        result[name] = (time.perf_counter() - started) / repeats * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=200000, help="завершённых заявок старше порога архива")
+    parser.add_argument("--active", type=int, default=2000, help="текущих заявок")
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--dispatchers", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_archive_"), "bench.db")
+    os.environ.setdefault("ARCHIVE_AFTER_DAYS", "90")
+
+    from app.database.models import create_all_tables
+    from app.services.archive import archiver
+
+    create_all_tables()
+    _seed(args)
+    queries = _queries(args)
+
+    before = _measure(queries, args.repeats)
+    started = time.perf_counter()
+    moved = archiver.run()
+    elapsed = time.perf_counter() - started
+    after = _measure(queries, args.repeats)
+
+    counts = archiver.counts()
+    print(f"archived {moved} orders in {elapsed:.1f}s (batch {archiver.batch_size}); "
+          f"hot={counts['hot']} archive={counts['archive']}")
+    print(f"{'query':<26}{'before, ms':>12}{'after, ms':>12}")
+    for name in queries:
+        print(f"{name:<26}{before[name]:>12.3f}{after[name]:>12.3f}  ({after[name] / before[name]:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
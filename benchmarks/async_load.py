@@ -0,0 +1,123 @@
+# benchmarks/async_load.py
+"""
+Пропускная способность синхронного TeleBot против асинхронного движка services/async_runtime.py
+под нагрузкой множества пользователей.
+
+Хендлеры в обоих вариантах синхронные и выполняются в пуле потоков одного размера (--workers): у TeleBot —
+num_threads, у движка — executor. Так сравнивается сам способ ходить в Bot API (requests на каждый вызов
+против общей aiohttp-сессии с keep-alive), а не 2 потока против 16. Оба варианта работают против
+benchmarks/fake_telegram.py с сетевой задержкой --latency-ms и одним и тем же хендлером: запрос пользователя
+в SQLite + ответ send_message.
+
+Запуск:  python -m benchmarks.async_load --users 500 --messages 4 --latency-ms 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _wait_for(fake, expected: int, timeout: float) -> float:
+    started = time.perf_counter()
+    while fake.calls.get("sendMessage", 0) < expected and time.perf_counter() - started < timeout:
+        time.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def _make_bot(threaded: bool, num_threads: int = 2):
+    from telebot import TeleBot
+    from app.database.models import User
+
+    bot = TeleBot(os.environ["BOT_TOKEN"], threaded=threaded, num_threads=num_threads)
+
+    @bot.message_handler(func=lambda m: True)
+    def on_message(message):
+        user = User.get_or_none(User.tg_id == message.chat.id)
+        bot.send_message(message.chat.id, f"Привет, {user.first_name if user else 'гость'}")
+
+    return bot
+
+
+def _push_load(fake, users: int, messages: int) -> None:
+    for i in range(messages):
+        for chat_id in range(1, users + 1):
+            fake.push(fake.message(chat_id, f"msg {i}"))
+
+
+def run_sync(fake, args) -> float:
+    bot = _make_bot(threaded=True, num_threads=args.workers)
+    poller = threading.Thread(target=bot.polling, kwargs={"interval": 0, "timeout": 30, "long_polling_timeout": 5},
+                              daemon=True)
+    poller.start()
+    total = args.users * args.messages
+    base = fake.calls.get("sendMessage", 0)
+    started = time.perf_counter()
+    _push_load(fake, args.users, args.messages)
+    _wait_for(fake, base + total, args.timeout)
+    elapsed = time.perf_counter() - started
+    done = fake.calls.get("sendMessage", 0) - base
+    bot.stop_polling()
+    return done / elapsed
+
+
+def run_async(fake, args) -> float:
+    from app.services.async_runtime import AsyncRuntime
+
+    runtime = AsyncRuntime(_make_bot(threaded=False), workers=args.workers,
+                           max_in_flight=args.max_in_flight, connections=args.connections)
+    thread = threading.Thread(target=asyncio.run, args=(runtime.run(skip_pending=False),), daemon=True)
+    thread.start()
+    total = args.users * args.messages
+    base = fake.calls.get("sendMessage", 0)
+    started = time.perf_counter()
+    _push_load(fake, args.users, args.messages)
+    _wait_for(fake, base + total, args.timeout)
+    elapsed = time.perf_counter() - started
+    done = fake.calls.get("sendMessage", 0) - base
+    runtime.stop()
+    fake.push(fake.message(1, "stop"))  # будим long polling, чтобы цикл увидел остановку
+    thread.join(10)
+    return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, default=16, help="потоков хендлеров у обоих вариантов")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--mode", choices=("both", "sync", "async"), default="both")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="next25_async_")
+    os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+    from telebot import apihelper, asyncio_helper
+    from app.database.models import User, UserRole, create_all_tables
+    from benchmarks.fake_telegram import FakeTelegram
+
+    create_all_tables()
+    User.insert_many([{"tg_id": i, "first_name": f"User{i}", "role": int(UserRole.DRIVER)}
+                      for i in range(1, args.users + 1)]).execute()
+
+    fake = FakeTelegram(latency_ms=args.latency_ms).start()
+    apihelper.API_URL = asyncio_helper.API_URL = fake.api_url
+
+    total = args.users * args.messages
+    if args.mode in ("both", "sync"):
+        print(f"sync TeleBot:  {total} updates, {run_sync(fake, args):,.0f} upd/s (num_threads={args.workers})")
+    if args.mode in ("both", "async"):
+        print(f"async runtime: {total} updates, {run_async(fake, args):,.0f} upd/s "
+              f"(workers={args.workers}, connections={args.connections})")
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
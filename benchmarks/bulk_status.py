@@ -0,0 +1,115 @@
+# benchmarks/bulk_status.py
+"""
+Массовая смена статуса (services/transitions.bulk_transition) против перехода по одной заявке.
+
+В базе --orders заявок; выбирается --selected новых заявок одного диспетчера (водители — из --drivers) и
+отменяется двумя способами: по одной — transition() и ORDER_STATUS_CHANGED на каждую заявку, как при отмене
+с карточки; разом — bulk_transition() и одно ORDERS_STATUS_CHANGED. Подписчики — сводки и уведомления
+(отправка сообщений подменена счётчиком), так что видно и число сообщений участникам.
+
+Запуск:  python -m benchmarks.bulk_status --orders 20000 --selected 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+class _CountingBot:
+    """Вместо Telegram: считает отправленные сообщения."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+def _seed(args):
+    from app.database.models import Order, OrderStatus, User, UserRole, db, to_day_bucket
+
+    rnd = random.Random(args.seed)
+    now = datetime.now()
+    User.insert_many([{"tg_id": 1, "first_name": "Диспетчер", "role": int(UserRole.DISPATCHER)}] +
+                     [{"tg_id": 100 + i, "first_name": f"Водитель{i}", "role": int(UserRole.DRIVER)}
+                      for i in range(args.drivers)]).execute()
+    rows = []
+    for _ in range(args.orders):
+        when = now - timedelta(minutes=rnd.randint(0, 30 * 24 * 60))
+        rows.append({"dispatcher": 1, "driver": 2 + rnd.randrange(args.drivers), "from_addr": "А", "to_addr": "Б",
+                     "datetime": when, "day_bucket": to_day_bucket(when), "created_at": when, "updated_at": when,
+                     "status": int(OrderStatus.NEW)})
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            Order.insert_many(rows[i:i + 500]).execute()
+
+
+def _one_by_one(ids, actor) -> None:
+    from app.database.models import OrderStatus
+    from app.services import events, state_machine
+    from app.services.events import bus
+    from app.services.transitions import transition
+
+    for order_id in ids:
+        result = transition(order_id, actor, state_machine.statuses_with("dispatcher", state_machine.CANCEL),
+                            OrderStatus.CANCELLED, cancel_reason="bench", note="Отменена: bench")
+        if result:
+            bus.publish(events.ORDER_STATUS_CHANGED, order=result.order, actor=actor,
+                        status=int(OrderStatus.CANCELLED), prev_status=int(OrderStatus.NEW), reason="bench")
+
+
+def _bulk(ids, actor) -> None:
+    from app.database.models import OrderStatus
+    from app.services import events, state_machine
+    from app.services.events import bus
+    from app.services.transitions import bulk_transition
+
+    result = bulk_transition(ids, actor, state_machine.statuses_with("dispatcher", state_machine.CANCEL),
+                             OrderStatus.CANCELLED, dispatcher=actor, note="Отменена: bench", cancel_reason="bench")
+    bus.publish(events.ORDERS_STATUS_CHANGED, actor=actor, orders=result.updated, status=int(OrderStatus.CANCELLED),
+                prev_statuses=result.prev_statuses, reason="bench")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--selected", type=int, default=200, help="заявок в одном массовом действии")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_bulk_"), "bench.db")
+
+    from app.database.models import Order, OrderStatusHistory, User, create_all_tables
+    from app.services.events import bus
+    from app.services.notifications import NotificationSubscriber
+    from app.services.rollup import backfill_rollup, register_rollup_subscriber
+
+    create_all_tables()
+    _seed(args)
+    backfill_rollup()
+    register_rollup_subscriber()
+    bot = _CountingBot()
+    # window=0: без склейки по заявке — как и есть для разных заявок, склеиваются только обновления одной
+    NotificationSubscriber(bot, window=0).attach(bus)
+    actor = User.get(User.tg_id == 1)
+
+    rnd = random.Random(args.seed)
+    ids = rnd.sample(range(1, args.orders + 1), args.selected * 2)
+    print(f"{'mode':<12}{'orders':>8}{'seconds':>10}{'ms/order':>10}{'messages':>10}")
+    for name, run, part in (("one by one", _one_by_one, ids[:args.selected]), ("bulk", _bulk, ids[args.selected:])):
+        bot.sent = 0
+        started = time.perf_counter()
+        run(part, actor)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<12}{len(part):>8}{elapsed:>10.3f}{elapsed / len(part) * 1000:>10.2f}{bot.sent:>10}")
+    print(f"history rows: {OrderStatusHistory.select().count()}, "
+          f"cancelled: {Order.select().where(Order.cancel_reason == 'bench').count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/driver_suggestions.py
+"""
+Подбор водителя (services/assignment.py): агрегаты в памяти против подсчёта запросами на каждый показ.
+
+В базе --orders заявок за 90 дней у --drivers водителей по --cities городам и история статусов. «По запросу» —
+те же три агрегата (заявки в работе, доставки по маршруту, последняя смена статуса), посчитанные GROUP BY при
+каждом показе списка водителей; «в памяти» — AssignmentScorer.suggest() по уже загруженным агрегатам.
+Отдельно замерен пересчёт агрегатов одного водителя — то, что делает подписчик шины на событие.
+
+Запуск:  python -m benchmarks.driver_suggestions --orders 100000 --drivers 200 --repeats 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _seed(args):
+    from app.database.models import Order, OrderStatus, OrderStatusHistory, User, UserRole, db, to_day_bucket
+
+    rnd = random.Random(args.seed)
+    now = datetime.now()
+    cities = [f"Город{i}" for i in range(args.cities)]
+    User.insert_many([{"tg_id": 1, "first_name": "Диспетчер", "role": int(UserRole.DISPATCHER)}] +
+                     [{"tg_id": 100 + i, "first_name": f"Водитель{i}", "role": int(UserRole.DRIVER)}
+                      for i in range(args.drivers)]).execute()
+    statuses = [int(s) for s in OrderStatus]
+    rows = []
+    for _ in range(args.orders):
+        when = now - timedelta(minutes=rnd.randint(0, 90 * 24 * 60))
+        rows.append({"dispatcher": 1, "driver": 2 + rnd.randrange(args.drivers),
+                     "from_addr": f"{rnd.choice(cities)}, ул. Складская, 1", "to_addr": f"{rnd.choice(cities)}, 5",
+                     "datetime": when, "day_bucket": to_day_bucket(when), "created_at": when, "updated_at": when,
+                     "status": rnd.choice(statuses)})
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            Order.insert_many(rows[i:i + 500]).execute()
+        history = [{"order": i + 1, "by_user": row["driver"], "status": row["status"], "created_at": row["updated_at"]}
+                   for i, row in enumerate(rows)]
+        for i in range(0, len(history), 500):
+            OrderStatusHistory.insert_many(history[i:i + 500]).execute()
+    return cities
+
+
+def _per_request(candidates, from_addr, to_addr, window_days):
+    """Как было бы без агрегатов в памяти: три GROUP BY на каждый показ списка."""
+    from datetime import date
+
+    from peewee import fn
+
+    from app.database.models import Order, OrderStatus, OrderStatusHistory
+    from app.services.assignment import route_key
+    from app.services.state_machine import TERMINAL
+
+    active = dict(Order.select(Order.driver, fn.COUNT(Order.id))
+                  .where(Order.driver.in_(candidates) & Order.status.not_in(list(TERMINAL)))
+                  .group_by(Order.driver).tuples())
+    last = dict(OrderStatusHistory.select(OrderStatusHistory.by_user, fn.MAX(OrderStatusHistory.created_at))
+                .where(OrderStatusHistory.by_user.in_(candidates))
+                .group_by(OrderStatusHistory.by_user).tuples())
+    route = route_key(from_addr, to_addr)
+    deliveries = {}
+    for driver_id, a, b in (Order.select(Order.driver, Order.from_addr, Order.to_addr)
+                            .where(Order.driver.in_(candidates) & (Order.status == int(OrderStatus.DELIVERED)) &
+                                   (Order.day_bucket >= date.today().toordinal() - window_days)).tuples()):
+        if route_key(a, b) == route:
+            deliveries[driver_id] = deliveries.get(driver_id, 0) + 1
+    return active, last, deliveries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=15)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_assign_"), "bench.db")
+
+    from app.database.models import create_all_tables
+    from app.services.assignment import AssignmentScorer
+
+    create_all_tables()
+    cities = _seed(args)
+    candidates = list(range(2, args.drivers + 2))
+    from_addr, to_addr = f"{cities[0]}, ул. Новая, 3", f"{cities[1]}, 7"
+    scorer = AssignmentScorer()
+
+    started = time.perf_counter()
+    scorer.refresh()
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        _per_request(candidates, from_addr, to_addr, scorer.window_days)
+    sql = (time.perf_counter() - started) / args.repeats
+
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        scorer.suggest(candidates, from_addr, to_addr)
+    memory = (time.perf_counter() - started) / args.repeats
+
+    started = time.perf_counter()
+    for driver_id in candidates[:args.repeats]:
+        scorer.refresh([driver_id])
+    one = (time.perf_counter() - started) / min(args.repeats, len(candidates))
+
+    print(f"full refresh of {args.drivers} drivers: {full * 1000:.1f} ms")
+    print(f"{'per request, SQL':<28}{sql * 1e6:>12.0f} us")
+    print(f"{'in memory, suggest()':<28}{memory * 1e6:>12.0f} us  ({sql / memory:.0f}x)")
+    print(f"{'event refresh, one driver':<28}{one * 1e6:>12.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# benchmarks/fake_telegram.py
+"""
+Поддельный Telegram Bot API для нагрузочных и интеграционных прогонов.
+
+Локальный aiohttp-сервер в фоновом потоке реализует подмножество методов, которым пользуется бот:
+getMe, getUpdates (long polling по очереди, которую наполняет push()), sendMessage, editMessageText,
+editMessageReplyMarkup, answerCallbackQuery, sendDocument, sendPhoto, sendMediaGroup, deleteMessage,
+setMyCommands, setWebhook/deleteWebhook. Остальные методы отвечают {"ok": true, "result": true}.
+
+Возможности:
+  - задержка ответа latency_ms (+ равномерный разброс jitter_ms);
+  - инъекция 429 Too Many Requests с заданной вероятностью (retry_after как у настоящего API);
+  - запись всего исходящего трафика бота (requests) и отправленных сообщений (sent).
+
+Подключение в коде:   apihelper.API_URL = asyncio_helper.API_URL = fake.api_url
+Подключение бота:     TELEGRAM_API_URL=http://127.0.0.1:8081/bot{0}/{1} python -m app.main
+Отдельный запуск:     python -m benchmarks.fake_telegram --port 8081 --latency-ms 50 --rate-429 0.01
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+
+@dataclass
+class Recorded:
+    """Один запрос бота к API."""
+    method: str
+    params: dict
+    files: dict = field(default_factory=dict)    # имя поля -> (имя файла, размер)
+    status: int = 200
+    ts: float = field(default_factory=time.time)
+
+
+class FakeTelegram:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0, rate_429: float = 0.0,
+                 retry_after: int = 1, host: str = "127.0.0.1", port: int = 0, seed: int | None = None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.calls: dict[str, int] = {}
+        self.requests: list[Recorded] = []
+        self.sent: list[tuple[int, str]] = []      # (chat_id, text) отправленных ботом сообщений
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._updates: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._new_updates: asyncio.Condition | None = None
+        self._runner: web.AppRunner | None = None
+        self._ready = threading.Event()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot{{0}}/{{1}}"
+
+    def reset(self) -> None:
+        """Очищает записанный трафик (очередь апдейтов не трогает)."""
+        self.calls.clear()
+        self.requests.clear()
+        self.sent.clear()
+        self.throttled = 0
+
+    def requests_for(self, method: str) -> list[Recorded]:
+        return [r for r in self.requests if r.method == method]
+
+    # ---------- апдейты ----------
+    def push(self, update: dict) -> int:
+        """Кладёт апдейт в очередь getUpdates (update_id проставляется автоматически)."""
+        update_id = next(self._update_ids)
+        update = dict(update, update_id=update_id)
+
+        async def _push():
+            async with self._new_updates:
+                self._updates.append(update)
+                self._new_updates.notify_all()
+
+        asyncio.run_coroutine_threadsafe(_push(), self._loop).result()
+        return update_id
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    @classmethod
+    def message(cls, chat_id: int, text: str, **extra) -> dict:
+        return {"message": {"message_id": 1, "date": int(time.time()), "text": text,
+                            "chat": {"id": chat_id, "type": "private"}, "from": cls._user(chat_id), **extra}}
+
+    @classmethod
+    def contact(cls, chat_id: int, phone: str) -> dict:
+        return {"message": {"message_id": 1, "date": int(time.time()),
+                            "chat": {"id": chat_id, "type": "private"}, "from": cls._user(chat_id),
+                            "contact": {"phone_number": phone, "first_name": f"User{chat_id}",
+                                        "user_id": chat_id}}}
+
+    @classmethod
+    def photo(cls, chat_id: int, file_id: str = "PHOTO", caption: str | None = None) -> dict:
+        size = {"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 600}
+        return {"message": {"message_id": 1, "date": int(time.time()), "caption": caption,
+                            "chat": {"id": chat_id, "type": "private"}, "from": cls._user(chat_id),
+                            "photo": [size]}}
+
+    @classmethod
+    def callback(cls, chat_id: int, data: str, message_id: int = 1) -> dict:
+        return {"callback_query": {
+            "id": f"cb{chat_id}_{time.monotonic_ns()}", "chat_instance": str(chat_id), "data": data,
+            "from": cls._user(chat_id),
+            "message": {"message_id": message_id, "date": int(time.time()), "text": "card",
+                        "chat": {"id": chat_id, "type": "private"}},
+        }}
+
+    # ---------- API ----------
+    async def _read(self, request: web.Request) -> tuple[dict, dict]:
+        params, files = dict(request.query), {}
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                for key, value in (await request.post()).items():
+                    if isinstance(value, str):
+                        params[key] = value
+                    else:
+                        files[key] = (value.filename, len(value.file.read()))
+        return params, files
+
+    def _message(self, params: dict, **content) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        return {"message_id": int(params.get("message_id") or next(self._message_ids)), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}, **content}
+
+    def _file(self, kind: str) -> dict:
+        n = next(self._file_ids)
+        return {"file_id": f"{kind}_{n}", "file_unique_id": f"u{kind}_{n}"}
+
+    def _result(self, method: str, params: dict, files: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            self.sent.append((int(params.get("chat_id") or 0), params.get("text", "")))
+            return self._message(params, text=params.get("text", ""))
+        if method == "editMessageReplyMarkup":
+            return self._message(params, text="")
+        if method == "sendPhoto":
+            self.sent.append((int(params.get("chat_id") or 0), params.get("caption") or ""))
+            return self._message(params, caption=params.get("caption"),
+                                 photo=[dict(self._file("photo"), width=800, height=600)])
+        if method == "sendDocument":
+            self.sent.append((int(params.get("chat_id") or 0), params.get("caption") or ""))
+            name = next(iter(files.values()), ("document", 0))[0]
+            return self._message(params, caption=params.get("caption"),
+                                 document=dict(self._file("document"), file_name=name))
+        if method == "sendMediaGroup":
+            media = json.loads(params.get("media") or "[]")
+            self.sent.append((int(params.get("chat_id") or 0), f"<media group x{len(media)}>"))
+            return [self._message(params, **{item.get("type", "photo"): (
+                [dict(self._file("photo"), width=800, height=600)] if item.get("type", "photo") == "photo"
+                else self._file(item["type"]))}) for item in media]
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params, files = await self._read(request)
+        if method == "getUpdates":
+            self.requests.append(Recorded(method, params))
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        await asyncio.sleep(self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0))
+        if self.rate_429 and method != "getMe" and self._random.random() < self.rate_429:
+            self.throttled += 1
+            self.requests.append(Recorded(method, params, files, status=429))
+            return web.json_response(
+                {"ok": False, "error_code": 429,
+                 "description": f"Too Many Requests: retry after {self.retry_after}",
+                 "parameters": {"retry_after": self.retry_after}},
+                status=429)
+        self.requests.append(Recorded(method, params, files))
+        return web.json_response({"ok": True, "result": self._result(method, params, files)})
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        await asyncio.sleep(self.latency / 2)
+        async with self._new_updates:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_updates.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            result = self._updates[:limit]
+        await asyncio.sleep(self.latency / 2)
+        return result
+
+    # ---------- жизненный цикл ----------
+    def start(self) -> "FakeTelegram":
+        threading.Thread(target=self._serve, name="fake-telegram", daemon=True).start()
+        self._ready.wait(10)
+        return self
+
+    def _serve(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._new_updates = asyncio.Condition()
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля запросов, получающих 429")
+    args = parser.parse_args()
+
+    fake = FakeTelegram(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+                        host=args.host, port=args.port).start()
+    print(f"Fake Bot API: TELEGRAM_API_URL={fake.api_url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"calls={fake.calls} throttled={fake.throttled}")
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
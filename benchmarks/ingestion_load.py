@@ -0,0 +1,238 @@
+# benchmarks/ingestion_load.py
+"""
+Нагрузочное сравнение приёма апдейтов: long polling против вебхука (services/webhook.py).
+
+Поднимает поддельный Telegram: для polling — getUpdates через apihelper.CUSTOM_REQUEST_SENDER
+с задержкой сети --rtt-ms, для вебхука — клиентские потоки, которые POST-ят апдейты на локальный
+WebhookServer (с повтором после 429, как делает Telegram). Хендлер один и тот же и имитирует
+работу --work-ms. Печатает пропускную способность и p50/p99 задержки «апдейт создан → хендлер начал».
+
+Перед замером проверяет сам сервер: неверный секрет → 403, чужой путь → 404,
+переполнение очереди → 429, и что каждый принятый апдейт обработан ровно один раз.
+
+Запуск:  python -m benchmarks.ingestion_load --updates 2000 --clients 8 --workers 4
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+            "text": repr(time.perf_counter()),
+        },
+    }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _make_bot(work_ms: float, threaded: bool, num_threads: int):
+    from telebot import TeleBot
+
+    bot = TeleBot(os.environ["BOT_TOKEN"], threaded=threaded, num_threads=num_threads)
+    latencies: list[float] = []
+    handled: dict[int, int] = {}
+    lock = threading.Lock()
+    done = threading.Event()
+    bot.expected = 0
+
+    @bot.message_handler(func=lambda m: True)
+    def on_message(message):
+        started = time.perf_counter()
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        with lock:
+            latencies.append(started - float(message.text))
+            handled[message.message_id] = handled.get(message.message_id, 0) + 1
+            if len(latencies) >= bot.expected:
+                done.set()
+
+    return bot, latencies, handled, done
+
+
+def _post(url: str, secret: str, payload: dict) -> int:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json",
+                                              "X-Telegram-Bot-Api-Secret-Token": secret})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def check_server(args) -> list[str]:
+    """Проверки поведения сервера вебхука; возвращает список ошибок."""
+    from app.services.webhook import WebhookServer
+
+    errors = []
+    bot, latencies, handled, done = _make_bot(work_ms=50, threaded=False, num_threads=1)
+    server = WebhookServer(bot, host="127.0.0.1", port=0, secret="s3cret", queue_size=4, workers=1)
+    server.start()
+    url = f"http://127.0.0.1:{server.port}{server.path}"
+    try:
+        if _post(url, "wrong", _update(1, 1)) != 403:
+            errors.append("bad secret is not rejected with 403")
+        if _post(url.replace(server.path, "/other"), "s3cret", _update(1, 1)) != 404:
+            errors.append("unknown path is not rejected with 404")
+        codes = [_post(url, "s3cret", _update(i, 1)) for i in range(1, 41)]
+        accepted = codes.count(200)
+        if 429 not in codes:
+            errors.append("saturated queue did not answer 429")
+        bot.expected = accepted
+        if not done.wait(10):
+            errors.append("accepted updates were not all handled")
+        if any(n != 1 for n in handled.values()) or len(handled) != accepted:
+            errors.append("accepted updates were not handled exactly once")
+    finally:
+        server.stop()
+    return errors
+
+
+def run_webhook(args) -> tuple[float, list[float], int]:
+    from app.services.webhook import WebhookServer
+
+    bot, latencies, handled, done = _make_bot(args.work_ms, threaded=False, num_threads=1)
+    bot.expected = args.updates
+    server = WebhookServer(bot, host="127.0.0.1", port=0, secret="bench",
+                           queue_size=args.queue_size, workers=args.workers)
+    server.start()
+    url = f"http://127.0.0.1:{server.port}{server.path}"
+    retries = [0]
+    counter = iter(range(1, args.updates + 1))
+    counter_lock = threading.Lock()
+
+    def client(chat_id: int):
+        while True:
+            with counter_lock:
+                update_id = next(counter, None)
+            if update_id is None:
+                return
+            payload = _update(update_id, chat_id)
+            while _post(url, "bench", payload) == 429:
+                retries[0] += 1
+                time.sleep(0.05)
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(1000 + i,)) for i in range(args.clients)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    done.wait(60)
+    elapsed = time.perf_counter() - started
+    server.stop()
+    return len(latencies) / elapsed, latencies, retries[0]
+
+
+def run_polling(args) -> tuple[float, list[float], int]:
+    from telebot import apihelper
+
+    bot, latencies, handled, done = _make_bot(args.work_ms, threaded=True, num_threads=args.workers)
+    bot.expected = args.updates
+    pending: list[dict] = []
+    cond = threading.Condition()
+    calls = [0]
+
+    class _Response:
+        status_code = 200
+        reason = "OK"
+
+        def __init__(self, result):
+            self._data = {"ok": True, "result": result}
+            self.text = json.dumps(self._data)
+
+        def json(self):
+            return self._data
+
+    def sender(method, url, params=None, files=None, **kwargs):
+        name = url.rsplit("/", 1)[1]
+        if name == "getMe":
+            return _Response({"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+        if name != "getUpdates":
+            return _Response(True)
+        calls[0] += 1
+        time.sleep(args.rtt_ms / 2000)  # запрос до api.telegram.org
+        offset = int((params or {}).get("offset") or 0)
+        wait = float((params or {}).get("timeout") or 0)
+        with cond:
+            cond.wait_for(lambda: any(u["update_id"] >= offset for u in pending), timeout=wait)
+            # всё, что меньше offset, бот уже подтвердил
+            pending[:] = [u for u in pending if u["update_id"] >= offset]
+            result = pending[:100]
+        time.sleep(args.rtt_ms / 2000)  # ответ
+        return _Response(result)
+
+    previous = apihelper.CUSTOM_REQUEST_SENDER
+    apihelper.CUSTOM_REQUEST_SENDER = sender
+    poller = threading.Thread(target=bot.polling, kwargs={"timeout": 10, "long_polling_timeout": 5,
+                                                          "interval": 0}, daemon=True)
+    poller.start()
+    counter = iter(range(1, args.updates + 1))
+    counter_lock = threading.Lock()
+
+    def client(chat_id: int):
+        while True:
+            with counter_lock:
+                update_id = next(counter, None)
+            if update_id is None:
+                return
+            with cond:
+                pending.append(_update(update_id, chat_id))
+                pending.sort(key=lambda u: u["update_id"])
+                cond.notify_all()
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(1000 + i,)) for i in range(args.clients)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    done.wait(60)
+    elapsed = time.perf_counter() - started
+    bot.stop_polling()
+    apihelper.CUSTOM_REQUEST_SENDER = previous
+    return len(latencies) / elapsed, latencies, calls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--work-ms", type=float, default=2.0)
+    parser.add_argument("--rtt-ms", type=float, default=60.0, help="сетевая задержка до Telegram для getUpdates")
+    args = parser.parse_args()
+
+    errors = check_server(args)
+    for error in errors:
+        print(f"FAIL: {error}")
+
+    rate, latencies, retries = run_webhook(args)
+    print(f"webhook: {len(latencies)} updates, {rate:,.0f} upd/s, p50={_percentile(latencies, 0.5) * 1000:.1f}ms "
+          f"p99={_percentile(latencies, 0.99) * 1000:.1f}ms, 429 retries={retries}")
+    rate, latencies, calls = run_polling(args)
+    print(f"polling: {len(latencies)} updates, {rate:,.0f} upd/s, p50={_percentile(latencies, 0.5) * 1000:.1f}ms "
+          f"p99={_percentile(latencies, 0.99) * 1000:.1f}ms, getUpdates calls={calls}")
+    raise SystemExit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/instrumentation_overhead.py
+"""
+Накладные расходы services/metrics.py на обработку апдейта.
+
+Один и тот же набор хендлеров (поиск пользователя + подсчёт его заявок в SQLite, как в типичном
+хендлере меню; с --api ещё и send_message в benchmarks/fake_telegram.py) прогоняется
+через bot.process_new_updates без инструментирования и с ним. Прогоны чередуются (без, с, с, без …),
+чтобы прогрев кэша SQLite и фоновая нагрузка не доставались одной стороне. Надбавка — медиана отношений
+«с / без» по --repeats кругам: лучшие времена сторон берутся из разных кругов и на общей машине шумят сильнее.
+Отдельно замеряется собственная цена обёртки хендлера и хука SQL — из неё складывается ожидаемая надбавка.
+Цель — накладные расходы в пределах нескольких процентов: больше --budget — код возврата 1.
+
+Запуск:  python -m benchmarks.instrumentation_overhead --updates 5000 --repeats 7 [--api] [--budget 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _make_bot(with_api: bool):
+    from telebot import TeleBot
+    from app.database.models import Order, User
+
+    bot = TeleBot(os.environ["BOT_TOKEN"], threaded=False)
+
+    @bot.message_handler(commands=["start"])
+    def on_start(message):
+        pass
+
+    @bot.message_handler(func=lambda m: m.text == "📋 Мои заявки")
+    def on_orders(message):
+        user = User.get_or_none(User.tg_id == message.from_user.id)
+        count = Order.select().where(Order.dispatcher == user).count()
+        if with_api:
+            bot.send_message(message.chat.id, f"Заявок: {count}")
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("order:"))
+    def on_order(call):
+        Order.get_or_none(Order.id == int(call.data.split(":")[1]))
+
+    return bot
+
+
+def _updates(count: int, users: int):
+    from telebot import types
+    from benchmarks.fake_telegram import FakeTelegram
+
+    result = []
+    for n in range(count):
+        chat_id = 1 + n % users
+        raw = (FakeTelegram.callback(chat_id, f"order:{1 + n % 100}") if n % 3 == 2
+               else FakeTelegram.message(chat_id, "📋 Мои заявки"))
+        result.append(types.Update.de_json(dict(raw, update_id=n + 1)))
+    return result
+
+
+def _run(bot, updates) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(updates), 100):
+        bot.process_new_updates(updates[i:i + 100])
+    return time.perf_counter() - started
+
+
+def _measure(bots: list, updates, repeats: int) -> list[list[float]]:
+    """Времена каждого бота по кругам; в круге прогоны идут подряд (то прямо, то обратно), первый круг — прогрев."""
+    for bot in bots:
+        _run(bot, updates)
+    times = [[] for _ in bots]
+    for round_ in range(repeats):
+        order = list(enumerate(bots))
+        for i, bot in (order if round_ % 2 == 0 else reversed(order)):
+            times[i].append(_run(bot, updates))
+    return times
+
+
+def _own_cost(registry, calls: int = 100_000) -> tuple[float, float]:
+    """Цена обёртки хендлера и хука одного SQL-запроса (мкс) — без работы самих хендлеров."""
+    from app.database.session import db
+    from app.services.metrics import _Call
+
+    def noop(message):
+        return None
+
+    wrapped = registry.instrument(noop)
+    started = time.perf_counter()
+    for i in range(calls):
+        noop(i)
+    plain = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(calls):
+        wrapped(i)
+    wrapper = (time.perf_counter() - started - plain) / calls * 1_000_000
+
+    # SQL: без наблюдателей у db против наблюдателя метрик внутри хендлера (время меряет сама база)
+    sql, observers = [], db.observers[:]
+    for attached, call in (([], None), (observers, _Call("bench"))):
+        db.observers[:] = attached
+        registry._local.call = call
+        started = time.perf_counter()
+        for _ in range(calls // 10):
+            db.execute_sql("SELECT 1")
+        sql.append(time.perf_counter() - started)
+    db.observers[:] = observers
+    registry._local.call = None
+    return wrapper, max(0.0, sql[1] - sql[0]) / (calls // 10) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=5.0, help="допустимая надбавка, %%")
+    parser.add_argument("--api", action="store_true", help="хендлер отвечает send_message (fake API, 0 мс)")
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_metrics_"), "bench.db")
+
+    from telebot import apihelper
+    from app.database.models import Order, User, UserRole, create_all_tables
+    from app.services.metrics import Metrics
+    from benchmarks.fake_telegram import FakeTelegram
+
+    create_all_tables()
+    User.insert_many([{"tg_id": i, "first_name": f"User{i}", "role": int(UserRole.DISPATCHER)}
+                      for i in range(1, args.users + 1)]).execute()
+    Order.insert_many([{"dispatcher": 1 + i % args.users, "from_addr": "А", "to_addr": "Б"}
+                       for i in range(1000)]).execute()
+
+    fake = None
+    if args.api:
+        fake = FakeTelegram(latency_ms=0).start()
+        apihelper.API_URL = fake.api_url
+
+    updates = _updates(args.updates, args.users)
+    registry = Metrics(window=300)
+    bot = _make_bot(args.api)
+    registry.install(bot)
+    baseline_runs, instrumented_runs = _measure([_make_bot(args.api), bot], updates, args.repeats)
+    baseline, instrumented = min(baseline_runs), min(instrumented_runs)
+    # надбавка — медиана отношений внутри круга: соседние прогоны идут в одинаковой фоновой нагрузке,
+    # а разброс между кругами на общей машине доходит до десятков процентов
+    overhead = (statistics.median(i / b for b, i in zip(baseline_runs, instrumented_runs)) - 1) * 100
+    snapshot = registry.snapshot()      # до _own_cost: её пустой хендлер в отчёт не попадает
+    wrapper_us, sql_us = _own_cost(registry)
+
+    per_update = lambda seconds: seconds / len(updates) * 1_000_000
+    sql_per_update = sum(s["db_queries"] for s in snapshot.values()) / sum(s["calls"] for s in snapshot.values())
+    expected = (wrapper_us + sql_per_update * sql_us) / per_update(baseline) * 100
+    print(f"baseline:     {per_update(baseline):8.1f} us/update")
+    print(f"instrumented: {per_update(instrumented):8.1f} us/update  "
+          f"(best of {args.repeats})")
+    print(f"overhead:     {overhead:+.1f}% (median of {args.repeats} paired rounds)")
+    print(f"own cost:     wrapper {wrapper_us:.2f} us + {sql_per_update:.1f} SQL x {sql_us:.2f} us "
+          f"= {expected:.1f}% of an update")
+    for name, s in snapshot.items():
+        print(f"  {name:<30} calls={s['calls']:<6} p50={s['p50_ms']:.2f}ms p99={s['p99_ms']:.2f}ms "
+              f"sql/call={s['db_queries'] / s['calls']:.1f} api/call={s['api_calls'] / s['calls']:.1f}")
+    if fake is not None:
+        fake.stop()
+    if overhead > args.budget:
+        raise SystemExit(f"instrumentation overhead {overhead:+.1f}% exceeds the {args.budget}% budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/keyboard_render.py
+"""
+Скорость рендера клавиатуры действий для длинного списка заявок (keyboards/request_actions.py).
+
+Сравнивает сборку InlineKeyboardMarkup с нуля + to_json() (как было) и выдачу из кэша шаблонов,
+проверяет, что JSON совпадает байт в байт для каждой карточки.
+
+Запуск:  python -m benchmarks.keyboard_render --orders 5000 --repeat 5
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.database.models import OrderStatus
+    from app.keyboards.request_actions import build_request_actions_keyboard, get_request_actions_keyboard
+
+    rnd = random.Random(42)
+    statuses = [int(s) for s in OrderStatus]
+    roles = ("dispatcher", "driver", "manager")
+    cards = [(SimpleNamespace(id=i, status=rnd.choice(statuses)), rnd.choice(roles))
+             for i in range(1, args.orders + 1)]
+
+    mismatches = sum(
+        build_request_actions_keyboard(order, role).to_json() != get_request_actions_keyboard(order, role).to_json()
+        for order, role in cards
+    )
+
+    def measure(render) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for order, role in cards:
+                render(order, role).to_json()
+            best = min(best, time.perf_counter() - started)
+        return len(cards) / best
+
+    built = measure(build_request_actions_keyboard)
+    cached = measure(get_request_actions_keyboard)
+    print(f"orders={len(cards)} build+serialize={built:,.0f} cards/s cached={cached:,.0f} cards/s "
+          f"speedup={cached / built:.1f}x mismatches={mismatches}")
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/order_import.py
+"""
+Импорт заявок из файла (services/order_import.py) против создания по одной.
+
+Генерируется XLSX и CSV на --rows строк в колонках экспорта (адреса, водители и «вес/объём» повторяются, как
+в реальной выгрузке; --bad доля строк с ошибками). Замеряется полный импорт каждого файла: чтение, проверка
+по колонкам, INSERT пачками по --chunk. Для сравнения --naive строк создаются как в пошаговом диалоге:
+проверка строки и Order.create в своей транзакции.
+
+Запуск:  python -m benchmarks.order_import --rows 10000 --naive 1000
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+
+def _table(args) -> list[list]:
+    from app.services.order_import import ORDER_COLUMNS
+
+    rnd = random.Random(args.seed)
+    cities = ["Москва", "Тверь", "Казань", "Рязань", "Тула", "Владимир", "Ярославль", "Калуга"]
+    addresses = [f"{rnd.choice(cities)}, ул. Складская, {n}" for n in range(1, 60)]
+    drivers = [f"Водитель{i} Фамилия{i}" for i in range(1, args.drivers + 1)] + [""]
+    # «1 200 кг» — пробел между разрядами, вес 1200 кг (см. проверку в main)
+    loads = ["20 т", "5 т / 30 м3", "1500 кг", "1 200 кг", "1\u00a0200 кг", "82 куба", "10", "3 паллеты", ""]
+    now = datetime.now()
+    rows = [list(ORDER_COLUMNS)]
+    for i in range(args.rows):
+        when = (now + timedelta(hours=rnd.randint(0, 24 * 14))).strftime("%d.%m.%Y %H:%M")
+        row = ["", rnd.choice(("с НДС", "без НДС", "нал")), "", when, rnd.choice(addresses),
+               rnd.choice(addresses), "", rnd.choice(drivers), rnd.choice(("паллеты", "сыпучий", "")),
+               rnd.choice(loads), ""]
+        if rnd.random() < args.bad:
+            row[rnd.choice((3, 4, 9))] = rnd.choice(("32.13.2025", "А", "500 т", "120 000 кг"))
+        rows.append(row)
+    return rows
+
+
+def _xlsx(rows: list[list]) -> bytes:
+    from app.services.order_import import _xlsx
+    return _xlsx(rows[0], rows[1:])
+
+
+def _csv(rows: list[list]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";").writerows(rows)
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def _naive(rows: list[list], dispatcher) -> None:
+    """Как пошаговый диалог: каждая строка проверяется и создаётся отдельным Order.create."""
+    from app.database.models import Order, OrderStatus, db
+    from app.services.order_import import validate_rows
+
+    for row in rows[1:]:
+        valid, _ = validate_rows(rows[0], [row], dispatcher)
+        for data in valid:
+            with db.atomic():
+                Order.create(**{k: v for k, v in data.items() if k != "day_bucket"})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--naive", type=int, default=1000, help="строк для создания по одной (0 — не замерять)")
+    parser.add_argument("--drivers", type=int, default=30)
+    parser.add_argument("--bad", type=float, default=0.02, help="доля строк с ошибками")
+    parser.add_argument("--chunk", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_import_"), "bench.db")
+
+    from app.database.models import Order, User, UserRole, create_all_tables
+    from app.services.order_import import import_orders, rejected_file
+
+    create_all_tables()
+    dispatcher = User.create(tg_id=1, first_name="Диспетчер", role=int(UserRole.DISPATCHER))
+    User.insert_many([{"tg_id": 100 + i, "first_name": f"Водитель{i}", "last_name": f"Фамилия{i}",
+                       "role": int(UserRole.DRIVER)} for i in range(1, args.drivers + 1)]).execute()
+
+    rows = _table(args)
+    files = {"orders.xlsx": _xlsx(rows), "orders.csv": _csv(rows)}
+    print(f"{'file':<14}{'rows':>8}{'imported':>10}{'rejected':>10}{'seconds':>10}{'rows/s':>10}")
+    for name, content in files.items():
+        started = time.perf_counter()
+        result = import_orders(content, name, dispatcher, max_rows=args.rows, chunk=args.chunk)
+        if result.rejected:
+            rejected_file(result, name)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<14}{args.rows:>8}{len(result.orders):>10}{len(result.rejected):>10}"
+              f"{elapsed:>10.2f}{args.rows / elapsed:>10.0f}")
+
+    if args.naive:
+        sample = rows[:args.naive + 1]
+        started = time.perf_counter()
+        _naive(sample, dispatcher)
+        elapsed = time.perf_counter() - started
+        print(f"{'one by one':<14}{args.naive:>8}{'':>10}{'':>10}{elapsed:>10.2f}{args.naive / elapsed:>10.0f}")
+    print(f"orders in db: {Order.select().count()}")
+    grouped = Order.select().where(Order.weight_volume.in_(("1 200 кг", "1\u00a0200 кг")))
+    wrong = grouped.where((Order.weight_kg != 1200) | Order.weight_kg.is_null()).count()
+    if not grouped.count() or wrong or Order.select().where(Order.weight_volume == "120 000 кг").exists():
+        raise SystemExit(f"«1 200 кг»: {grouped.count()} rows, {wrong} with weight_kg != 1200; "
+                         f"«120 000 кг» must be rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+# benchmarks/personas_load.py
+"""
+Сквозная нагрузка на настоящие хендлеры бота сценариями «персонажей».
+
+База засевается заданным количеством пользователей и заявок, бот собирается через app.main.setup_bot
+и работает через планировщик чатов (services/scheduler.py) против benchmarks/fake_telegram.py.
+Персонажи:
+  - диспетчер проходит все шаги создания заявки (префикс, точки А и Б, водитель inline-кнопкой
+    order_driver_pick, груз … order_file → «пропустить»); созданные заявки сверяются с ожидаемым числом;
+  - водитель открывает активные заявки, принимает свою NEW-заявку и ведёт её driver_set_status
+    до «доставлено», смотрит статистику;
+  - руководитель смотрит общую статистику, персонал, аналитику, список заявок за неделю и выгружает Excel.
+
+Отчёт: пропускная способность, p50/p95/p99 по каждому хендлеру, запросы к БД и вызовы API
+на апдейт (всего и по хендлерам), пиковый RSS, цена вызова логгера и число записей лога на апдейт.
+Результат пишется в JSON (--out), --compare печатает разницу с предыдущим прогоном.
+
+Запуск:  python -m benchmarks.personas_load --dispatchers 20 --drivers 40 --managers 5 --orders 5000 \
+             --rounds 3 --out personas.json [--compare previous.json]
+"""
+import argparse
+import functools
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+DISPATCHER_BASE, DRIVER_BASE, MANAGER_BASE = 100_000, 200_000, 300_000
+
+# ход заявки водителем после принятия (см. services/state_machine.py)
+_DRIVER_PATH = (3, 4, 5, 6)     # ENROUTE_TO_LOADING, LOADING, ENROUTE, DELIVERED
+
+
+# ---------- база ----------
+def seed(args) -> tuple[dict, list[int]]:
+    """
+    Пользователи всех ролей, история заявок за 90 дней и по NEW-заявке на каждый раунд водителя.
+    Возвращает (tg_id водителя -> его NEW-заявки, id водителей).
+    """
+    from app.database.models import Order, OrderStatus, User, UserRole, create_all_tables, to_day_bucket
+    from app.database.session import db
+
+    create_all_tables()
+    rnd = random.Random(args.seed)
+
+    def users(base: int, count: int, role: UserRole) -> list[dict]:
+        # имена совпадают с тем, что присылает fake_telegram в from_user
+        return [{"tg_id": base + i, "tg_chat_id": base + i, "username": f"user{base + i}",
+                 "first_name": f"User{base + i}", "role": int(role)} for i in range(count)]
+
+    with db.atomic():
+        User.insert_many(users(DISPATCHER_BASE, args.dispatchers, UserRole.DISPATCHER)
+                         + users(DRIVER_BASE, args.drivers, UserRole.DRIVER)
+                         + users(MANAGER_BASE, args.managers, UserRole.MANAGER)).execute()
+    by_tg = {u.tg_id: u.id for u in User.select(User.id, User.tg_id)}
+    dispatchers = [by_tg[DISPATCHER_BASE + i] for i in range(args.dispatchers)]
+    drivers = [by_tg[DRIVER_BASE + i] for i in range(args.drivers)]
+
+    now = datetime.now()
+    statuses = [int(s) for s in OrderStatus]
+    rows = []
+    for n in range(args.orders):
+        status = rnd.choice(statuses)
+        tons = rnd.randint(1, 20)
+        when = now - timedelta(minutes=rnd.randint(0, 90 * 24 * 60))
+        rows.append({
+            "dispatcher": rnd.choice(dispatchers),
+            "driver": rnd.choice(drivers) if status != int(OrderStatus.NEW) or rnd.random() < 0.5 else None,
+            "prefix": rnd.randint(1, 3),
+            "from_addr": f"Склад {n % 97}", "to_addr": f"Магазин {n % 89}",
+            "datetime": when, "day_bucket": to_day_bucket(when),
+            "cargo_type": "паллеты", "weight_volume": f"{tons} т", "weight_kg": tons * 1000.0,
+            "status": status,
+        })
+    with db.atomic():
+        for batch in range(0, len(rows), 500):
+            Order.insert_many(rows[batch:batch + 500]).execute()
+
+    # у каждого водителя по свежей NEW-заявке на раунд — их он и примет
+    fresh: dict[int, list[int]] = {}
+    with db.atomic():
+        for i, driver_id in enumerate(drivers):
+            for _ in range(args.rounds):
+                order = Order.create(dispatcher=rnd.choice(dispatchers), driver=driver_id, prefix=1,
+                                     from_addr="Склад", to_addr="Магазин", status=int(OrderStatus.NEW))
+                fresh.setdefault(DRIVER_BASE + i, []).append(order.id)
+    return fresh, drivers
+
+
+# ---------- сценарии ----------
+def dispatcher_script(fake, chat_id: int, rounds: int, drivers: list[int], rnd: random.Random) -> list[dict]:
+    script = []
+    for _ in range(rounds):
+        # кнопка inline-выбора водителя (get_drivers_keyboard): id водителя, 0 — без водителя
+        driver_id = rnd.choice(drivers) if drivers and rnd.random() < 0.7 else 0
+        for text in ("➕ Создать заявку", rnd.choice(("с НДС", "без НДС", "нал")),
+                     "Москва, Складская 1", "Тула, Садовая 5"):
+            script.append(fake.message(chat_id, text))
+        script.append(fake.callback(chat_id, f"order_driver_pick:{driver_id}"))
+        for text in ("паллеты", "5 т / 20 м3", "осторожно, хрупкое", "пропустить"):
+            script.append(fake.message(chat_id, text))
+    return script
+
+
+def driver_script(fake, chat_id: int, orders: list[int]) -> list[dict]:
+    script = []
+    for order_id in orders:
+        script.append(fake.message(chat_id, "📆 Активные заявки"))
+        script.append(fake.callback(chat_id, f"driver_accept:{order_id}"))
+        script.extend(fake.callback(chat_id, f"driver_set_status:{order_id}:{status}") for status in _DRIVER_PATH)
+        script.append(fake.message(chat_id, "📊 Моя статистика"))
+    return script
+
+
+def manager_script(fake, chat_id: int, rounds: int) -> list[dict]:
+    script = []
+    for _ in range(rounds):
+        script.extend([
+            fake.message(chat_id, "📊 Общая статистика"),
+            fake.message(chat_id, "👥 Персонал"),
+            fake.message(chat_id, "📈 Аналитика"),
+            fake.message(chat_id, "📋 Все заявки"),
+            fake.callback(chat_id, "mgr_requests:week"),
+            fake.message(chat_id, "📤 Экспорт отчетов"),
+            fake.callback(chat_id, "export_period:month"),
+            fake.callback(chat_id, "export_do:month:excel"),
+        ])
+    return script
+
+
+def interleave(scripts: list[list[dict]]) -> list[dict]:
+    """Шаги всех персонажей вперемешку, как от живых пользователей; порядок внутри чата сохраняется."""
+    merged = []
+    for step in itertools.zip_longest(*scripts):
+        merged.extend(u for u in step if u is not None)
+    return merged
+
+
+# ---------- измерения ----------
+class Probe:
+    """Время, запросы к БД и вызовы API для каждого вызова хендлера."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.db_queries = 0
+        self.api_calls = 0
+        self.samples: dict[str, list[tuple[float, int, int]]] = {}   # хендлер -> [(сек, запросы, вызовы)]
+        self._lock = threading.Lock()
+
+    def _counters(self):
+        return getattr(self.local, "db", 0), getattr(self.local, "api", 0)
+
+    def install(self, bot) -> None:
+        from telebot import apihelper
+        from app.database.session import db
+
+        make_request = apihelper._make_request
+
+        def counted_sql(sql, params, seconds):
+            self.local.db = getattr(self.local, "db", 0) + 1
+            with self._lock:
+                self.db_queries += 1
+
+        def counted_request(*args, **kwargs):
+            self.local.api = getattr(self.local, "api", 0) + 1
+            with self._lock:
+                self.api_calls += 1
+            return make_request(*args, **kwargs)
+
+        db.observers.append(counted_sql)
+        apihelper._make_request = counted_request
+
+        for handler in bot.message_handlers + bot.callback_query_handlers:
+            handler["function"] = self._wrap(handler["function"])
+
+    def _wrap(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            db_before, api_before = self._counters()
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                db_after, api_after = self._counters()
+                with self._lock:
+                    self.samples.setdefault(func.__name__, []).append(
+                        (elapsed, db_after - db_before, api_after - api_before))
+        return timed
+
+    def handlers_report(self) -> dict:
+        report = {}
+        for name, samples in sorted(self.samples.items()):
+            times = sorted(s[0] for s in samples)
+            report[name] = {
+                "calls": len(samples),
+                "p50_ms": _percentile(times, 50) * 1000,
+                "p95_ms": _percentile(times, 95) * 1000,
+                "p99_ms": _percentile(times, 99) * 1000,
+                "max_ms": times[-1] * 1000,
+                "db_queries_avg": sum(s[1] for s in samples) / len(samples),
+                "api_calls_avg": sum(s[2] for s in samples) / len(samples),
+            }
+        return report
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ---------- прогон ----------
+def run(args) -> dict:
+    from loguru import logger
+    from telebot import apihelper, types
+    from app.logs.logging import setup_logging
+    from app.database.models import Order
+    from app.main import setup_bot
+    from app.services.scheduler import ChatScheduler
+    from app.utils.loader import bot
+    from benchmarks.fake_telegram import FakeTelegram
+
+    pipeline = setup_logging()
+    # цена вызова логгера в потоке хендлера (запись уходит в очередь, пишет фоновый поток)
+    started = time.perf_counter()
+    for i in range(1000):
+        logger.info("personas_load: log cost probe {}", i)
+    log_call_us = (time.perf_counter() - started) / 1000 * 1_000_000
+    log_records_before = pipeline.records
+
+    fresh, drivers = seed(args)
+    orders_before = Order.select().count()
+    fake = FakeTelegram(latency_ms=args.latency_ms, seed=args.seed).start()
+    apihelper.API_URL = fake.api_url
+
+    notifications = setup_bot(bot)
+    probe = Probe()
+    probe.install(bot)
+    scheduler = ChatScheduler(workers=args.workers, per_chat_cap=10 ** 6)
+    scheduler.install(bot)
+
+    rnd = random.Random(args.seed)
+    scripts = [dispatcher_script(fake, DISPATCHER_BASE + i, args.rounds, drivers, rnd)
+               for i in range(args.dispatchers)]
+    scripts += [driver_script(fake, DRIVER_BASE + i, fresh[DRIVER_BASE + i]) for i in range(args.drivers)]
+    scripts += [manager_script(fake, MANAGER_BASE + i, args.rounds) for i in range(args.managers)]
+    updates = [types.Update.de_json(dict(u, update_id=n)) for n, u in enumerate(interleave(scripts), 1)]
+
+    started = time.perf_counter()
+    bot.process_new_updates(updates)
+    scheduler.stop(timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+    if notifications is not None:
+        notifications.flush_all()
+    queue = scheduler.snapshot()
+    fake.stop()
+
+    api_by_method: dict[str, int] = {}
+    for record in fake.requests:
+        api_by_method[record.method] = api_by_method.get(record.method, 0) + 1
+
+    total = len(updates)
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "updates": total,
+        "processed": queue["processed"],
+        "orders_created": Order.select().count() - orders_before,
+        "orders_expected": args.dispatchers * args.rounds,
+        "elapsed_s": elapsed,
+        "throughput_ups": queue["processed"] / elapsed if elapsed else 0.0,
+        "queue_wait_avg_ms": queue["wait_avg_ms"],
+        "queue_wait_max_ms": queue["wait_max_ms"],
+        "db_queries_per_update": probe.db_queries / total,
+        "api_calls_per_update": len(fake.requests) / total,
+        "api_calls_by_method": api_by_method,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "log_call_us": log_call_us,
+        "log_records_per_update": (pipeline.records - log_records_before) / total,
+        "log_dropped": pipeline.dropped,
+        "handlers": probe.handlers_report(),
+    }
+
+
+def print_report(result: dict, previous: dict | None) -> None:
+    def delta(key: str) -> str:
+        if not previous or not previous.get(key):
+            return ""
+        return f"  ({(result[key] - previous[key]) / previous[key] * 100:+.1f}%)"
+
+    print(f"updates: {result['processed']}/{result['updates']} in {result['elapsed_s']:.2f}s, "
+          f"orders created: {result['orders_created']}/{result['orders_expected']}")
+    for key in ("throughput_ups", "db_queries_per_update", "api_calls_per_update", "peak_rss_mb",
+                "queue_wait_avg_ms", "log_call_us", "log_records_per_update"):
+        print(f"{key:>24}: {result[key]:10.2f}{delta(key)}")
+    print(f"\n{'handler':<32}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/call':>9}{'api/call':>9}")
+    old = (previous or {}).get("handlers", {})
+    for name, h in result["handlers"].items():
+        line = (f"{name:<32}{h['calls']:>7}{h['p50_ms']:>9.1f}{h['p95_ms']:>9.1f}{h['p99_ms']:>9.1f}"
+                f"{h['db_queries_avg']:>9.1f}{h['api_calls_avg']:>9.1f}")
+        if name in old and old[name]["p95_ms"]:
+            line += f"  p95 {(h['p95_ms'] - old[name]['p95_ms']) / old[name]['p95_ms'] * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dispatchers", type=int, default=10)
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--managers", type=int, default=2)
+    parser.add_argument("--orders", type=int, default=2000, help="заявок в истории")
+    parser.add_argument("--rounds", type=int, default=2, help="повторов сценария каждым персонажем")
+    parser.add_argument("--workers", type=int, default=4, help="потоков планировщика чатов")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=25)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--log-level", default="INFO", help="LOG_LEVEL приложения на время прогона")
+    parser.add_argument("--out", default="personas_load.json")
+    parser.add_argument("--compare", help="JSON предыдущего прогона")
+    args = parser.parse_args()
+
+    # до импорта приложения: session.py и settings читают окружение при импорте
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_personas_"), "bench.db")
+    os.environ.setdefault("NOTIFY_DEBOUNCE_SECONDS", "0.5")
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ["LOG_FILE"] = os.path.join(os.path.dirname(os.environ["DB_PATH"]), "bot.log")
+
+    result = run(args)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(result, previous)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nresult: {args.out}")
+    # сценарий диспетчера, разошедшийся с шагами создания заявки, не должен выглядеть успешным прогоном
+    if result["orders_created"] != result["orders_expected"]:
+        raise SystemExit(f"orders created: {result['orders_created']}, expected {result['orders_expected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/roster.py
+"""
+Снимок активных пользователей (services/roster.py) против запроса к users на каждый показ.
+
+В базе --users пользователей (водители, диспетчеры, руководитель, часть неактивны). «Запросом» — то, что делали
+хендлеры раньше: выборка активных водителей и подсчёт диспетчеров/руководителей; «из снимка» — те же чтения
+через roster. Затем --mutations случайных изменений проходят апдейтами через настоящие хендлеры (регистрация
+в start.py, /user_activate, /user_edit, /user_delete руководителя, /delete_me) против benchmarks/fake_telegram.py,
+и после каждого снимок сверяется с БД как есть, без пересборки (Roster.diff()): хендлер, забывший опубликовать
+USER_CHANGED, даёт расхождение. Контрольное изменение в обход события обязано расхождение дать.
+Любое расхождение (или его отсутствие в контроле) — код возврата 1.
+
+Запуск:  python -m benchmarks.roster --users 2000 --repeats 200 --mutations 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import count
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+# сверка должна видеть изменения без USER_CHANGED — пересборка по таймеру их бы скрыла
+os.environ["ROSTER_REFRESH_SECONDS"] = "3600"
+
+MANAGER_TG = 1
+_UPDATE_IDS = count(1)
+
+
+def _seed(args, rnd):
+    from app.database.models import User, UserRole, db
+
+    roles = [int(UserRole.DRIVER)] * 8 + [int(UserRole.DISPATCHER)] * 2
+    rows = [{"tg_id": MANAGER_TG, "first_name": "Руководитель", "role": int(UserRole.MANAGER)}]
+    rows += [{"tg_id": 100 + i, "first_name": f"Имя{i}", "last_name": f"Фамилия{i}", "username": f"user{i}",
+              "role": rnd.choice(roles), "is_active": rnd.random() > 0.1} for i in range(args.users)]
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            User.insert_many(rows[i:i + 500]).execute()
+
+
+def _per_request():
+    """Как было: запросы на каждый показ списка и каждую проверку ролей при регистрации."""
+    from app.database.models import User, UserRole
+
+    drivers = list(User.select().where((User.role == int(UserRole.DRIVER)) & (User.is_active == True))
+                   .order_by(User.first_name, User.last_name))
+    dispatchers = User.select().where((User.role == int(UserRole.DISPATCHER)) & (User.is_active == True)).count()
+    manager = User.select().where((User.role == int(UserRole.MANAGER)) & (User.is_active == True)).exists()
+    return drivers, dispatchers, manager
+
+
+def _from_roster(roster):
+    from app.database.models import UserRole
+
+    return roster.drivers(), roster.count(UserRole.DISPATCHER), bool(roster.count(UserRole.MANAGER))
+
+
+def _bot(fake):
+    """Бот с настоящими хендлерами, меняющими пользователей: регистрация, /delete_me и команды руководителя."""
+    from telebot import TeleBot, apihelper
+    from telebot.storage import StateMemoryStorage
+
+    from app.handlers.delete_user import register_delete_user_handlers
+    from app.handlers.manager import register_manager_handlers
+    from app.handlers.start import register_handlers
+
+    apihelper.API_URL = fake.api_url
+    bot = TeleBot(os.environ["BOT_TOKEN"], threaded=False, state_storage=StateMemoryStorage())
+    register_handlers(bot)
+    register_manager_handlers(bot)
+    register_delete_user_handlers(bot)
+    return bot
+
+
+def _mutate(bot, fake, rnd, next_tg) -> str:
+    """Одно изменение пользователя через апдейты в хендлеры — теми же путями, что у живых пользователей."""
+    from telebot import types
+
+    from app.database.models import User
+
+    kind = rnd.choice(("register", "activate", "edit", "delete", "delete_me"))
+    user = User.select().order_by(User.id).offset(rnd.randrange(User.select().count())).get()
+    if kind == "register":
+        # новый пользователь или повторная регистрация уже существующего (в т.ч. деактивированного)
+        tg_id = next_tg if rnd.random() < 0.5 else user.tg_id
+        script = [fake.message(tg_id, "/start"), fake.callback(tg_id, f"role:{rnd.choice(('driver', 'dispatcher'))}"),
+                  fake.contact(tg_id, f"+7999{tg_id % 10 ** 7:07d}"), fake.callback(tg_id, "reg:confirm")]
+    elif kind == "activate":
+        script = [fake.message(MANAGER_TG, f"/user_activate {user.id}")]
+    elif kind == "edit":
+        script = [fake.message(MANAGER_TG, f"/user_edit {user.id} role {rnd.choice(('driver', 'dispatcher'))}")]
+    elif kind == "delete":
+        script = [fake.message(MANAGER_TG, f"/user_delete {user.id}")]
+    else:
+        script = [fake.message(user.tg_id, "/delete_me"), fake.callback(user.tg_id, "delme:yes")]
+    for update in script:
+        bot.process_new_updates([types.Update.de_json(dict(update, update_id=next(_UPDATE_IDS)))])
+    return kind
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--mutations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_roster_"), "bench.db")
+
+    from app.database.models import User, create_all_tables
+    from app.services import events
+    from app.services.events import bus
+    from app.services.roster import register_roster
+    from benchmarks.fake_telegram import FakeTelegram
+
+    create_all_tables()
+    rnd = random.Random(args.seed)
+    _seed(args, rnd)
+    roster = register_roster()
+
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        expected = _per_request()
+    sql = (time.perf_counter() - started) / args.repeats
+
+    roster.refresh()
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        cached = _from_roster(roster)
+    memory = (time.perf_counter() - started) / args.repeats
+
+    started = time.perf_counter()
+    roster.refresh()
+    rebuild = time.perf_counter() - started
+
+    same = ([d.id for d in expected[0]] == [d.id for d in cached[0]]) and expected[1:] == cached[1:]
+    print(f"{'per request, SQL':<24}{sql * 1e6:>12.0f} us")
+    print(f"{'from roster':<24}{memory * 1e6:>12.0f} us  ({sql / memory:.0f}x)")
+    print(f"{'rebuild after event':<24}{rebuild * 1e6:>12.0f} us")
+
+    diverged = 0 if same else 1
+    fake = FakeTelegram(latency_ms=0).start()
+    bot = _bot(fake)
+    kinds = Counter()
+    for i in range(args.mutations):
+        kinds[_mutate(bot, fake, rnd, 10 ** 6 + i)] += 1
+        problems = roster.diff()
+        if problems:
+            diverged += 1
+            print(f"mutation {i}: {problems[:3]}")
+
+    # контроль: изменение в обход USER_CHANGED сверка обязана заметить
+    user = User.select().where(User.is_active == True).order_by(User.id.desc()).get()
+    user.is_active = False
+    user.save()
+    control = bool(roster.diff())
+    bus.publish(events.USER_CHANGED, user=user)
+    fake.stop()
+
+    print(f"mutations: {args.mutations} ({dict(kinds)}), diverged: {diverged}, rebuilds: {roster.rebuilds}")
+    print(f"control change without USER_CHANGED detected: {control}")
+    sys.exit(1 if diverged or not control else 0)
+
+
+if __name__ == "__main__":
+    main()
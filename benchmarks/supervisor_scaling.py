@@ -0,0 +1,123 @@
+# benchmarks/supervisor_scaling.py
+"""
+Масштабирование services/supervisor.py на 1, 2 и 4 процесса-воркера.
+
+Приёмник — обычный polling против benchmarks/fake_telegram.py, воркеры поднимают бота
+с CPU-нагруженным хендлером (имитация построения отчёта, --work-ms чистого Python под GIL)
+и отвечают send_message. Заодно проверяется, что сообщения одного чата обработаны по порядку.
+
+Запуск:  python -m benchmarks.supervisor_scaling --chats 100 --messages 4 --work-ms 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("SCHEDULER_WORKERS", "2")
+
+LONG_POLLING_TIMEOUT = 5
+
+
+def _burn(ms: float) -> None:
+    deadline = time.perf_counter() + ms / 1000
+    x = 0
+    while time.perf_counter() < deadline:
+        for i in range(1000):
+            x += i * i
+
+
+def setup_cpu_bot(bot):
+    """setup для воркеров: один хендлер «тяжёлого отчёта» (вызывается в процессе-воркере)."""
+    work_ms = float(os.environ["BENCH_WORK_MS"])
+
+    @bot.message_handler(func=lambda m: True)
+    def on_message(message):
+        _burn(work_ms)
+        bot.send_message(message.chat.id, f"done {message.text}")
+
+    return None
+
+
+def run(workers: int, args, fake) -> tuple[float, bool, int]:
+    import threading
+    from telebot import TeleBot
+    from app.services.supervisor import Supervisor
+
+    ingress = TeleBot(os.environ["BOT_TOKEN"])
+    supervisor = Supervisor(workers=workers, setup="benchmarks.supervisor_scaling:setup_cpu_bot")
+    supervisor.start()
+    supervisor.install(ingress)
+    poller = threading.Thread(target=ingress.polling, kwargs={"interval": 0, "timeout": 30,
+                                                              "long_polling_timeout": LONG_POLLING_TIMEOUT},
+                              daemon=True)
+    poller.start()
+    time.sleep(3)   # spawn + импорт приложения в воркерах
+
+    total = args.chats * args.messages
+    base = len(fake.sent)
+    started = time.perf_counter()
+    for i in range(args.messages):
+        for chat_id in range(1, args.chats + 1):
+            fake.push(fake.message(chat_id, str(i)))
+    while len(fake.sent) - base < total and time.perf_counter() - started < args.timeout:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    done = len(fake.sent) - base
+
+    # до следующего K приёмник и воркеры этого прогона должны полностью завершиться: иначе незакрытый
+    # long polling забирает апдейты следующего прогона и перезапускает уже остановленных воркеров
+    ingress.stop_polling()
+    poller.join(LONG_POLLING_TIMEOUT + 10)
+    if poller.is_alive():
+        raise SystemExit(f"workers={workers}: ingress poller did not stop")
+    supervisor.stop()
+    alive = [p.name for p in supervisor.processes if p is not None and p.is_alive()]
+    if alive:
+        raise SystemExit(f"workers={workers}: worker processes still alive: {alive}")
+
+    by_chat: dict[int, list[int]] = {}
+    for chat_id, text in fake.sent[base:]:
+        by_chat.setdefault(chat_id, []).append(int(text.split()[-1]))
+    ordered = all(seq == sorted(seq) for seq in by_chat.values())
+    return done / elapsed, ordered and done == total, supervisor.restarts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--work-ms", type=float, default=20.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    from benchmarks.fake_telegram import FakeTelegram
+
+    fake = FakeTelegram(latency_ms=args.latency_ms).start()
+    # окружение наследуют процессы-воркеры
+    os.environ["TELEGRAM_API_URL"] = fake.api_url
+    os.environ["BENCH_WORK_MS"] = str(args.work_ms)
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="next25_sup_"), "bench.db")
+
+    from telebot import apihelper
+    apihelper.API_URL = fake.api_url
+
+    # на одном ядре CPU-нагруженный хендлер не масштабируется процессами — рост даёт только перекрытие
+    # ожидания ответов API; число ядер печатается, чтобы цифры можно было сравнивать между машинами
+    print(f"cpus: {os.cpu_count()}, work: {args.work_ms} ms/update, API latency: {args.latency_ms} ms")
+    failed = False
+    baseline = None
+    for workers in args.workers:
+        rate, ok, restarts = run(workers, args, fake)
+        baseline = baseline or rate
+        failed |= not ok or bool(restarts)
+        print(f"workers={workers}: {rate:,.1f} upd/s (x{rate / baseline:.2f}), ordered per chat: {ok}, "
+              f"worker restarts: {restarts}")
+    fake.stop()
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
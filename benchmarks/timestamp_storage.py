@@ -0,0 +1,164 @@
+# benchmarks/timestamp_storage.py
+"""
+ISO-строки против целых epoch-секунд и day_bucket в orders (database/models.py).
+
+База наполняется --orders заявками за --days дней и приводится к старому виду (created_at/updated_at/datetime —
+текст, day_bucket пуст); копия в таком виде (VACUUM INTO) — «старая» база. Оригинал переводится
+convert_order_timestamps (время миграции тоже печатается) и сжимается VACUUM, чтобы обе базы были
+одинаково уложены на диске. Запросы недельных/месячных хендлеров идут через peewee, как в хендлерах:
+к старой базе — моделью со старыми DateTimeField, к новой — Order. Счётчики доставок диспетчера, список
+заявок за период (модели целиком, как manager.py), тоннаж, доставки по дням (strftime против day_bucket).
+Базы чередуются по кругам (порядок в круге то прямой, то обратный); печатаются медианы и медиана отношений.
+
+Запуск:  python -m benchmarks.timestamp_storage --orders 200000 --days 365 --repeats 15
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+_LEGACY = ('UPDATE orders SET '
+           '"created_at" = datetime("created_at", \'unixepoch\', \'localtime\'), '
+           '"updated_at" = datetime("updated_at", \'unixepoch\', \'localtime\'), '
+           '"datetime" = datetime("datetime", \'unixepoch\', \'localtime\'), '
+           '"day_bucket" = NULL')
+
+
+def _seed(args):
+    from app.database.models import Order, OrderStatus, User, UserRole, db, to_day_bucket
+
+    rnd = random.Random(args.seed)
+    now = datetime.now()
+    User.insert_many([{"tg_id": i, "first_name": f"User{i}", "role": int(UserRole.DISPATCHER)}
+                      for i in range(1, args.dispatchers + 1)]).execute()
+    statuses = [int(s) for s in OrderStatus]
+    rows = []
+    for _ in range(args.orders):
+        when = now - timedelta(minutes=rnd.randint(0, args.days * 24 * 60))
+        rows.append({"dispatcher": 1 + rnd.randrange(args.dispatchers), "from_addr": "А", "to_addr": "Б",
+                     "datetime": when, "day_bucket": to_day_bucket(when), "created_at": when, "updated_at": when,
+                     "status": rnd.choice(statuses), "weight_kg": rnd.randint(1, 20) * 1000.0})
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            Order.insert_many(rows[i:i + 500]).execute()
+
+
+def _legacy_model(path: str):
+    """Order над копией старой базы, с полями времени как до перевода — DateTimeField."""
+    from peewee import DateTimeField, SqliteDatabase
+    from app.database.models import Order
+
+    class LegacyOrder(Order):
+        created_at = DateTimeField()
+        updated_at = DateTimeField()
+        datetime = DateTimeField()
+
+        class Meta:
+            table_name = "orders"
+            database = SqliteDatabase(path)
+
+    return LegacyOrder
+
+
+def _queries(legacy: bool) -> dict:
+    """Чтения хендлеров как функции от модели; по дням — strftime у старой базы и day_bucket у новой."""
+    from peewee import fn
+    from app.database.models import OrderStatus
+
+    now = datetime.now()
+    week, month = now - timedelta(days=7), now - timedelta(days=30)
+    first_day = datetime(month.year, month.month, month.day)       # по дням — целыми днями, как day_bucket
+    delivered = int(OrderStatus.DELIVERED)
+
+    def delivered_count(since):
+        return lambda m: m.select().where((m.dispatcher == 1) & (m.status == delivered) &
+                                          (m.datetime >= since)).count()
+
+    def period_list(since):
+        return lambda m: list(m.select().where(m.datetime >= since).order_by(m.datetime.desc()))
+
+    def tonnage(m):
+        return m.select(fn.SUM(m.weight_kg), fn.SUM(m.volume_m3)).where(
+            (m.datetime >= month) & (m.status == delivered)).tuples().get()
+
+    if legacy:
+        def per_day(m):
+            day = fn.strftime("%Y-%m-%d", m.datetime)
+            return dict(m.select(day, fn.COUNT(m.id)).where((m.datetime >= first_day) & (m.status == delivered))
+                        .group_by(day).tuples())
+    else:
+        def per_day(m):
+            return dict(m.select(m.day_bucket, fn.COUNT(m.id))
+                        .where((m.day_bucket >= first_day.toordinal()) & (m.status == delivered))
+                        .group_by(m.day_bucket).tuples())
+
+    return {"dispatcher delivered 7d": delivered_count(week), "dispatcher delivered 30d": delivered_count(month),
+            "period list 7d": period_list(week), "period list 30d": period_list(month),
+            "tonnage 30d": tonnage, "per day 30d": per_day}
+
+
+def _measure(sides: list, repeats: int) -> dict:
+    """{запрос: (медиана старой, медиана новой, медиана отношений новая/старая)}; sides — [(модель, запросы)]."""
+    result = {}
+    for name in sides[0][1]:
+        for model, queries in sides:
+            queries[name](model)        # прогрев кэша страниц
+        times = [[], []]
+        for round_ in range(repeats):
+            order = [0, 1] if round_ % 2 == 0 else [1, 0]
+            for i in order:
+                model, queries = sides[i]
+                started = time.perf_counter()
+                queries[name](model)
+                times[i].append((time.perf_counter() - started) * 1000)
+        result[name] = (statistics.median(times[0]), statistics.median(times[1]),
+                        statistics.median(new / old for old, new in zip(*times)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365, help="за сколько дней распределены заявки")
+    parser.add_argument("--dispatchers", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="next25_ts_")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+
+    from app.database.models import Order, convert_order_timestamps, create_all_tables, db
+
+    create_all_tables()
+    _seed(args)
+    with db.atomic():
+        db.execute_sql(_LEGACY)
+    legacy_path = os.path.join(workdir, "legacy.db")
+    db.execute_sql("VACUUM INTO ?", (legacy_path,))
+
+    started = time.perf_counter()
+    converted = convert_order_timestamps(Order)
+    elapsed = time.perf_counter() - started
+    db.execute_sql("VACUUM")
+
+    legacy = _legacy_model(legacy_path)
+    old, new = _queries(legacy=True), _queries(legacy=False)
+    by_text = {date.fromisoformat(day).toordinal(): count for day, count in old["per day 30d"](legacy).items()}
+    if by_text != new["per day 30d"](Order):
+        raise SystemExit("per day 30d: strftime и day_bucket дают разные счётчики")
+    result = _measure([(legacy, old), (Order, new)], args.repeats)
+
+    print(f"converted {converted} orders in {elapsed:.1f}s")
+    print(f"{'query':<26}{'ISO text, ms':>14}{'epoch, ms':>12}   median ratio of {args.repeats} rounds")
+    for name, (before, after, ratio) in result.items():
+        print(f"{name:<26}{before:>14.3f}{after:>12.3f}   {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
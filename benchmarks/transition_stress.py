@@ -0,0 +1,102 @@
+# benchmarks/transition_stress.py
+"""
+Стресс-проверка атомарных переходов статуса (services/transitions.py).
+
+Много потоков (по одному «водителю» на поток) одновременно принимают одну и ту же NEW-заявку,
+затем все потоки от имени победителя одновременно жмут одну и ту же смену статуса.
+Ожидается ровно один победитель на каждом шаге и ровно одна запись истории на переход.
+
+Запуск:  python -m benchmarks.transition_stress --threads 32 --rounds 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="next25_stress_")
+    os.environ["DB_PATH"] = os.path.join(tmp_dir, "stress.db")
+
+    # импорт после DB_PATH: session.py читает путь при импорте
+    from app.database.models import (
+        create_all_tables, User, Order, OrderStatus, OrderStatusHistory, UserRole,
+    )
+    from app.services.transitions import transition
+
+    create_all_tables()
+    dispatcher = User.create(tg_id=1, first_name="Dispatcher", role=int(UserRole.DISPATCHER))
+    drivers = [User.create(tg_id=100 + i, first_name=f"Driver{i}", role=int(UserRole.DRIVER))
+               for i in range(args.threads)]
+
+    steps = [
+        (OrderStatus.CONFIRMED, OrderStatus.ENROUTE_TO_LOADING),
+        (OrderStatus.ENROUTE_TO_LOADING, OrderStatus.LOADING),
+        (OrderStatus.LOADING, OrderStatus.ENROUTE),
+        (OrderStatus.ENROUTE, OrderStatus.DELIVERED),
+    ]
+
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        order = Order.create(dispatcher=dispatcher, from_addr="A", to_addr="B")
+
+        # 1) все водители одновременно принимают заявку
+        barrier = threading.Barrier(args.threads)
+        wins = []
+
+        def accept(driver):
+            barrier.wait()
+            if transition(order.id, driver, (OrderStatus.NEW,), OrderStatus.CONFIRMED,
+                          driver=driver, driver_free_or=driver, note="accept"):
+                wins.append(driver.id)
+
+        threads = [threading.Thread(target=accept, args=(d,)) for d in drivers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        winner = User.get_by_id(wins[0]) if wins else None
+        if len(wins) != 1:
+            failures += 1
+
+        # 2) победитель «многократно нажимает» каждую смену статуса
+        for prev, new in steps:
+            barrier = threading.Barrier(args.threads)
+            step_wins = []
+            version = Order.get_by_id(order.id).version
+
+            def press():
+                barrier.wait()
+                if transition(order.id, winner, (prev,), new, only_driver=winner, version=version):
+                    step_wins.append(1)
+
+            threads = [threading.Thread(target=press) for _ in range(args.threads)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if len(step_wins) != 1:
+                failures += 1
+
+        final = Order.get_by_id(order.id)
+        history = OrderStatusHistory.select().where(OrderStatusHistory.order == order).count()
+        if final.status != int(OrderStatus.DELIVERED) or history != 1 + len(steps) or final.version != 1 + len(steps):
+            failures += 1
+
+    elapsed = time.perf_counter() - started
+    attempts = args.rounds * args.threads * (1 + len(steps))
+    print(f"rounds={args.rounds} threads={args.threads} attempts={attempts} "
+          f"elapsed={elapsed:.2f}s ({attempts / elapsed:.0f} attempts/s) failures={failures}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()